@@ -0,0 +1,125 @@
+import random
+import pytest
+from warehouse_sim.engine import Environment
+from warehouse_sim.conflicts import ConflictMonitor
+from warehouse_sim.recorder import Recorder, Replay
+
+
+def random_fleet(rng, size, robots, moves):
+    environment = Environment(size, size)
+    monitor = ConflictMonitor().attach(environment)
+    cells = rng.sample([(x, y) for x in range(size) for y in range(size)], robots)
+    for cell in cells:
+        environment.add_robot(*cell)
+    for robot in environment.robots:
+        cell, t = (robot.x, robot.y), rng.randint(0, 2)
+        for _ in range(rng.randint(0, moves)):
+            dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1), (0, 0)))
+            cell = (min(size - 1, max(0, cell[0] + dx)), min(size - 1, max(0, cell[1] + dy)))
+            environment.instruct_robot(robot.id, cell, t, "move")
+            t += 1 + rng.randint(0, 1)
+    return environment, monitor
+
+
+def brute_force(environment, monitor):
+    # Lays every robot out step by step and compares all of them pairwise
+    now = monitor.step_of(environment.time)
+    laid_out, parked, edges = {}, {}, {}
+    for robot in environment.robots:
+        cell, step = (robot.x, robot.y), now
+        for instruction in robot.instructions:
+            if instruction.instruction != "move":
+                continue
+            start = max(monitor.step_of(instruction.start_time), step)
+            end = max(monitor.end_step_of(instruction.start_time + instruction.duration), start + 1)
+            for t in range(step, start + 1):
+                laid_out.setdefault((cell, t), set()).add(robot.id)
+            if instruction.target != cell:
+                edges.setdefault((cell, instruction.target, start), set()).add(robot.id)
+            for t in range(start + 1, end):
+                laid_out.setdefault((instruction.target, t), set()).add(robot.id)
+            cell, step = instruction.target, end
+        laid_out.setdefault((cell, step), set()).add(robot.id)
+        parked[robot.id] = (cell, step)
+    found = []
+    for (cell, step), robots in laid_out.items():
+        robots = robots | {robot_id for robot_id, (held, since) in parked.items() if held == cell and since <= step}
+        if len(robots) > 1 and step >= now:
+            found.append(("vertex", cell, step, sorted(robots)))
+    for (a, b, step), robots in edges.items():
+        others = edges.get((b, a, step), set())
+        if (a, b) < (b, a) and step >= now and any(x != y for x in robots for y in others):
+            found.append(("swap", (a, b), step, sorted(robots | others)))
+    found.sort(key=lambda conflict: (conflict[2], conflict[0], conflict[1]))
+    return found
+
+
+def fresh_conflicts(environment):
+    monitor = ConflictMonitor()
+    monitor.environment = environment
+    monitor.rebuild()
+    return monitor.conflicts()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_conflicts_match_brute_force(seed):
+    environment, monitor = random_fleet(random.Random(seed), size=6, robots=6, moves=6)
+    assert monitor.conflicts() == brute_force(environment, monitor)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("force", [False, True])
+def test_live_index_matches_rebuild_while_running(seed, force):
+    environment, monitor = random_fleet(random.Random(seed), size=8, robots=8, moves=10)
+    for _ in range(60):
+        environment.step(0.5)
+        if force:
+            monitor.dirty.update(robot.id for robot in environment.robots)
+        live = monitor.conflicts()
+        assert live == fresh_conflicts(environment)
+        assert all(len(robots) > 1 for _, _, _, robots in live)
+
+
+def record_and_replay(environment, path, ticks, dt=0.05):
+    recorder = Recorder(str(path), keyframe_interval=5.0).attach(environment)
+    live = []
+    for _ in range(ticks):
+        environment.step(dt)
+        live.append((environment.time, [(robot.x, robot.y) for robot in environment.robots]))
+    recorder.close()
+    replay = Replay(str(path))
+    replayed = replay.environment_at(0.0)
+    for t, positions in live:
+        replay.play(replayed, t)
+        assert [(robot.x, robot.y) for robot in replayed.robots] == positions, t
+    assert replayed.collisions == environment.collisions
+
+
+def test_replay_holds_back_the_moves_the_monitor_held_back(tmp_path):
+    environment = Environment(5, 3)
+    waiting, holding = environment.add_robot(0, 0), environment.add_robot(1, 0)
+    ConflictMonitor().attach(environment)
+    environment.instruct_robot(waiting.id, (1, 0), 0.0, "move")
+    environment.instruct_robot(holding.id, (1, 1), 2.0, "move")
+    record_and_replay(environment, tmp_path / "run.log", 60)
+    assert environment.collisions == 0
+    assert environment.conflicts.waits_inserted == 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("fleet_store", [False, True])
+def test_replay_matches_a_run_with_waits_and_deadlocks(tmp_path, seed, fleet_store):
+    rng = random.Random(seed)
+    environment = Environment(8, 8, fleet_store=fleet_store)
+    for cell in rng.sample([(x, y) for x in range(8) for y in range(8)], 12):
+        environment.add_robot(*cell)
+    monitor = ConflictMonitor().attach(environment)
+    for robot in environment.robots:
+        cell, t = (robot.x, robot.y), rng.randint(0, 2)
+        for _ in range(rng.randint(0, 12)):
+            dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+            cell = (min(7, max(0, cell[0] + dx)), min(7, max(0, cell[1] + dy)))
+            environment.instruct_robot(robot.id, cell, t, "move")
+            t += 1
+    record_and_replay(environment, tmp_path / "run.log", 400)
+    assert monitor.waits_inserted
@@ -0,0 +1,79 @@
+import itertools
+import numpy as np
+import pytest
+from warehouse_sim.dispatcher import Dispatcher, auction_assignment, greedy_assignment, hungarian_assignment
+from warehouse_sim.engine import Environment
+
+
+def random_costs(rng, rows, columns, blocked):
+    cost = rng.integers(0, 20, size=(rows, columns)).astype(float)
+    cost[rng.random((rows, columns)) < blocked] = np.inf
+    return cost
+
+
+def score(cost, rows, columns):
+    # Unreachable pairs first, then the total cost of the reachable ones
+    values = cost[rows, columns]
+    return np.count_nonzero(~np.isfinite(values)), values[np.isfinite(values)].sum()
+
+
+def brute_force(cost):
+    rows, columns = cost.shape
+    best = None
+    if rows <= columns:
+        for chosen in itertools.permutations(range(columns), rows):
+            candidate = score(cost, np.arange(rows), np.array(chosen))
+            best = candidate if best is None else min(best, candidate)
+    else:
+        for chosen in itertools.permutations(range(rows), columns):
+            candidate = score(cost, np.array(chosen), np.arange(columns))
+            best = candidate if best is None else min(best, candidate)
+    unreachable, total = best
+    return min(rows, columns) - unreachable, total
+
+
+def check_assignment(cost, rows, columns):
+    assert len(set(rows.tolist())) == len(rows) == len(columns) == len(set(columns.tolist()))
+    assert np.isfinite(cost[rows, columns]).all()
+    return len(rows), cost[rows, columns].sum()
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("solve", [hungarian_assignment, lambda cost: auction_assignment(cost, 1 / (min(cost.shape) + 1))],
+                         ids=["hungarian", "auction"])
+def test_assignment_matches_brute_force(seed, solve):
+    rng = np.random.default_rng(seed)
+    cost = random_costs(rng, int(rng.integers(1, 7)), int(rng.integers(1, 7)), 0.2 if seed % 2 else 0.0)
+    assert check_assignment(cost, *solve(cost)) == brute_force(cost)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_greedy_assignment_is_valid(seed):
+    rng = np.random.default_rng(seed)
+    cost = random_costs(rng, 5, 4, 0.2)
+    pairs, total = check_assignment(cost, *greedy_assignment(cost))
+    best_pairs, best_total = brute_force(cost)
+    assert pairs < best_pairs or (pairs == best_pairs and total >= best_total)
+
+
+def test_everything_unreachable():
+    cost = np.full((3, 2), np.inf)
+    for solve in (greedy_assignment, hungarian_assignment, auction_assignment):
+        rows, columns = solve(cost)
+        assert len(rows) == len(columns) == 0
+
+
+def test_a_stuck_carry_leg_counts_as_one_failure():
+    environment = Environment(8, 8)
+    robot = environment.add_robot(0, 0)
+    shelf = environment.add_shelf(2, 2)
+    # The drop-off is behind a wall, so the loaded robot is retried every tick
+    for y in range(8):
+        environment.add_obstacle(4, y)
+    dispatcher = Dispatcher(environment)
+    dispatcher.submit(shelf, (6, 6))
+    for _ in range(200):
+        dispatcher.update()
+        environment.step(0.1)
+    assert robot.shelf_custody
+    assert dispatcher.failures == 1
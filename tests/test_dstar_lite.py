@@ -0,0 +1,67 @@
+import random
+import pytest
+from warehouse_sim.a_star.a_star import GridPlanner
+from warehouse_sim.a_star.dstar_lite import DStarLite
+from warehouse_sim.a_star.grid import OBSTACLE, OccupancyGrid
+
+
+def random_grid(rng, size, density):
+    grid = OccupancyGrid(size, size)
+    for x in range(size):
+        for y in range(size):
+            if rng.random() < density:
+                grid.set_flag((x, y), OBSTACLE)
+    return grid
+
+
+def free_cells(grid):
+    return [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_free((x, y))]
+
+
+def is_valid_path(grid, path, start, goal):
+    return (path[0] == start and path[-1] == goal
+            and all(abs(ax - bx) + abs(ay - by) == 1 and grid.is_free((bx, by))
+                    for (ax, ay), (bx, by) in zip(path, path[1:])))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_paths_are_shortest(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 24, 0.3)
+    reference = GridPlanner(grid)
+    cells = free_cells(grid)
+    for _ in range(10):
+        start, goal = rng.sample(cells, 2)
+        path, expected = DStarLite(grid, start, goal).compute_path(), reference.search(start, goal)
+        assert len(path) == len(expected)
+        if path:
+            assert is_valid_path(grid, path, start, goal)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_repaired_paths_match_a_fresh_search(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 24, 0.2)
+    reference = GridPlanner(grid)
+    start, goal = rng.sample(free_cells(grid), 2)
+    search = DStarLite(grid, start, goal)
+    path = search.compute_path()
+    while len(path) > 1:
+        # The robot takes a step, then cells around it open and close
+        position = path[1]
+        search.move_to(position)
+        changed = []
+        for _ in range(3):
+            cell = (rng.randrange(24), rng.randrange(24))
+            if cell in (position, goal):
+                continue
+            if grid.is_free(cell):
+                grid.set_flag(cell, OBSTACLE)
+            else:
+                grid.clear_flag(cell, OBSTACLE)
+            changed.append(grid.index(cell))
+        search.update_cells(changed)
+        path, expected = search.compute_path(), reference.search(position, goal)
+        assert len(path) == len(expected)
+        if path:
+            assert is_valid_path(grid, path, position, goal)
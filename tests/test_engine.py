@@ -0,0 +1,27 @@
+import pytest
+from warehouse_sim.engine import Environment
+
+
+def resting_shelves(environment):
+    # What shelf_at used to find by scanning every shelf
+    return {(shelf.x, shelf.y): shelf for shelf in environment.shelves if shelf.carrier is None}
+
+
+@pytest.mark.parametrize("fleet_store", [False, True])
+def test_shelf_lookup_follows_pickups_drops_and_resets(fleet_store):
+    environment = Environment(10, 10, fleet_store=fleet_store)
+    first = environment.add_shelf(2, 2)
+    environment.add_shelves([(4, 4), (6, 6)])
+    robot = environment.add_robot(0, 0)
+    assert environment.shelf_cells == resting_shelves(environment)
+
+    environment.schedule_deliveries([(robot, first, (8, 1))])
+    while robot.instructions:
+        environment.step(0.1)
+        assert environment.shelf_cells == resting_shelves(environment)
+    assert environment.shelf_at((8, 1)) is first
+    assert environment.shelf_at((2, 2)) is None
+
+    environment.reset()
+    assert environment.shelf_at((2, 2)) is first
+    assert environment.shelf_cells == resting_shelves(environment)
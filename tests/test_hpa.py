@@ -0,0 +1,63 @@
+import random
+import pytest
+from warehouse_sim.a_star.a_star import GridPlanner
+from warehouse_sim.a_star.grid import OBSTACLE, OccupancyGrid
+from warehouse_sim.a_star.hpa import HierarchicalPlanner
+
+
+def random_grid(rng, size, density):
+    grid = OccupancyGrid(size, size)
+    for x in range(size):
+        for y in range(size):
+            if rng.random() < density:
+                grid.set_flag((x, y), OBSTACLE)
+    return grid
+
+
+def free_cells(grid):
+    return [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_free((x, y))]
+
+
+def is_valid_path(grid, path, start, goal):
+    return (path[0] == start and path[-1] == goal
+            and all(abs(ax - bx) + abs(ay - by) == 1 and grid.is_free((bx, by))
+                    for (ax, ay), (bx, by) in zip(path, path[1:])))
+
+
+def check_queries(rng, grid, hpa, reference, queries):
+    cells = free_cells(grid)
+    for _ in range(queries):
+        start, goal = rng.sample(cells, 2)
+        path, expected = hpa.search(start, goal), reference.search(start, goal)
+        assert bool(path) == bool(expected)
+        if path:
+            assert is_valid_path(grid, path, start, goal)
+            assert len(path) >= len(expected)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_paths_reach_what_grid_planner_reaches(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 40, 0.25)
+    check_queries(rng, grid, HierarchicalPlanner(grid, cluster_size=8), GridPlanner(grid), 30)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_paths_follow_map_edits(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 32, 0.2)
+    hpa, reference = HierarchicalPlanner(grid, cluster_size=8), GridPlanner(grid)
+    for _ in range(10):
+        for _ in range(5):
+            cell = (rng.randrange(32), rng.randrange(32))
+            if grid.is_free(cell):
+                grid.set_flag(cell, OBSTACLE)
+            else:
+                grid.clear_flag(cell, OBSTACLE)
+        check_queries(rng, grid, hpa, reference, 5)
+
+
+def test_open_floor_paths_are_shortest():
+    grid = OccupancyGrid(48, 48)
+    hpa = HierarchicalPlanner(grid, cluster_size=8)
+    assert len(hpa.search((1, 2), (45, 40))) == 44 + 38 + 1
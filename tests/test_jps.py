@@ -0,0 +1,111 @@
+import heapq
+import math
+import random
+import pytest
+from warehouse_sim.a_star.a_star import GridPlanner
+from warehouse_sim.a_star.grid import OBSTACLE, OccupancyGrid
+from warehouse_sim.a_star.jps import JumpPointPlanner
+
+
+def random_grid(rng, size, density):
+    grid = OccupancyGrid(size, size)
+    for x in range(size):
+        for y in range(size):
+            if rng.random() < density:
+                grid.set_flag((x, y), OBSTACLE)
+    return grid
+
+
+def free_cells(grid):
+    return [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_free((x, y))]
+
+
+def is_valid_path(grid, path, start, goal, diagonal=False):
+    if path[0] != start or path[-1] != goal:
+        return False
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        dx, dy = bx - ax, by - ay
+        if max(abs(dx), abs(dy)) != 1 or (dx and dy and not diagonal) or not grid.is_free((bx, by)):
+            return False
+        # No cutting corners
+        if dx and dy and not (grid.is_free((ax + dx, ay)) and grid.is_free((ax, ay + dy))):
+            return False
+    return True
+
+
+def path_length(path):
+    return sum(math.hypot(bx - ax, by - ay) for (ax, ay), (bx, by) in zip(path, path[1:]))
+
+
+def octile_distance(grid, start, goal):
+    # Dijkstra over 8 neighbours without cutting corners
+    distances = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        distance, (x, y) = heapq.heappop(heap)
+        if (x, y) == goal:
+            return distance
+        if distance > distances[(x, y)]:
+            continue
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                neighbor = (x + dx, y + dy)
+                if not (dx or dy) or not grid.is_free(neighbor):
+                    continue
+                if dx and dy and not (grid.is_free((x + dx, y)) and grid.is_free((x, y + dy))):
+                    continue
+                candidate = distance + math.hypot(dx, dy)
+                if candidate < distances.get(neighbor, math.inf):
+                    distances[neighbor] = candidate
+                    heapq.heappush(heap, (candidate, neighbor))
+    return None
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_four_connected_paths_match_grid_planner(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 24, 0.3)
+    jps, reference = JumpPointPlanner(grid), GridPlanner(grid)
+    cells = free_cells(grid)
+    for _ in range(30):
+        start, goal = rng.sample(cells, 2)
+        path, expected = jps.search(start, goal), reference.search(start, goal)
+        assert bool(path) == bool(expected)
+        if path:
+            assert is_valid_path(grid, path, start, goal)
+            assert len(path) == len(expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_four_connected_paths_stay_optimal_after_edits(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 24, 0.2)
+    jps, reference = JumpPointPlanner(grid), GridPlanner(grid)
+    for _ in range(20):
+        # Tables are repaired at the next search
+        cell = (rng.randrange(24), rng.randrange(24))
+        if grid.is_free(cell):
+            grid.set_flag(cell, OBSTACLE)
+        else:
+            grid.clear_flag(cell, OBSTACLE)
+        start, goal = rng.sample(free_cells(grid), 2)
+        path, expected = jps.search(start, goal), reference.search(start, goal)
+        assert bool(path) == bool(expected)
+        if path:
+            assert is_valid_path(grid, path, start, goal)
+            assert len(path) == len(expected)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_diagonal_paths_are_octile_optimal(seed):
+    rng = random.Random(seed)
+    grid = random_grid(rng, 20, 0.3)
+    jps = JumpPointPlanner(grid)
+    cells = free_cells(grid)
+    for _ in range(20):
+        start, goal = rng.sample(cells, 2)
+        path, expected = jps.search(start, goal, diagonal=True), octile_distance(grid, start, goal)
+        assert bool(path) == (expected is not None)
+        if path:
+            assert is_valid_path(grid, path, start, goal, diagonal=True)
+            assert path_length(path) == pytest.approx(expected)
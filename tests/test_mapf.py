@@ -0,0 +1,95 @@
+import random
+import pytest
+from warehouse_sim.engine import Environment
+from warehouse_sim.motion import MotionModel
+from warehouse_sim.a_star.grid import OBSTACLE, OccupancyGrid
+from warehouse_sim.a_star.mapf import PrioritizedPlanner, ReservationTable
+
+
+def drive_random_fleet(seed, robots=100, size=40, dt=0.05):
+    rng = random.Random(seed)
+    environment = Environment(size, size, motion=MotionModel())
+    cells = rng.sample([(x, y) for x in range(size) for y in range(size)], 2 * robots)
+    for cell in cells[:robots]:
+        environment.add_robot(*cell)
+    environment.plan_robots({robot.id: cells[robots + i] for i, robot in enumerate(environment.robots)})
+    while not environment.is_idle() and environment.time < 300:
+        environment.step(dt)
+    return environment
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_trajectories_keep_robots_apart(seed):
+    # With a motion model robots keep a cell apart, whichever of two was planned first
+    environment = drive_random_fleet(seed)
+    assert environment.is_idle()
+    assert environment.collisions == 0
+
+
+def test_no_following_rejects_staying_before_another_enters():
+    table = ReservationTable(following=False)
+    table.reserve_path(1, [0, 1, 2], 0)  # agent 1 enters cell 1 at step 1
+    assert not table.can_move(5, 1, -1, 2)  # on cell 1 at step 0
+    assert not table.can_move(1, 1, -1, 2)  # waiting there
+    assert not table.can_move(5, 1, 1, 2)  # entering as agent 1 leaves
+    assert table.can_move(5, 1, 2, 2)  # a step later
+
+
+def test_following_allows_staying_before_another_enters():
+    table = ReservationTable(following=True)
+    table.reserve_path(1, [0, 1, 2], 0)
+    assert table.can_move(5, 1, -1, 2)
+
+
+def plan_random_fleet(seed, following, agents=30, size=20):
+    rng = random.Random(seed)
+    grid = OccupancyGrid(size, size)
+    for x in range(size):
+        for y in range(size):
+            if rng.random() < 0.15:
+                grid.set_flag((x, y), OBSTACLE)
+    cells = rng.sample([(x, y) for y in range(size) for x in range(size) if grid.is_free((x, y))], 2 * agents)
+    planner = PrioritizedPlanner(grid)
+    planner.table.following = following
+    for agent in range(agents):
+        planner.hold(agent, cells[agent])
+    plans = planner.plan([(agent, cells[agent], cells[agents + agent]) for agent in range(agents)])
+    # Agents without a plan stay where they are
+    return [plans[agent][1] if agent in plans else [cells[agent]] for agent in range(agents)]
+
+
+def position(path, t):
+    return path[min(t, len(path) - 1)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("following", [True, False])
+def test_planned_paths_have_no_conflicts(seed, following):
+    paths = plan_random_fleet(seed, following)
+    assert sum(len(path) > 1 for path in paths) > len(paths) // 2
+    horizon = max(len(path) for path in paths) + 1
+    for t in range(horizon):
+        for i, mine in enumerate(paths):
+            for j, theirs in enumerate(paths[:i]):
+                # Vertex conflicts
+                assert position(mine, t) != position(theirs, t)
+                # Swap conflicts
+                assert not (position(mine, t) == position(theirs, t + 1)
+                            and position(mine, t + 1) == position(theirs, t))
+                if not following:
+                    # Nobody enters a cell another agent was on a step before
+                    assert position(mine, t + 1) != position(theirs, t)
+                    assert position(theirs, t + 1) != position(mine, t)
+
+
+def test_failed_agents_are_reported_per_call():
+    grid = OccupancyGrid(5, 5)
+    for y in range(5):
+        grid.set_flag((2, y), OBSTACLE)
+    planner = PrioritizedPlanner(grid)
+    for _ in range(3):
+        # The goal is walled off, so the request is given up after its last attempt
+        planner.plan([(1, (0, 0), (4, 4))])
+        assert planner.failed == [1]
+    planner.plan([(2, (0, 1), (0, 4))])
+    assert planner.failed == []
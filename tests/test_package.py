@@ -0,0 +1,14 @@
+import os
+import pkgutil
+import subprocess
+import sys
+import warehouse_sim
+
+
+def test_importing_the_package_does_not_load_pygame():
+    modules = [module.name for module in pkgutil.walk_packages(warehouse_sim.__path__, "warehouse_sim.")]
+    code = "import sys\n" + "".join(f"import {name}\n" for name in modules) + "print('pygame' in sys.modules)"
+    # A fresh interpreter, as pytest itself may have loaded pygame already
+    root = os.path.dirname(os.path.dirname(warehouse_sim.__file__))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
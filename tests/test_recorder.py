@@ -0,0 +1,68 @@
+import random
+import pytest
+from warehouse_sim.a_star.grid import SHELF
+from warehouse_sim.engine import Environment
+from warehouse_sim.recorder import Recorder, Replay
+
+# Ticks between the states compared with the replay
+SAMPLE_EVERY = 25
+
+
+def snapshot(environment):
+    robots = [(robot.x, robot.y, robot.state, robot.shelf_assigned.id if robot.shelf_custody else 0,
+               robot.shelf_delivered, [(instruction.target, instruction.instruction, instruction.start_time)
+                                       for instruction in robot.instructions])
+              for robot in environment.robots]
+    shelves = [(shelf.x, shelf.y, environment.grid.flags((shelf.x, shelf.y)) & SHELF) for shelf in environment.shelves]
+    resting = sorted((cell, shelf.id) for cell, shelf in environment.shelf_cells.items())
+    return robots, shelves, resting
+
+
+@pytest.fixture(scope="module")
+def recorded_run(tmp_path_factory):
+    # Five robots fetch five shelves and drop them elsewhere
+    rng = random.Random(0)
+    environment = Environment(12, 12)
+    cells = rng.sample([(x, y) for x in range(12) for y in range(12)], 15)
+    for cell in cells[:5]:
+        environment.add_robot(*cell)
+    for cell in cells[5:10]:
+        environment.add_shelf(*cell)
+    path = str(tmp_path_factory.mktemp("recorder") / "run.log")
+    recorder = Recorder(path, keyframe_interval=3.0).attach(environment)
+    deliveries = list(zip(environment.robots, environment.shelves, cells[10:]))
+    assert len(environment.schedule_deliveries(deliveries)) == 5
+    states = []
+    for tick in range(600):
+        environment.step(0.05)
+        if tick % SAMPLE_EVERY == SAMPLE_EVERY - 1:
+            states.append((environment.time, snapshot(environment)))
+    recorder.close()
+    assert all(robot.shelf_delivered for robot in environment.robots)
+    assert any(carried for _, (robots, _, _) in states for _, _, _, carried, _, _ in robots)
+    return path, states
+
+
+def test_seeking_restores_the_recorded_state(recorded_run):
+    path, states = recorded_run
+    for t, state in states:
+        assert snapshot(Replay(path).environment_at(t)) == state, t
+
+
+def test_playing_forward_reproduces_the_run(recorded_run):
+    path, states = recorded_run
+    replay = Replay(path)
+    environment = replay.environment_at(0.0)
+    for t, state in states:
+        replay.play(environment, t)
+        assert snapshot(environment) == state, t
+
+
+def test_playing_on_from_a_seek_reproduces_the_run(recorded_run):
+    path, states = recorded_run
+    replay = Replay(path)
+    middle = len(states) // 2
+    environment = replay.environment_at(states[middle][0])
+    for t, state in states[middle + 1:]:
+        replay.play(environment, t)
+        assert snapshot(environment) == state, t
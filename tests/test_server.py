@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from warehouse_sim.engine import Environment
+from warehouse_sim.server import MAX_PENDING, CommandClient, CommandServer, run
+
+
+def small_warehouse():
+    environment = Environment(10, 10)
+    environment.add_robot(1, 1)
+    environment.add_obstacle(5, 5)
+    return environment
+
+
+MALFORMED = [
+    "junk",
+    {"op": "teleport"},
+    {"op": "instruct", "robot": 1, "target": "ab"},
+    {"op": "instruct", "robot": 1, "target": [50, 50]},
+    {"op": "instruct", "robot": 1, "target": [1, 1, 1]},
+    {"op": "instruct", "robot": 1, "target": [1.5, 2]},
+    {"op": "instruct", "robot": 1, "target": [5, 5]},
+    {"op": "instruct", "robot": True, "target": [1, 2]},
+    {"op": "instruct", "robot": 9, "target": [1, 2]},
+    {"op": "instruct", "robot": 1, "target": [1, 2], "duration": "x"},
+    {"op": "instruct", "robot": 1, "target": [1, 2], "instruction": "fly"},
+    {"op": "path", "robot": 1, "path": [[1, 2], [3, 3]]},
+    {"op": "path", "robot": 1, "path": "north"},
+    {"op": "plan", "goals": [[1, [3, 3]]]},
+    {"op": "plan", "goals": {"1": [5, 5]}},
+    {"op": "drive_to", "robot": 1, "goal": None},
+    {"op": "deliver", "deliveries": [[1, 7, [2, 2]]]},
+    {"op": "add_robot", "cell": [5, 5]},
+    {"op": "add_robot", "cell": [1, 1]},
+    {"op": "add_obstacle", "cell": [-1, 0]},
+    {"op": "query", "robots": 5},
+]
+
+
+@pytest.mark.parametrize("command", MALFORMED, ids=range(len(MALFORMED)))
+def test_malformed_commands_are_answered_with_errors(command):
+    environment = small_warehouse()
+    server = CommandServer(environment)
+    assert "error" in server.execute(None, command)
+    assert len(environment.robots) == 1
+    assert not environment.robots[0].instructions
+
+
+def test_bad_messages_do_not_stop_the_simulation():
+    async def main():
+        environment = small_warehouse()
+        server = CommandServer(environment)
+        await server.serve(port=0)
+        simulation = asyncio.create_task(run(environment, 1.0, 200))
+        client = await CommandClient().connect(port=server.address[1])
+        try:
+            # More bad messages than a client may have outstanding, so each must free its slot
+            for i in range(MAX_PENDING + 2):
+                reply = await asyncio.wait_for(client.request(MALFORMED[i % len(MALFORMED)]), 5)
+                assert all("error" in result for result in reply["results"])
+            reply = await asyncio.wait_for(client.request([{"op": "plan", "goals": {"1": [3, 3]}}]), 5)
+            assert "error" not in reply["results"][0]
+            while (environment.robots[0].x, environment.robots[0].y) != (3, 3):
+                assert not simulation.done()
+                await asyncio.sleep(0.05)
+        finally:
+            await client.close()
+            environment.running = False
+            await simulation
+            server.stop()
+
+    asyncio.run(asyncio.wait_for(main(), 30))
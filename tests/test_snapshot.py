@@ -0,0 +1,31 @@
+from warehouse_sim.engine import Environment
+from warehouse_sim.snapshot import Snapshot, SnapshotWriter
+
+
+def test_snapshot_keeps_the_following_rule():
+    environment = Environment(6, 6)
+    environment.fleet_planner.table.following = False
+    writer = SnapshotWriter(environment)
+    snapshot = Snapshot(writer.publish())
+    try:
+        assert snapshot.reservations().following is False
+    finally:
+        snapshot.close()
+        writer.close()
+
+
+def test_late_pool_path_is_merged_from_now():
+    environment = Environment(10, 10)
+    robot = environment.add_robot(0, 0)
+    environment.use_planner_pool(1)
+    try:
+        environment.plan_robots_parallel({robot.id: (5, 5)})
+        # The batch only comes back once the simulation has moved on
+        environment.time = 5.0
+        assert environment.merge_parallel_plans(wait=True) == [robot.id]
+    finally:
+        environment.planner_pool.close()
+    assert not environment.fleet_planner.pending
+    moves = [instruction for instruction in robot.instructions if instruction.target != (0, 0)]
+    assert moves[0].start_time >= environment.time
+    assert moves[-1].target == (5, 5)
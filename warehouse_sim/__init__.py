@@ -0,0 +1,5 @@
+"""
+Headless warehouse robot simulation with fleet path planning. The engine
+lives in warehouse_sim.engine, the planners in warehouse_sim.a_star; the
+command line tools run as python -m warehouse_sim.<module>.
+"""
@@ -0,0 +1,4 @@
+"""
+Grid path planners: A*, Jump Point Search, D* Lite, hierarchical and
+cooperative space-time planning over an OccupancyGrid.
+"""
@@ -0,0 +1,174 @@
+import heapq
+import weakref
+from array import array
+from ..constants import *
+from .grid import OccupancyGrid, BLOCKING, OBSTACLE
+from .jps import get_jump_planner
+
+def heuristic(start, goal):
+    """
+    Heuristic function for A* search. This uses Manhattan distance between the
+    current point and the goal point, assuming the movement is grid-based.
+    """
+    return abs(start[0] - goal[0]) + abs(start[1] - goal[1])
+
+class GridPlanner:
+    """
+    A* planner bound to an OccupancyGrid. Score, parent and closed-set buffers
+    are flat arrays sized to the grid and reused across searches; a generation
+    stamp marks which entries belong to the current search, so nothing has to
+    be cleared or reallocated between calls.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.g_score = array('d', [0.0]) * grid.size
+        self.came_from = array('l', [-1]) * grid.size
+        self.seen = array('L', [0]) * grid.size  # generation in which g_score was set
+        self.closed = array('L', [0]) * grid.size  # generation in which the cell was expanded
+        self.generation = 0
+        self.expansions = 0  # nodes expanded by the last search
+
+    def search(self, start, goal, mask=BLOCKING, heuristic=None, costs=None):
+        """
+        Returns the list of cells from start to goal (both included), or an
+        empty list if the goal cannot be reached. Cells carrying any flag in
+        mask are impassable, except the goal itself which may be a shelf cell
+        so robots can drive under it. heuristic may be a sequence indexed by
+        flat cell index (e.g. a distance field towards goal); Manhattan
+        distance is used otherwise. costs may be a sequence indexed by flat
+        cell index of non-negative extra costs of entering a cell, e.g. from
+        a congestion.CongestionMap; the path is then the cheapest rather
+        than the shortest one.
+        """
+        grid = self.grid
+        self.expansions = 0
+        if not grid.in_bounds(start) or not grid.in_bounds(goal):
+            return []
+        width = grid.width
+        size = grid.size
+        cells = grid.cells
+        start_index = grid.index(start)
+        goal_index = grid.index(goal)
+        if cells[goal_index] & OBSTACLE:
+            return []
+        if start_index == goal_index:
+            return [start]
+
+        self.generation += 1
+        generation = self.generation
+        g_score = self.g_score
+        came_from = self.came_from
+        seen = self.seen
+        closed = self.closed
+        goal_x, goal_y = goal
+
+        def estimate(index):
+            if heuristic is not None:
+                return heuristic[index]
+            y, x = divmod(index, width)
+            return abs(x - goal_x) + abs(y - goal_y)
+
+        g_score[start_index] = 0
+        seen[start_index] = generation
+        came_from[start_index] = -1
+        h = estimate(start_index)
+        open_set = [(h, h, start_index)]
+        expansions = 0
+
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if closed[current] == generation:
+                continue
+            if current == goal_index:
+                self.expansions = expansions
+                return self.reconstruct_path(current)
+            closed[current] = generation
+            expansions += 1
+
+            x = current % width
+            tentative_g_score = g_score[current] + 1  # All moves have a cost of 1
+            # Check neighbors (4-connected grid) without building a list
+            for neighbor in (
+                current + 1 if x + 1 < width else -1,
+                current - 1 if x > 0 else -1,
+                current + width if current + width < size else -1,
+                current - width,
+            ):
+                if neighbor < 0 or closed[neighbor] == generation:
+                    continue
+                if cells[neighbor] & mask and neighbor != goal_index:
+                    continue
+                if costs is not None:
+                    tentative_g_score = g_score[current] + 1 + costs[neighbor]
+                if seen[neighbor] != generation or tentative_g_score < g_score[neighbor]:
+                    seen[neighbor] = generation
+                    g_score[neighbor] = tentative_g_score
+                    came_from[neighbor] = current
+                    h = estimate(neighbor)
+                    heapq.heappush(open_set, (tentative_g_score + h, h, neighbor))
+
+        self.expansions = expansions
+        return []  # Return empty if no path found
+
+    def reconstruct_path(self, index):
+        position = self.grid.position
+        came_from = self.came_from
+        path = []
+        while index != -1:
+            path.append(position(index))
+            index = came_from[index]
+        path.reverse()
+        return path
+
+# One reusable planner per grid, dropped together with the grid
+_planners = weakref.WeakKeyDictionary()
+_default_grid = None
+
+def get_planner(grid):
+    planner = _planners.get(grid)
+    if planner is None:
+        planner = _planners[grid] = GridPlanner(grid)
+    return planner
+
+
+def a_star_search(start, goal, grid=None, mask=BLOCKING, heuristic=None, mode="astar", costs=None):
+    """
+    A* search algorithm to find the shortest path between start and goal.
+    Returns the list of nodes in the path from start to goal. Without a grid
+    an empty GRID_WIDTH x GRID_HEIGHT map is searched. heuristic is passed on
+    to GridPlanner.search, e.g. a distance field from DistanceFieldCache.
+    mode "jps" searches with Jump Point Search instead, which finds a path of
+    the same length while expanding far fewer nodes on open floor, and
+    "jps8" does so with diagonal moves (see JumpPointPlanner); heuristic and
+    costs are not used by either.
+    """
+    global _default_grid
+    if grid is None:
+        if _default_grid is None:
+            _default_grid = OccupancyGrid(GRID_WIDTH, GRID_HEIGHT)
+        grid = _default_grid
+    if mode == "jps" or mode == "jps8":
+        return get_jump_planner(grid).search(start, goal, mask, diagonal=mode == "jps8")
+    if mode != "astar":
+        raise ValueError(f"Unknown search mode {mode!r}")
+    return get_planner(grid).search(start, goal, mask, heuristic, costs)
+
+def get_neighbors(position):
+    """
+    Returns the list of valid neighboring positions.
+    This assumes movement is allowed in 4 directions (up, down, left, right).
+    """
+    x, y = position
+    neighbors = [(x+1, y), (x-1, y), (x, y+1), (x, y-1)]
+    return neighbors
+
+def is_valid(position, grid=None, mask=BLOCKING):
+    """
+    Determines if the position is valid (i.e., it is within the bounds of the grid and not an obstacle).
+    """
+    if grid is not None:
+        return grid.is_free(position, mask)
+    x, y = position
+    if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            return True
+    return False
@@ -0,0 +1,201 @@
+import heapq
+import math
+from collections import OrderedDict
+import numpy as np
+from .grid import BLOCKING, OBSTACLE
+
+# Default memory budget for cached fields (bytes)
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+
+def bfs_distance_field(grid, goal, mask=BLOCKING, dtype=np.uint32):
+    """
+    Breadth-first search outward from goal over every cell not flagged in
+    mask. Returns a flat array of exact step counts to goal, indexed like
+    grid.cells, with unreachable cells set to the dtype's maximum value. Each
+    BFS layer is expanded as one NumPy operation over the whole frontier.
+    """
+    width = grid.width
+    unreachable = np.iinfo(dtype).max
+    field = np.full(grid.size, unreachable, dtype=dtype)
+    goal_index = grid.index(goal)
+    if grid.cells[goal_index] & OBSTACLE:
+        return field
+
+    passable = (np.frombuffer(grid.cells, dtype=np.uint8) & mask) == 0
+    column = np.arange(grid.size) % width
+    field[goal_index] = 0
+    frontier = np.array([goal_index])
+    distance = 0
+    while frontier.size:
+        distance += 1
+        x = column[frontier]
+        neighbors = np.concatenate((
+            frontier[x + 1 < width] + 1,
+            frontier[x > 0] - 1,
+            frontier + width,
+            frontier - width,
+        ))
+        neighbors = neighbors[(neighbors >= 0) & (neighbors < grid.size)]
+        neighbors = neighbors[passable[neighbors] & (field[neighbors] == unreachable)]
+        frontier = np.unique(neighbors)
+        field[frontier] = distance
+    return field
+
+
+def cost_distance_field(grid, goal, costs, mask=BLOCKING):
+    """
+    Dijkstra outward from goal where entering a cell costs one step plus
+    costs[cell]. Returns a list of the cheapest costs to goal, indexed like
+    grid.cells; cells flagged in mask get the cost of leaving them through
+    a neighbour (like a robot parked under a shelf) and unreachable cells
+    get 0, so the field stays an admissible heuristic everywhere.
+    """
+    width = grid.width
+    size = grid.size
+    cells = grid.cells
+    field = [math.inf] * size
+    goal_index = grid.index(goal)
+    if cells[goal_index] & OBSTACLE:
+        return [0.0] * size
+    field[goal_index] = 0.0
+    open_set = [(0.0, goal_index)]
+    while open_set:
+        cost, current = heapq.heappop(open_set)
+        if cost > field[current]:
+            continue
+        # Blocked cells can be left but not passed through
+        if cells[current] & mask and current != goal_index:
+            continue
+        cost += 1 + costs[current]
+        x = current % width
+        for neighbor in (
+            current + 1 if x + 1 < width else -1,
+            current - 1 if x > 0 else -1,
+            current + width if current + width < size else -1,
+            current - width,
+        ):
+            if neighbor >= 0 and cost < field[neighbor]:
+                field[neighbor] = cost
+                heapq.heappush(open_set, (cost, neighbor))
+    return [0.0 if cost == math.inf else cost for cost in field]
+
+
+class DistanceFieldCache:
+    """
+    LRU cache of goal-rooted BFS distance fields over an OccupancyGrid. Fields
+    give exact travel costs to their goal in O(1) and serve as a perfect A*
+    heuristic. The cache listens to the grid and drops only the fields a map
+    edit can actually change; least recently used fields are evicted once the
+    cached arrays exceed budget bytes.
+    """
+    def __init__(self, grid, budget=DEFAULT_BUDGET):
+        self.grid = grid
+        self.budget = budget
+        self.dtype = np.uint16 if grid.size < np.iinfo(np.uint16).max else np.uint32
+        self.unreachable = int(np.iinfo(self.dtype).max)
+        self.fields = OrderedDict()  # (goal_index, mask) -> field
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        grid.listeners.append(self.on_grid_changed)
+
+    def get(self, goal, mask=BLOCKING, compute=True):
+        """
+        Returns the distance field rooted at goal, computing it if needed.
+        With compute=False only an already cached field is returned (or None).
+        """
+        key = (self.grid.index(goal), mask)
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            self.hits += 1
+            return field
+        if not compute:
+            return None
+        self.misses += 1
+        field = bfs_distance_field(self.grid, goal, mask, self.dtype)
+        self.fields[key] = field
+        self.nbytes += field.nbytes
+        self.evict()
+        return field
+
+    def warm(self, goals, mask=BLOCKING):
+        """
+        Precomputes fields for goals such as pick stations, drop points and
+        shelf cells.
+        """
+        for goal in goals:
+            self.get(goal, mask)
+
+    def distance(self, start, goal, mask=BLOCKING):
+        """
+        Exact number of steps from start to goal, or None if unreachable.
+        A start on a blocked cell (e.g. a robot parked under a shelf) may still
+        leave through any passable neighbour.
+        """
+        field = self.get(goal, mask)
+        grid = self.grid
+        index = grid.index(start)
+        distance = int(field[index])
+        if distance == self.unreachable and grid.cells[index] & mask:
+            x, y = start
+            candidates = [int(field[grid.index(n)]) for n in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                          if grid.in_bounds(n)]
+            distance = min(candidates, default=self.unreachable)
+            if distance != self.unreachable:
+                distance += 1
+        return None if distance == self.unreachable else distance
+
+    def evict(self):
+        while self.nbytes > self.budget and len(self.fields) > 1:
+            _, field = self.fields.popitem(last=False)
+            self.nbytes -= field.nbytes
+
+    def invalidate(self, key):
+        field = self.fields.pop(key)
+        self.nbytes -= field.nbytes
+
+    def clear(self):
+        self.fields.clear()
+        self.nbytes = 0
+
+    def on_grid_changed(self, index, old_flags, new_flags):
+        """
+        Drops the fields affected by a change of the cell at index. Blocking a
+        cell only matters to fields that reached it; opening a cell only
+        matters to fields that reach one of its neighbours. A bulk update
+        drops every field.
+        """
+        if not self.fields:
+            return
+        if index is None:
+            self.clear()
+            return
+        grid = self.grid
+        width = grid.width
+        x = index % width
+        neighbors = [n for n in (
+            index + 1 if x + 1 < width else -1,
+            index - 1 if x > 0 else -1,
+            index + width if index + width < grid.size else -1,
+            index - width,
+        ) if n >= 0]
+        unreachable = self.unreachable
+        for key in list(self.fields):
+            goal_index, mask = key
+            was_blocked = bool(old_flags & mask)
+            is_blocked = bool(new_flags & mask)
+            if goal_index == index:
+                if (old_flags ^ new_flags) & OBSTACLE:
+                    self.invalidate(key)
+                continue
+            if was_blocked == is_blocked:
+                continue
+            field = self.fields[key]
+            if is_blocked:
+                stale = field[index] != unreachable
+            else:
+                stale = any(field[n] != unreachable for n in neighbors)
+            if stale:
+                self.invalidate(key)
@@ -0,0 +1,145 @@
+import heapq
+from .grid import BLOCKING
+
+INFINITY = float("inf")
+
+
+class DStarLite:
+    """
+    D* Lite (Koenig & Likhachev) for one robot on an OccupancyGrid. The search
+    runs backwards from the goal and keeps its g/rhs values between calls, so
+    after the map changes (update_cells) or the robot moves (move_to) only the
+    part of the search the change actually affects is redone. Entering a cell
+    costs 1 unless it carries a flag in mask; the goal can always be entered.
+    """
+    def __init__(self, grid, start, goal, mask=BLOCKING):
+        self.grid = grid
+        self.mask = mask
+        self.start = grid.index(start)
+        self.goal = grid.index(goal)
+        self.last = self.start  # start when the keys were last corrected by km
+        self.km = 0
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self.queue = []
+        self.queued = {}  # cell -> key of its live queue entry
+        self.expansions = 0  # nodes expanded by all compute_path() calls
+        self.push(self.goal)
+
+    def heuristic(self, a, b):
+        width = self.grid.width
+        ay, ax = divmod(a, width)
+        by, bx = divmod(b, width)
+        return abs(ax - bx) + abs(ay - by)
+
+    def key(self, cell):
+        best = min(self.g.get(cell, INFINITY), self.rhs.get(cell, INFINITY))
+        return (best + self.heuristic(self.start, cell) + self.km, best)
+
+    def push(self, cell):
+        key = self.key(cell)
+        self.queued[cell] = key
+        heapq.heappush(self.queue, (key, cell))
+
+    def neighbors(self, cell):
+        grid = self.grid
+        width = grid.width
+        x = cell % width
+        if x + 1 < width:
+            yield cell + 1
+        if x > 0:
+            yield cell - 1
+        if cell + width < grid.size:
+            yield cell + width
+        if cell >= width:
+            yield cell - width
+
+    def passable(self, cell):
+        return cell == self.goal or not self.grid.cells[cell] & self.mask
+
+    def update_vertex(self, cell):
+        if cell != self.goal:
+            best = INFINITY
+            g = self.g
+            for neighbor in self.neighbors(cell):
+                if self.passable(neighbor):
+                    cost = 1 + g.get(neighbor, INFINITY)
+                    if cost < best:
+                        best = cost
+            self.rhs[cell] = best
+        self.queued.pop(cell, None)
+        if self.g.get(cell, INFINITY) != self.rhs.get(cell, INFINITY):
+            self.push(cell)
+
+    def top_key(self):
+        queue = self.queue
+        while queue and self.queued.get(queue[0][1]) != queue[0][0]:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else (INFINITY, INFINITY)
+
+    def compute_path(self):
+        """
+        Brings the search up to date and returns the path from the current
+        start to the goal (both included), or an empty list if there is none.
+        """
+        start = self.start
+        g = self.g
+        rhs = self.rhs
+        while self.top_key() < self.key(start) or rhs.get(start, INFINITY) != g.get(start, INFINITY):
+            old_key, cell = heapq.heappop(self.queue)
+            del self.queued[cell]
+            self.expansions += 1
+            new_key = self.key(cell)
+            if old_key < new_key:
+                self.push(cell)
+            elif g.get(cell, INFINITY) > rhs.get(cell, INFINITY):
+                g[cell] = rhs[cell]
+                for neighbor in self.neighbors(cell):
+                    self.update_vertex(neighbor)
+            else:
+                g[cell] = INFINITY
+                self.update_vertex(cell)
+                for neighbor in self.neighbors(cell):
+                    self.update_vertex(neighbor)
+        return self.path()
+
+    def path(self):
+        g = self.g
+        cell = self.start
+        if g.get(cell, INFINITY) == INFINITY:
+            return []
+        position = self.grid.position
+        path = [position(cell)]
+        while cell != self.goal:
+            best = None
+            best_cost = INFINITY
+            for neighbor in self.neighbors(cell):
+                if self.passable(neighbor):
+                    cost = g.get(neighbor, INFINITY)
+                    if cost < best_cost:
+                        best, best_cost = neighbor, cost
+            if best is None or len(path) > self.grid.size:
+                return []
+            cell = best
+            path.append(position(cell))
+        return path
+
+    def move_to(self, position):
+        """
+        Tells the search the robot is now at position.
+        """
+        cell = self.grid.index(position)
+        if cell != self.start:
+            self.start = cell
+            self.km += self.heuristic(self.last, cell)
+            self.last = cell
+
+    def update_cells(self, cells):
+        """
+        Repairs the search after the flags of the given flat cell indices
+        changed. Only cells next to a change are touched; the next
+        compute_path() call propagates the difference.
+        """
+        for cell in cells:
+            for neighbor in self.neighbors(cell):
+                self.update_vertex(neighbor)
@@ -0,0 +1,108 @@
+import numpy as np
+
+# Cell flags stored in OccupancyGrid.cells
+FREE = 0
+OBSTACLE = 1
+SHELF = 2
+
+# Flags a planner treats as impassable unless told otherwise
+BLOCKING = OBSTACLE | SHELF
+
+
+class OccupancyGrid:
+    """
+    Static map of the warehouse floor. Cells are stored row-major in a flat
+    bytearray (index = y * width + x) holding OBSTACLE/SHELF flags, so
+    planners can index it directly from Python while `array` exposes the same
+    memory as a (height, width) NumPy view for bulk operations. cells may be
+    an existing buffer (e.g. a read-only memoryview of shared memory), which
+    is then used without copying.
+    """
+    def __init__(self, width, height, cells=None):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.cells = bytearray(self.size) if cells is None else cells
+        self.array = np.frombuffer(self.cells, dtype=np.uint8).reshape(height, width)
+        self.version = 0  # bumped on every change to the map
+        # Callables notified as listener(index, old_flags, new_flags); after a
+        # bulk update they get one call with all three set to None
+        self.listeners = []
+
+    def index(self, position):
+        x, y = position
+        return y * self.width + x
+
+    def position(self, index):
+        y, x = divmod(index, self.width)
+        return x, y
+
+    def indices(self, positions):
+        """
+        Flat indices of an (n, 2) array of x, y positions.
+        """
+        positions = np.asarray(positions, dtype=np.intp).reshape(-1, 2)
+        x, y = positions[:, 0], positions[:, 1]
+        if positions.size and (x.min() < 0 or y.min() < 0 or x.max() >= self.width or y.max() >= self.height):
+            raise ValueError(f"Cells outside the {self.width}x{self.height} grid")
+        return y * self.width + x
+
+    def in_bounds(self, position):
+        x, y = position
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def flags(self, position):
+        return self.cells[self.index(position)]
+
+    def is_free(self, position, mask=BLOCKING):
+        return self.in_bounds(position) and not self.cells[self.index(position)] & mask
+
+    def set_flag(self, position, flag):
+        if not self.in_bounds(position):
+            raise ValueError(f"Cell {position} is outside the {self.width}x{self.height} grid")
+        index = self.index(position)
+        old_flags = self.cells[index]
+        if not old_flags & flag:
+            self.cells[index] = old_flags | flag
+            self.changed(index, old_flags)
+
+    def clear_flag(self, position, flag):
+        if not self.in_bounds(position):
+            raise ValueError(f"Cell {position} is outside the {self.width}x{self.height} grid")
+        index = self.index(position)
+        old_flags = self.cells[index]
+        if old_flags & flag:
+            self.cells[index] = old_flags & ~flag & 0xFF
+            self.changed(index, old_flags)
+
+    def set_flags(self, indices, flag):
+        """
+        set_flag for an array of flat cell indices in one vectorized update.
+        Listeners are told once that the map changed wholesale rather than
+        once per cell.
+        """
+        flat = self.array.reshape(-1)
+        indices = np.asarray(indices, dtype=np.intp)
+        if indices.size and (indices.min() < 0 or indices.max() >= self.size):
+            raise ValueError(f"Cells outside the {self.width}x{self.height} grid")
+        if np.any(flat[indices] & flag != flag):
+            flat[indices] |= flag
+            self.changed(None, None)
+
+    def clear_flags(self, indices, flag):
+        """
+        clear_flag for an array of flat cell indices, like set_flags.
+        """
+        flat = self.array.reshape(-1)
+        indices = np.asarray(indices, dtype=np.intp)
+        if indices.size and (indices.min() < 0 or indices.max() >= self.size):
+            raise ValueError(f"Cells outside the {self.width}x{self.height} grid")
+        if np.any(flat[indices] & flag):
+            flat[indices] &= ~flag & 0xFF
+            self.changed(None, None)
+
+    def changed(self, index, old_flags):
+        self.version += 1
+        new_flags = None if index is None else self.cells[index]
+        for listener in self.listeners:
+            listener(index, old_flags, new_flags)
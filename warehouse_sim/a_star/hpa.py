@@ -0,0 +1,417 @@
+import heapq
+from collections import deque
+from .grid import BLOCKING, OBSTACLE
+
+# Default cluster width and height in cells
+CLUSTER_SIZE = 16
+
+# Entrances at least this wide get a transition at both ends instead of one in the middle
+WIDE_ENTRANCE = 6
+
+
+class HierarchicalPlanner:
+    """
+    HPA* (Botea et al.) over an OccupancyGrid. The grid is split into square
+    clusters; maximal open stretches along each cluster border become
+    entrances with one or two transition cells on either side. Transitions
+    are the nodes of an abstract graph whose edges are the single steps across
+    borders plus the travel cost between the nodes of the same cluster.
+    Long-haul queries are answered on that graph and only the segments that
+    are walked get refined back into cells.
+
+    Intra-cluster costs are computed the first time a search touches a
+    cluster (or up front with warm()). The planner listens to the grid: a map
+    edit only marks the border and cluster it lies in for rebuilding, which
+    happens lazily at the next query.
+    """
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE, mask=BLOCKING):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.mask = mask
+        self.clusters_x = -(-grid.width // cluster_size)
+        self.clusters_y = -(-grid.height // cluster_size)
+        self.expansions = 0  # abstract nodes expanded by the last search
+        self.reset()
+        grid.listeners.append(self.on_grid_changed)
+
+    def reset(self):
+        """
+        Forgets the abstract graph; every border is rebuilt on the next query.
+        """
+        self.transitions = {}  # (cluster, direction) -> [(cell, cell across the border)], direction 0 east, 1 south
+        self.nodes = {}  # cluster -> set of transition cells inside it
+        self.inter = {}  # cell -> {cell across the border: 1}
+        self.intra = {}  # cluster -> {cell: {cell in the same cluster or across a border: cost}}
+        self.paths = {}  # cluster -> {(cell, cell): refined cells}
+        self.dirty_borders = set()
+        self.dirty_clusters = set()
+        for cluster in range(self.clusters_x * self.clusters_y):
+            self.nodes[cluster] = set()
+            self.dirty_borders.update(((cluster, 0), (cluster, 1)))
+
+    def cluster_of(self, index):
+        y, x = divmod(index, self.grid.width)
+        return (y // self.cluster_size) * self.clusters_x + x // self.cluster_size
+
+    def bounds(self, cluster):
+        cy, cx = divmod(cluster, self.clusters_x)
+        size = self.cluster_size
+        return (cx * size, cy * size, min(self.grid.width, (cx + 1) * size),
+                min(self.grid.height, (cy + 1) * size))
+
+    def on_grid_changed(self, index, old_flags, new_flags):
+        if index is None:
+            self.reset()
+        elif (old_flags ^ new_flags) & self.mask:
+            self.invalidate(index)
+
+    def invalidate(self, index):
+        """
+        Marks the cluster of a changed cell, and any border the cell lies on,
+        for rebuilding.
+        """
+        cluster = self.cluster_of(index)
+        x0, y0, x1, y1 = self.bounds(cluster)
+        y, x = divmod(index, self.grid.width)
+        self.intra.pop(cluster, None)
+        self.paths.pop(cluster, None)
+        if x == x1 - 1:
+            self.dirty_borders.add((cluster, 0))
+        if y == y1 - 1:
+            self.dirty_borders.add((cluster, 1))
+        if x == x0 and x0 > 0:
+            self.dirty_borders.add((cluster - 1, 0))
+        if y == y0 and y0 > 0:
+            self.dirty_borders.add((cluster - self.clusters_x, 1))
+
+    def find_transitions(self, cluster, direction):
+        """
+        Transition pairs across the east (0) or south (1) border of cluster.
+        """
+        grid = self.grid
+        cells = grid.cells
+        mask = self.mask
+        x0, y0, x1, y1 = self.bounds(cluster)
+        if direction == 0:
+            if x1 >= grid.width:
+                return []
+            step = grid.width
+            first = y0 * grid.width + x1 - 1
+            length = y1 - y0
+            across = 1
+        else:
+            if y1 >= grid.height:
+                return []
+            step = 1
+            first = (y1 - 1) * grid.width + x0
+            length = x1 - x0
+            across = grid.width
+
+        transitions = []
+        run = []
+        for i in range(length + 1):
+            cell = first + i * step
+            if i < length and not cells[cell] & mask and not cells[cell + across] & mask:
+                run.append(cell)
+                continue
+            if len(run) >= WIDE_ENTRANCE:
+                transitions.extend(((run[0], run[0] + across), (run[-1], run[-1] + across)))
+            elif run:
+                middle = run[len(run) // 2]
+                transitions.append((middle, middle + across))
+            run = []
+        return transitions
+
+    def rebuild(self):
+        """
+        Recomputes the transitions of dirty borders and drops the cached
+        costs of every cluster whose nodes changed.
+        """
+        clusters_x = self.clusters_x
+        for cluster, direction in self.dirty_borders:
+            other = cluster + 1 if direction == 0 else cluster + clusters_x
+            for a, b in self.transitions.pop((cluster, direction), ()):
+                self.inter[a].pop(b, None)
+                self.inter[b].pop(a, None)
+            transitions = self.find_transitions(cluster, direction)
+            if transitions:
+                self.transitions[(cluster, direction)] = transitions
+            for a, b in transitions:
+                self.inter.setdefault(a, {})[b] = 1
+                self.inter.setdefault(b, {})[a] = 1
+            self.dirty_clusters.update((cluster, other))
+        self.dirty_borders.clear()
+
+        for cluster in self.dirty_clusters:
+            if cluster >= len(self.nodes):
+                continue
+            nodes = self.nodes[cluster]
+            for node in nodes:
+                if not self.inter.get(node):
+                    self.inter.pop(node, None)
+            nodes.clear()
+            cy, cx = divmod(cluster, clusters_x)
+            # Own east and south borders list this cluster's cell first, the west and north ones second
+            borders = [((cluster, 0), 0), ((cluster, 1), 0)]
+            if cx > 0:
+                borders.append(((cluster - 1, 0), 1))
+            if cy > 0:
+                borders.append(((cluster - clusters_x, 1), 1))
+            for key, side in borders:
+                for pair in self.transitions.get(key, ()):
+                    nodes.add(pair[side])
+            self.intra.pop(cluster, None)
+            self.paths.pop(cluster, None)
+        self.dirty_clusters.clear()
+
+    def cluster_bfs(self, cluster, source, goal=-1, stop=False):
+        """
+        Breadth-first search from source that stays inside cluster. goal may
+        be entered even if it is flagged in mask; with stop the search ends
+        as soon as goal is reached. Returns the distance and parent dicts of
+        every reached cell.
+        """
+        grid = self.grid
+        width = grid.width
+        cells = grid.cells
+        mask = self.mask
+        x0, y0, x1, y1 = self.bounds(cluster)
+        distance = {source: 0}
+        parent = {source: -1}
+        queue = deque((source,))
+        while queue:
+            current = queue.popleft()
+            y, x = divmod(current, width)
+            cost = distance[current] + 1
+            for neighbor in (
+                current + 1 if x + 1 < x1 else -1,
+                current - 1 if x > x0 else -1,
+                current + width if y + 1 < y1 else -1,
+                current - width if y > y0 else -1,
+            ):
+                if neighbor < 0 or neighbor in distance:
+                    continue
+                if cells[neighbor] & mask and neighbor != goal:
+                    continue
+                distance[neighbor] = cost
+                parent[neighbor] = current
+                if stop and neighbor == goal:
+                    return distance, parent
+                queue.append(neighbor)
+        return distance, parent
+
+    def edges(self, cluster):
+        """
+        Abstract edges of the nodes of cluster: travel costs to the other
+        nodes of the cluster plus the steps across its borders, computed on
+        first use.
+        """
+        edges = self.intra.get(cluster)
+        if edges is None:
+            edges = self.intra[cluster] = {}
+            nodes = self.nodes[cluster]
+            for node in nodes:
+                distance, _ = self.cluster_bfs(cluster, node)
+                edges[node] = {other: distance[other] for other in nodes if other != node and other in distance}
+                edges[node].update(self.inter.get(node, ()))
+        return edges
+
+    def warm(self):
+        """
+        Builds the whole abstract graph up front.
+        """
+        self.rebuild()
+        for cluster in self.nodes:
+            self.edges(cluster)
+
+    def exits(self, index, goal_index):
+        """
+        index plus its neighbours in other clusters that can be entered.
+        Start and goal may be shelf cells, which no transition leads
+        through, so they get their own ways across cluster borders.
+        """
+        grid = self.grid
+        width = grid.width
+        cells = grid.cells
+        cluster = self.cluster_of(index)
+        y, x = divmod(index, width)
+        found = [index]
+        for neighbor in (
+            index + 1 if x + 1 < width else -1,
+            index - 1 if x > 0 else -1,
+            index + width if y + 1 < grid.height else -1,
+            index - width if y > 0 else -1,
+        ):
+            if neighbor < 0 or self.cluster_of(neighbor) == cluster:
+                continue
+            if not cells[neighbor] & self.mask or neighbor == goal_index:
+                found.append(neighbor)
+        return found
+
+    def connect(self, start_index, goal_index):
+        """
+        Temporary edges linking start and goal to the abstract graph, as
+        {cell: {cell: cost}}.
+        """
+        extra = {}
+        for cell in self.exits(start_index, goal_index):
+            if cell != start_index:
+                extra.setdefault(start_index, {})[cell] = 1
+            cluster = self.cluster_of(cell)
+            distance, _ = self.cluster_bfs(cluster, cell, goal_index)
+            edges = extra.setdefault(cell, {})
+            for node in self.nodes[cluster]:
+                if node in distance and node != cell:
+                    edges[node] = distance[node]
+            if goal_index in distance and goal_index != cell:
+                edges[goal_index] = distance[goal_index]
+        for cell in self.exits(goal_index, -1):
+            if cell != goal_index:
+                extra.setdefault(cell, {})[goal_index] = 1
+            cluster = self.cluster_of(cell)
+            distance, _ = self.cluster_bfs(cluster, cell)
+            for node in self.nodes[cluster]:
+                if node in distance and node != cell:
+                    edges = extra.setdefault(node, {})
+                    if distance[node] < edges.get(cell, distance[node] + 1):
+                        edges[cell] = distance[node]
+        return extra
+
+    def abstract_search(self, start, goal):
+        """
+        Returns the abstract path from start to goal as a list of cells
+        (start and goal included) or an empty list if there is none.
+        Consecutive cells are either neighbours or in the same cluster.
+        """
+        grid = self.grid
+        self.expansions = 0
+        if not grid.in_bounds(start) or not grid.in_bounds(goal):
+            return []
+        start_index = grid.index(start)
+        goal_index = grid.index(goal)
+        if grid.cells[goal_index] & OBSTACLE:
+            return []
+        if start_index == goal_index:
+            return [start]
+        if self.dirty_borders or self.dirty_clusters:
+            self.rebuild()
+
+        extra = self.connect(start_index, goal_index)
+
+        width = grid.width
+        goal_y, goal_x = divmod(goal_index, width)
+        size = self.cluster_size
+        clusters_x = self.clusters_x
+        intra = self.intra
+        g_score = {start_index: 0}
+        came_from = {start_index: -1}
+        closed = set()
+        open_set = [(0, 0, start_index)]
+        expansions = 0
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal_index:
+                self.expansions = expansions
+                path = []
+                while current != -1:
+                    path.append(grid.position(current))
+                    current = came_from[current]
+                path.reverse()
+                return path
+            closed.add(current)
+            expansions += 1
+
+            cost = g_score[current]
+            y, x = divmod(current, width)
+            cluster = (y // size) * clusters_x + x // size
+            edges = intra.get(cluster)
+            if edges is None:
+                edges = self.edges(cluster)
+            neighbors = [edges[current]] if current in edges else []
+            if current in extra:
+                neighbors.append(extra[current])
+            for edges in neighbors:
+                for neighbor, step in edges.items():
+                    if neighbor in closed:
+                        continue
+                    tentative_g_score = cost + step
+                    if tentative_g_score < g_score.get(neighbor, tentative_g_score + 1):
+                        g_score[neighbor] = tentative_g_score
+                        came_from[neighbor] = current
+                        y, x = divmod(neighbor, width)
+                        h = abs(x - goal_x) + abs(y - goal_y)
+                        heapq.heappush(open_set, (tentative_g_score + h, h, neighbor))
+
+        self.expansions = expansions
+        return []
+
+    def refine_segment(self, a, b):
+        """
+        Cells leading from a to b (a excluded) for two consecutive cells of
+        an abstract path.
+        """
+        grid = self.grid
+        if abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1:
+            return [b]
+        source = grid.index(a)
+        target = grid.index(b)
+        cluster = self.cluster_of(source)
+        paths = self.paths.setdefault(cluster, {})
+        segment = paths.get((source, target))
+        if segment is None:
+            segment = self.corner_path(a, b)
+        if segment is None:
+            _, parent = self.cluster_bfs(cluster, source, target, stop=True)
+            segment = []
+            current = target
+            while current != source:
+                segment.append(grid.position(current))
+                current = parent[current]
+            segment.reverse()
+            nodes = self.nodes[cluster]
+            if source in nodes and target in nodes:
+                paths[(source, target)] = segment
+        return segment
+
+    def corner_path(self, a, b):
+        """
+        Shortest path from a to b (a excluded) with at most one turn, or None
+        if both such paths are blocked. Open floor needs no search at all.
+        """
+        cells = self.grid.cells
+        width = self.grid.width
+        mask = self.mask
+        step_x = 1 if b[0] > a[0] else -1
+        step_y = 1 if b[1] > a[1] else -1
+        along_x = [(x, a[1]) for x in range(a[0] + step_x, b[0] + step_x, step_x)] if a[0] != b[0] else []
+        along_y = [(a[0], y) for y in range(a[1] + step_y, b[1] + step_y, step_y)] if a[1] != b[1] else []
+        for first, second in ((along_x, along_y), (along_y, along_x)):
+            if first and second:
+                # Shift the second leg to start from the corner
+                dx, dy = first[-1][0] - a[0], first[-1][1] - a[1]
+                second = [(x + dx, y + dy) for x, y in second]
+            path = first + second
+            if all(not cells[y * width + x] & mask for x, y in path[:-1]):
+                return path
+        return None
+
+    def refine(self, abstract_path):
+        """
+        Yields the cells of an abstract path one segment at a time, so only
+        the part of a long path that is actually consumed gets refined.
+        """
+        if not abstract_path:
+            return
+        yield abstract_path[0]
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            yield from self.refine_segment(a, b)
+
+    def search(self, start, goal):
+        """
+        Returns the full path from start to goal (both included), or an empty
+        list if the goal cannot be reached. Paths are near-optimal: they pass
+        through the transition cells of every cluster border they cross.
+        """
+        return list(self.refine(self.abstract_search(start, goal)))
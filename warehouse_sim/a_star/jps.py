@@ -0,0 +1,337 @@
+import heapq
+import math
+import weakref
+import numpy as np
+from .grid import OBSTACLE, BLOCKING
+
+SQRT2 = math.sqrt(2)
+
+
+def stop_distances(points, blocked):
+    """
+    For every cell of each row, scanning towards higher x: the distance to
+    the first cell after it in points, or, if a blocked cell or the end of
+    the row comes first, minus the number of free cells in between.
+    """
+    rows, width = points.shape
+    positions = np.where(points | blocked, np.arange(width), width)
+    following = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    following = np.concatenate((following[:, 1:], np.full((rows, 1), width)), axis=1)
+    distance = following - np.arange(width)
+    hit = np.take_along_axis(points, np.minimum(following, width - 1), axis=1) & (following < width)
+    return np.where(hit, distance, 1 - distance)
+
+
+def jump_points(blocked, rows):
+    """
+    Forward and backward jump points along the given rows of a boolean
+    (rows, columns) array of blocked cells, and the blocked cells of those
+    rows. A cell is a jump point for a direction if it is free and a free
+    cell beside it has a wall behind it, seen in the direction of travel.
+    """
+    height, width = blocked.shape
+    padded = np.ones((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = blocked
+    here = padded[rows + 1, 1:-1]
+    before = padded[rows]
+    after = padded[rows + 2]
+    free = ~here
+    forward = free & ((~before[:, 1:-1] & before[:, :-2]) | (~after[:, 1:-1] & after[:, :-2]))
+    backward = free & ((~before[:, 1:-1] & before[:, 2:]) | (~after[:, 1:-1] & after[:, 2:]))
+    return forward, backward, here
+
+
+def jump_distances(blocked, rows, turns=None):
+    """
+    Forward and backward jump distances along the given rows of a boolean
+    (rows, columns) array of blocked cells. Cells set in the boolean array
+    turns, shaped like the rows, count as jump points in both directions.
+    """
+    forward, backward, here = jump_points(blocked, rows)
+    if turns is not None:
+        forward = forward | turns
+        backward = backward | turns
+    return stop_distances(forward, here), stop_distances(backward[:, ::-1], here[:, ::-1])[:, ::-1]
+
+
+class JumpPointPlanner:
+    """
+    Jump Point Search (Harabor & Grastien) on an OccupancyGrid, 4-connected
+    or, with diagonal, 8-connected without cutting corners. Straight runs
+    of open floor are jumped over instead of expanded, so on open areas only
+    a few nodes per turn reach the heap. As in JPS+, the straight jumps from
+    every cell are precomputed per mask: the distance to the next jump point,
+    or minus the free cells up to the next wall. The tables listen to the
+    grid and only the rows and columns around a changed cell are rebuilt, at
+    the next search. Paths are the same length as GridPlanner's (Euclidean
+    with diagonals) and use the same conventions: cells carrying any flag in
+    mask are impassable except the goal.
+
+    A 4-connected vertical run also has to stop wherever a horizontal jump
+    from it finds something, as that is where it can turn. Those stops get
+    tables of their own. They depend on whole rows, so after a change they
+    are recomputed in one vectorized pass, but only the entries that
+    differ are written back.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.tables = {}  # mask -> (east, west, south, north) flat lists of jump distances
+        self.turn_tables = {}  # mask -> (turns, south, north, south list, north list) for 4-connected runs
+        self.turn_rows = {}  # mask -> rows whose horizontal jumps changed since the turn tables were built
+        self.dirty = {}  # mask -> (rows, columns) to rebuild, None for all of them
+        self.expansions = 0  # nodes expanded by the last search
+        grid.listeners.append(self.on_grid_changed)
+
+    def on_grid_changed(self, index, old_flags, new_flags):
+        for mask, dirty in self.dirty.items():
+            if dirty is None:
+                continue
+            if index is None:
+                self.dirty[mask] = None
+            elif (old_flags ^ new_flags) & mask:
+                y, x = divmod(index, self.grid.width)
+                dirty[0].update((y - 1, y, y + 1))
+                dirty[1].update((x - 1, x, x + 1))
+
+    def table(self, mask):
+        grid = self.grid
+        width = grid.width
+        dirty = self.dirty.get(mask)
+        if mask not in self.tables or dirty is None:
+            blocked = grid.array & mask != 0
+            east, west = jump_distances(blocked, np.arange(grid.height))
+            south, north = jump_distances(blocked.T, np.arange(width))
+            self.tables[mask] = (east.ravel().tolist(), west.ravel().tolist(),
+                                 south.T.ravel().tolist(), north.T.ravel().tolist())
+        elif dirty[0] or dirty[1]:
+            blocked = grid.array & mask != 0
+            east_table, west_table, south_table, north_table = self.tables[mask]
+            rows = sorted(y for y in dirty[0] if 0 <= y < grid.height)
+            east, west = jump_distances(blocked, np.array(rows, dtype=np.intp))
+            for i, y in enumerate(rows):
+                east_table[y * width:(y + 1) * width] = east[i].tolist()
+                west_table[y * width:(y + 1) * width] = west[i].tolist()
+            columns = sorted(x for x in dirty[1] if 0 <= x < width)
+            south, north = jump_distances(blocked.T, np.array(columns, dtype=np.intp))
+            for i, x in enumerate(columns):
+                south_table[x::width] = south[i].tolist()
+                north_table[x::width] = north[i].tolist()
+            if mask in self.turn_tables:
+                self.turn_rows.setdefault(mask, set()).update(rows)
+        else:
+            return self.tables[mask]
+        if dirty is None:
+            self.turn_tables.pop(mask, None)
+        self.dirty[mask] = (set(), set())
+        return self.tables[mask]
+
+    def turn_table(self, mask):
+        """
+        (south, north) flat lists of vertical jump distances for 4-connected
+        searches, where every cell with a horizontal jump point ahead of it
+        in its row is a jump point as well. Call after table(mask).
+        """
+        grid = self.grid
+        tables = self.turn_tables.get(mask)
+        rows = self.turn_rows.pop(mask, None)
+        if tables is not None and not rows:
+            return tables[3], tables[4]
+        blocked = grid.array & mask != 0
+        if tables is None:
+            east, west = jump_distances(blocked, np.arange(grid.height))
+            turns = ((east > 0) | (west > 0)) & ~blocked
+        else:
+            turns = tables[0]
+            rows = np.array(sorted(rows), dtype=np.intp)
+            east, west = jump_distances(blocked, rows)
+            turns[rows] = ((east > 0) | (west > 0)) & ~blocked[rows]
+        south, north = jump_distances(blocked.T, np.arange(grid.width), turns.T)
+        south, north = np.ascontiguousarray(south.T), np.ascontiguousarray(north.T)
+        if tables is None:
+            tables = (turns, south, north, south.ravel().tolist(), north.ravel().tolist())
+        else:
+            for new, old, flat in ((south, tables[1], tables[3]), (north, tables[2], tables[4])):
+                changed = np.flatnonzero(new != old)
+                for index, value in zip(changed.tolist(), new.ravel()[changed].tolist()):
+                    flat[index] = value
+            tables = (turns, south, north, tables[3], tables[4])
+        self.turn_tables[mask] = tables
+        return tables[3], tables[4]
+
+    def search(self, start, goal, mask=BLOCKING, diagonal=False):
+        """
+        Returns the list of cells from start to goal (both included), or an
+        empty list if the goal cannot be reached. With diagonal, consecutive
+        cells may also be diagonal neighbours.
+        """
+        grid = self.grid
+        self.expansions = 0
+        if not grid.in_bounds(start) or not grid.in_bounds(goal):
+            return []
+        width = grid.width
+        size = grid.size
+        cells = grid.cells
+        start_index = grid.index(start)
+        goal_index = grid.index(goal)
+        if cells[goal_index] & OBSTACLE:
+            return []
+        if start_index == goal_index:
+            return [start]
+        east, west, south, north = self.table(mask)
+        if not diagonal:
+            south, north = self.turn_table(mask)
+        goal_x, goal_y = goal
+        # A goal behind a wall (e.g. a shelf) is entered from a neighbour, so scans stop next to it
+        goal_blocked = bool(cells[goal_index] & mask)
+        beside = (-1, 0, 1) if diagonal else (0,)
+        near_goal = set()
+        if goal_blocked:
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    x, y = goal_x + dx, goal_y + dy
+                    if (dx or dy) and (diagonal or not (dx and dy)) and 0 <= x < width and 0 <= y < grid.height:
+                        near_goal.add(y * width + x)
+
+        def walkable(index):
+            return not cells[index] & mask or index == goal_index
+
+        def jump_straight(index, value, along, across, goal_along, goal_across, sign, stride):
+            # First stop after index given its table entry, or -1; along and
+            # across are its coordinates along and across the line of travel
+            reach = value if value > 0 else -value
+            best = value if value > 0 else None
+            if across == goal_across:
+                k = (goal_along - along) * sign
+                if 0 < k <= reach or (value <= 0 and k == reach + 1):
+                    best = k
+            elif goal_blocked and abs(goal_across - across) == 1:
+                for offset in beside:
+                    k = (goal_along + offset - along) * sign
+                    if 0 < k <= reach and (best is None or k < best):
+                        best = k
+            return -1 if best is None else index + sign * stride * best
+
+        def jump_horizontal(index, dx):
+            y, x = divmod(index, width)
+            value = (east if dx > 0 else west)[index]
+            return jump_straight(index, value, x, y, goal_x, goal_y, dx, 1)
+
+        def jump_vertical(index, dy):
+            y, x = divmod(index, width)
+            value = (south if dy > 0 else north)[index]
+            stop = jump_straight(index, value, y, x, goal_y, goal_x, dy, width)
+            if diagonal:
+                return stop
+            # 4-connected, the table already stops where a horizontal jump finds
+            # a jump point; one finding the goal can only start next to its row
+            reach = value if value > 0 else -value
+            best = reach + 1 if stop < 0 else (stop - index) // (dy * width)
+            for row in ((goal_y - 1, goal_y, goal_y + 1) if dy > 0 else (goal_y + 1, goal_y, goal_y - 1)):
+                k = (row - y) * dy
+                if 0 < k <= reach and k < best:
+                    turn = index + dy * width * k
+                    if jump_horizontal(turn, 1) >= 0 or jump_horizontal(turn, -1) >= 0:
+                        return turn
+            return stop
+
+        def jump_diagonal(index, dx, dy):
+            step = width * dy
+            while True:
+                x = index % width
+                if not 0 <= x + dx < width or not 0 <= index + step < size:
+                    return -1
+                if not walkable(index + dx) or not walkable(index + step) or not walkable(index + dx + step):
+                    return -1
+                index += dx + step
+                if index == goal_index or index in near_goal:
+                    return index
+                if jump_horizontal(index, dx) >= 0 or jump_vertical(index, dy) >= 0:
+                    return index
+
+        def directions(index, parent):
+            if parent < 0:
+                if diagonal:
+                    return ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+                return (1, 0), (-1, 0), (0, 1), (0, -1)
+            y, x = divmod(index, width)
+            parent_y, parent_x = divmod(parent, width)
+            dx = (x > parent_x) - (x < parent_x)
+            dy = (y > parent_y) - (y < parent_y)
+            if not diagonal:
+                return ((dx, 0), (0, 1), (0, -1)) if dx else ((0, dy), (1, 0), (-1, 0))
+            if dx and dy:
+                return (dx, 0), (0, dy), (dx, dy)
+            if dx:
+                return (dx, 0), (0, 1), (0, -1), (dx, 1), (dx, -1)
+            return (0, dy), (1, 0), (-1, 0), (1, dy), (-1, dy)
+
+        def estimate(index):
+            y, x = divmod(index, width)
+            dx, dy = abs(x - goal_x), abs(y - goal_y)
+            if diagonal:
+                return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+            return dx + dy
+
+        g_score = {start_index: 0}
+        came_from = {start_index: -1}
+        closed = set()
+        h = estimate(start_index)
+        open_set = [(h, h, start_index)]
+        expansions = 0
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal_index:
+                self.expansions = expansions
+                return self.reconstruct_path(current, came_from)
+            closed.add(current)
+            expansions += 1
+            for dx, dy in directions(current, came_from[current]):
+                if dx and dy:
+                    successor = jump_diagonal(current, dx, dy)
+                elif dx:
+                    successor = jump_horizontal(current, dx)
+                else:
+                    successor = jump_vertical(current, dy)
+                if successor < 0 or successor in closed:
+                    continue
+                y, x = divmod(successor, width)
+                current_y, current_x = divmod(current, width)
+                run_x, run_y = abs(x - current_x), abs(y - current_y)
+                cost = max(run_x, run_y) + (SQRT2 - 1) * min(run_x, run_y)
+                tentative_g_score = g_score[current] + cost
+                if tentative_g_score < g_score.get(successor, math.inf):
+                    g_score[successor] = tentative_g_score
+                    came_from[successor] = current
+                    h = estimate(successor)
+                    heapq.heappush(open_set, (tentative_g_score + h, h, successor))
+
+        self.expansions = expansions
+        return []
+
+    def reconstruct_path(self, index, came_from):
+        width = self.grid.width
+        position = self.grid.position
+        path = [position(index)]
+        while came_from[index] >= 0:
+            parent = came_from[index]
+            y, x = divmod(index, width)
+            parent_y, parent_x = divmod(parent, width)
+            step = ((parent_x > x) - (parent_x < x)) + ((parent_y > y) - (parent_y < y)) * width
+            while index != parent:
+                index += step
+                path.append(position(index))
+        path.reverse()
+        return path
+
+
+# One jump point planner per grid, dropped together with the grid
+_planners = weakref.WeakKeyDictionary()
+
+
+def get_jump_planner(grid):
+    planner = _planners.get(grid)
+    if planner is None:
+        planner = _planners[grid] = JumpPointPlanner(grid)
+    return planner
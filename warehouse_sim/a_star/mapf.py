@@ -0,0 +1,410 @@
+import heapq
+import math
+import time
+from collections import deque
+from .grid import BLOCKING, OBSTACLE
+from .distance_fields import cost_distance_field
+
+# Steps between sweeps that drop reservations lying in the past
+PRUNE_INTERVAL = 64
+
+# Times a request is tried before its agent is reported as failed; a retry
+# runs after the other queued agents, which may have cleared the way
+MAX_ATTEMPTS = 2
+
+
+class ReservationTable:
+    """
+    Space-time reservations of all planned agents on an OccupancyGrid. Time is
+    measured in integer steps (one cell move or wait per step).
+    - vertices[cell][t] = agent occupying cell at step t
+    - edges[(a, b, t)] = agent moving from cell a to cell b between t and t + 1
+    - holds[cell] = (t, agent) for an agent parked at cell from step t onwards
+    Without following, an agent may also not enter a cell that another agent
+    only leaves in the same step, nor be on a cell in the step before another
+    agent enters it, which keeps a cell of space between agents driving in a
+    line whichever of them was planned first.
+    """
+    def __init__(self, following=True):
+        self.following = following
+        self.vertices = {}
+        self.edges = {}
+        self.holds = {}
+        self.owned = {}  # agent -> (vertex keys, edge keys, held cell)
+        self.pruned_at = 0
+
+    def is_free(self, cell, t, agent):
+        hold = self.holds.get(cell)
+        if hold is not None and hold[0] <= t and hold[1] != agent:
+            return False
+        times = self.vertices.get(cell)
+        if times is not None:
+            owner = times.get(t, agent)
+            if owner != agent:
+                return False
+        return True
+
+    def can_move(self, a, b, t, agent):
+        """
+        True if agent may go from cell a at step t to cell b at step t + 1
+        without a vertex conflict at b or swapping places with another agent
+        (or, without following, entering b while another agent is still on it
+        or staying on b while another agent enters it).
+        """
+        if not self.is_free(b, t + 1, agent):
+            return False
+        if not self.following:
+            if a != b and not self.is_free(b, t, agent):
+                return False
+            if not self.is_free(b, t + 2, agent):
+                return False
+        if a != b:
+            owner = self.edges.get((b, a, t), agent)
+            if owner != agent:
+                return False
+        return True
+
+    def latest(self, cell, agent):
+        """
+        Last step at which another agent passes through cell, or None if the
+        cell is free from now on. Parking on a cell another agent holds is
+        never possible, signalled by float("inf").
+        """
+        hold = self.holds.get(cell)
+        if hold is not None and hold[1] != agent:
+            return float("inf")
+        times = self.vertices.get(cell)
+        if not times:
+            return None
+        others = [t for t, owner in times.items() if owner != agent]
+        return max(others) if others else None
+
+    def path_is_free(self, agent, path, start_time):
+        """
+        True if agent can follow path (flat cell indices, one per step from
+        start_time) and then park on its last cell without a conflict, e.g.
+        for a path planned against an older copy of the table.
+        """
+        t = start_time
+        for a, b in zip(path, path[1:]):
+            if not self.can_move(a, b, t, agent):
+                return False
+            t += 1
+        latest = self.latest(path[-1], agent)
+        return latest is None or latest < t
+
+    def reserve_path(self, agent, path, start_time):
+        """
+        Reserves path, a list of flat cell indices with one entry per step
+        from start_time, and parks the agent on its last cell afterwards.
+        """
+        vertex_keys, edge_keys, _ = self.owned.setdefault(agent, ([], [], None))
+        t = start_time
+        previous = None
+        for cell in path:
+            self.vertices.setdefault(cell, {})[t] = agent
+            vertex_keys.append((cell, t))
+            if previous is not None and previous != cell:
+                self.edges[(previous, cell, t - 1)] = agent
+                edge_keys.append((previous, cell, t - 1))
+            previous = cell
+            t += 1
+        self.hold(agent, path[-1], t - 1)
+
+    def hold(self, agent, cell, t):
+        vertex_keys, edge_keys, held = self.owned.setdefault(agent, ([], [], None))
+        if held is not None and self.holds.get(held, (None, None))[1] == agent:
+            del self.holds[held]
+        self.holds[cell] = (t, agent)
+        self.owned[agent] = (vertex_keys, edge_keys, cell)
+
+    def release(self, agent, from_time=None):
+        """
+        Removes agent's reservations. With from_time, reservations before that
+        step are kept and a parked agent keeps its cell until from_time, so the
+        agent can be replanned from that step onwards.
+        """
+        if agent not in self.owned:
+            return
+        vertex_keys, edge_keys, held = self.owned.pop(agent)
+        kept_vertices, kept_edges = [], []
+        for cell, t in vertex_keys:
+            if from_time is not None and t < from_time:
+                kept_vertices.append((cell, t))
+                continue
+            times = self.vertices.get(cell)
+            if times is not None and times.get(t) == agent:
+                del times[t]
+                if not times:
+                    del self.vertices[cell]
+        for key in edge_keys:
+            if from_time is not None and key[2] < from_time:
+                kept_edges.append(key)
+            elif self.edges.get(key) == agent:
+                del self.edges[key]
+        if held is not None:
+            hold = self.holds.get(held)
+            if hold is not None and hold[1] == agent:
+                del self.holds[held]
+                if from_time is not None:
+                    for t in range(hold[0], from_time):
+                        self.vertices.setdefault(held, {})[t] = agent
+                        kept_vertices.append((held, t))
+        if kept_vertices or kept_edges:
+            self.owned[agent] = (kept_vertices, kept_edges, None)
+
+    def prune(self, before):
+        """
+        Drops reservations for steps before `before`. Cheap to call every tick:
+        the sweep only runs every PRUNE_INTERVAL steps.
+        """
+        if before - self.pruned_at < PRUNE_INTERVAL:
+            return
+        self.pruned_at = before
+        for agent, (vertex_keys, edge_keys, held) in list(self.owned.items()):
+            for cell, t in vertex_keys:
+                if t < before:
+                    times = self.vertices.get(cell)
+                    if times is not None and times.get(t) == agent:
+                        del times[t]
+                        if not times:
+                            del self.vertices[cell]
+            for key in edge_keys:
+                if key[2] < before and self.edges.get(key) == agent:
+                    del self.edges[key]
+            self.owned[agent] = ([key for key in vertex_keys if key[1] >= before],
+                                 [key for key in edge_keys if key[2] >= before], held)
+
+
+def space_time_search(grid, start, goal, table, agent, start_time=0, mask=BLOCKING,
+                      heuristic=None, max_steps=None, max_expansions=None, stats=None, costs=None):
+    """
+    Cooperative A* for one agent over (cell, step) states, with waiting as an
+    extra action. Returns the list of positions occupied at every step from
+    start_time until the agent can park on goal for good, or an empty list if
+    no such path exists within max_steps / max_expansions. If a stats dict is
+    given, the number of expanded states is stored in stats["expansions"].
+    costs may be a sequence indexed by flat cell index of non-negative extra
+    costs of spending a step on a cell, moving into it or waiting there.
+    """
+    width = grid.width
+    size = grid.size
+    cells = grid.cells
+    start_index = grid.index(start)
+    goal_index = grid.index(goal)
+    if cells[goal_index] & OBSTACLE:
+        return []
+    goal_x, goal_y = goal
+
+    def estimate(index):
+        if heuristic is not None:
+            # Fields of costs are fractional; BFS fields come as NumPy integers
+            return heuristic[index] if costs is not None else int(heuristic[index])
+        y, x = divmod(index, width)
+        return abs(x - goal_x) + abs(y - goal_y)
+
+    h = estimate(start_index)
+    if max_steps is None:
+        max_steps = 2 * min(h, width + grid.height) + width + grid.height
+    last_time = start_time + max_steps
+    latest = table.latest(goal_index, agent)
+    if latest == float("inf"):
+        return []
+    # Step from which the agent may park on goal; the heuristic never
+    # promises an arrival before it, which keeps waits from flooding the search
+    earliest = start_time if latest is None else latest + 1
+
+    came_from = {(start_index, start_time): None}
+    g_score = {(start_index, start_time): 0}
+    closed = set()
+    open_set = [(max(h, earliest - start_time), h, -start_time, start_index)]
+    expansions = 0
+    while open_set:
+        _, _, t, current = heapq.heappop(open_set)
+        t = -t
+        if costs is not None:
+            # With costs a state may be pushed again when a cheaper way to it turns up
+            if (current, t) in closed:
+                continue
+            closed.add((current, t))
+        if current == goal_index and t >= earliest:
+            path = []
+            state = (current, t)
+            while state is not None:
+                path.append(grid.position(state[0]))
+                state = came_from[state]
+            path.reverse()
+            if stats is not None:
+                stats["expansions"] = expansions
+            return path
+        expansions += 1
+        if max_expansions is not None and expansions > max_expansions:
+            break
+        if t >= last_time:
+            continue
+
+        x = current % width
+        g = g_score[(current, t)]
+        for neighbor in (
+            current,  # wait in place
+            current + 1 if x + 1 < width else -1,
+            current - 1 if x > 0 else -1,
+            current + width if current + width < size else -1,
+            current - width,
+        ):
+            if neighbor < 0:
+                continue
+            if neighbor != current and cells[neighbor] & mask and neighbor != goal_index:
+                continue
+            key = (neighbor, t + 1)
+            tentative_g_score = g + 1 if costs is None else g + 1 + costs[neighbor]
+            if tentative_g_score >= g_score.get(key, math.inf) or not table.can_move(current, neighbor, t, agent):
+                continue
+            came_from[key] = (current, t)
+            g_score[key] = tentative_g_score
+            h = estimate(neighbor)
+            f = tentative_g_score + max(h, earliest - t - 1)
+            # Ties go to the state closest to the goal, then the latest one
+            heapq.heappush(open_set, (f, h, -t - 1, neighbor))
+    if stats is not None:
+        stats["expansions"] = expansions
+    return []
+
+
+class PlanRequest:
+    def __init__(self, agent, start, goal, start_time, mask):
+        self.agent = agent
+        self.start = start
+        self.goal = goal
+        self.start_time = start_time
+        self.mask = mask
+        self.attempts = 0
+
+
+class PrioritizedPlanner:
+    """
+    Multi-agent planner: agents are planned one after another with
+    space_time_search, each avoiding the reservations of the agents planned
+    before it, which rules out vertex and swap conflicts. Agents without a
+    plan hold their cell so nobody is routed through them. Requests are
+    queued and worked off by plan_pending() within a time budget, so planning
+    a large fleet can be spread over several ticks.
+    """
+    def __init__(self, grid, distance_fields=None, mask=BLOCKING, max_expansions=None, path_cache=None):
+        self.grid = grid
+        self.distance_fields = distance_fields
+        # Shortest paths tried before searching; taken if their steps are still free
+        self.path_cache = path_cache
+        self.mask = mask
+        self.max_expansions = max_expansions
+        self.costs = None  # extra cost of entering each cell by flat index, e.g. CongestionMap.costs()
+        self.cost_fields = {}  # (goal_index, mask) -> cost_distance_field for self.cost_fields_for
+        self.cost_fields_for = None
+        self.table = ReservationTable()
+        self.pending = deque()
+        self.unsorted = False
+        self.failed = []  # agents given up on by the last plan_pending()
+        self.expansions = 0  # states expanded by all searches so far
+
+    def hold(self, agent, position, t=0):
+        """
+        Parks agent on position from step t, e.g. when a robot is added.
+        """
+        self.table.release(agent, t)
+        self.table.hold(agent, self.grid.index(position), t)
+
+    def request(self, agent, start, goal, start_time=0, mask=None):
+        # mask overrides the planner's mask for this agent, e.g. while it carries a shelf
+        self.pending.append(PlanRequest(agent, start, goal, start_time, self.mask if mask is None else mask))
+        self.unsorted = True
+
+    def priority(self, request):
+        # Agents with the longest trips go first; they have the fewest alternatives
+        (sx, sy), (gx, gy) = request.start, request.goal
+        return -(abs(sx - gx) + abs(sy - gy))
+
+    def plan_pending(self, now=0, budget=None):
+        """
+        Plans queued requests, highest priority first, until the queue is
+        empty or budget seconds have been spent. A request never starts
+        before step now. Returns {agent: (start_time, path)} for the requests
+        handled in this call; agents that could not be routed stay parked and
+        are listed in self.failed until the next call.
+        """
+        deadline = None if budget is None else time.perf_counter() + budget
+        self.failed = []
+        self.table.prune(now)
+        if self.unsorted:
+            self.pending = deque(sorted(self.pending, key=self.priority))
+            self.unsorted = False
+        plans = {}
+        while self.pending:
+            if deadline is not None and plans and time.perf_counter() > deadline:
+                break
+            request = self.pending.popleft()
+            request.attempts += 1
+            start_time = max(request.start_time, now)
+            path = self.plan_one(request.agent, request.start, request.goal, start_time, request.mask)
+            if path:
+                plans[request.agent] = (start_time, path)
+            elif request.attempts < MAX_ATTEMPTS:
+                self.pending.append(request)
+            else:
+                self.failed.append(request.agent)
+        return plans
+
+    def plan_one(self, agent, start, goal, start_time, mask=None):
+        grid = self.grid
+        table = self.table
+        mask = self.mask if mask is None else mask
+        table.release(agent, start_time)
+        # Cached shortest paths ignore cell costs
+        cache = self.path_cache if self.costs is None else None
+        if cache is not None:
+            path = cache.get(start, goal, mask)
+            if path:
+                cells = [grid.index(cell) for cell in path]
+                if table.path_is_free(agent, cells, start_time):
+                    table.reserve_path(agent, cells, start_time)
+                    return path
+        heuristic = None
+        if self.distance_fields is not None:
+            heuristic = self.distance_fields.get(goal, mask)
+            # Out of reach on the map itself; a space-time search would only find that out slowly
+            if self.distance_fields.distance(start, goal, mask) is None:
+                table.hold(agent, grid.index(start), start_time)
+                return []
+        if self.costs is not None:
+            # BFS steps underestimate a route through costly cells so much
+            # that the search would flood the map; the cheapest costs do not
+            heuristic = self.cost_field(goal, mask)
+        stats = {}
+        path = space_time_search(grid, start, goal, table, agent, start_time, mask,
+                                 heuristic, max_expansions=self.max_expansions, stats=stats, costs=self.costs)
+        self.expansions += stats.get("expansions", 0)
+        # A path as long as the exact distance has no waits or detours, so it is a shortest path
+        if path and cache is not None and heuristic is not None and len(path) - 1 == heuristic[grid.index(start)]:
+            cache.put(start, goal, mask, path)
+        if path:
+            table.reserve_path(agent, [grid.index(cell) for cell in path], start_time)
+        else:
+            table.hold(agent, grid.index(start), start_time)
+        return path
+
+    def cost_field(self, goal, mask):
+        if self.cost_fields_for is not self.costs:
+            self.cost_fields = {}
+            self.cost_fields_for = self.costs
+        key = (self.grid.index(goal), mask)
+        field = self.cost_fields.get(key)
+        if field is None:
+            field = self.cost_fields[key] = cost_distance_field(self.grid, goal, self.costs, mask)
+        return field
+
+    def plan(self, requests, start_time=0):
+        """
+        Plans (agent, start, goal) triples without a time budget.
+        """
+        for agent, start, goal in requests:
+            self.request(agent, start, goal, start_time)
+        return self.plan_pending(start_time)
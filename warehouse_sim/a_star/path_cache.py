@@ -0,0 +1,169 @@
+from collections import OrderedDict
+
+# Default number of cached paths
+DEFAULT_CAPACITY = 4096
+
+# Longest straight run one byte of an encoded path can hold
+MAX_RUN = 64
+
+
+class PathCache:
+    """
+    Bounded LRU cache of shortest 4-connected grid paths keyed by (start,
+    goal, mask). A path is stored as one byte per straight run (direction in
+    the top two bits, length - 1 below), so it costs a few bytes per turn
+    instead of a tuple per cell. Each entry remembers the map version it was
+    planned for, counting only changes to the flags in its mask, and is
+    dropped once the map has moved on. A query without an entry of its own
+    is answered from a cached path to the same goal that passes through its
+    start, since the rest of a shortest path is itself a shortest path.
+    """
+    def __init__(self, grid, capacity=DEFAULT_CAPACITY):
+        self.grid = grid
+        self.capacity = capacity
+        self.entries = OrderedDict()  # (start, goal, mask) -> (version, runs or None if unreachable)
+        self.by_goal = {}  # (goal, mask) -> starts of the cached paths to goal
+        self.flag_versions = [0] * 8  # changes to cells seen per flag bit
+        self.steps = (1, -1, grid.width, -grid.width)  # flat index step of each run direction
+        self.nbytes = 0
+        self.hits = 0
+        self.suffix_hits = 0
+        self.misses = 0
+        grid.listeners.append(self.on_grid_changed)
+
+    def on_grid_changed(self, index, old_flags, new_flags):
+        changed = 0xFF if index is None else old_flags ^ new_flags
+        for bit in range(8):
+            if changed >> bit & 1:
+                self.flag_versions[bit] += 1
+
+    def version(self, mask):
+        return sum(count for bit, count in enumerate(self.flag_versions) if mask >> bit & 1)
+
+    def encode(self, path):
+        index = self.grid.index
+        runs = bytearray()
+        previous = index(path[0])
+        direction = None
+        length = 0
+        for cell in path[1:]:
+            current = index(cell)
+            step = self.steps.index(current - previous)
+            if step == direction and length < MAX_RUN:
+                length += 1
+            else:
+                if direction is not None:
+                    runs.append(direction << 6 | length - 1)
+                direction, length = step, 1
+            previous = current
+        if direction is not None:
+            runs.append(direction << 6 | length - 1)
+        return bytes(runs)
+
+    def decode(self, start, runs):
+        position = self.grid.position
+        steps = self.steps
+        cell = start
+        path = [position(cell)]
+        for run in runs:
+            step = steps[run >> 6]
+            for _ in range((run & 63) + 1):
+                cell += step
+                path.append(position(cell))
+        return path
+
+    def locate(self, start, runs, target):
+        """
+        Number of steps after which the encoded path from start reaches the
+        flat index target, or None if it never does.
+        """
+        width = self.grid.width
+        cell = start
+        offset = 0
+        for run in runs:
+            direction = run >> 6
+            length = (run & 63) + 1
+            distance = (target - cell) * (1 if direction in (0, 2) else -1)
+            if direction < 2:
+                if target // width == cell // width and 0 < distance <= length:
+                    return offset + distance
+            elif distance % width == 0 and 0 < distance // width <= length:
+                return offset + distance // width
+            cell += self.steps[direction] * length
+            offset += length
+        return None
+
+    def get(self, start, goal, mask):
+        """
+        The cached path from start to goal (both included; empty if goal was
+        found unreachable), or None on a miss.
+        """
+        grid = self.grid
+        start_index = grid.index(start)
+        goal_index = grid.index(goal)
+        version = self.version(mask)
+        key = (start_index, goal_index, mask)
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return [] if entry[1] is None else self.decode(start_index, entry[1])
+            self.drop(key)
+
+        for other in list(self.by_goal.get((goal_index, mask), ())):
+            other_key = (other, goal_index, mask)
+            other_version, runs = self.entries[other_key]
+            if other_version != version:
+                self.drop(other_key)
+                continue
+            if runs is None:
+                continue
+            offset = self.locate(other, runs, start_index)
+            if offset is not None:
+                self.entries.move_to_end(other_key)
+                self.suffix_hits += 1
+                path = self.decode(other, runs)[offset:]
+                self.put(start, goal, mask, path)
+                return path
+        self.misses += 1
+        return None
+
+    def put(self, start, goal, mask, path):
+        """
+        Caches path (empty if goal is unreachable) for the current map.
+        """
+        grid = self.grid
+        key = (grid.index(start), grid.index(goal), mask)
+        if key in self.entries:
+            self.drop(key)
+        runs = self.encode(path) if path else None
+        self.entries[key] = (self.version(mask), runs)
+        self.by_goal.setdefault((key[1], mask), set()).add(key[0])
+        self.nbytes += len(runs) if runs else 0
+        while len(self.entries) > self.capacity:
+            self.drop(next(iter(self.entries)))
+
+    def drop(self, key):
+        _, runs = self.entries.pop(key)
+        self.nbytes -= len(runs) if runs else 0
+        starts = self.by_goal[(key[1], key[2])]
+        starts.discard(key[0])
+        if not starts:
+            del self.by_goal[(key[1], key[2])]
+
+    def clear(self):
+        self.entries.clear()
+        self.by_goal.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.suffix_hits + self.misses
+        return {
+            "hits": self.hits,
+            "suffix_hits": self.suffix_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.suffix_hits) / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+        }
@@ -0,0 +1,182 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+from . import maps
+from .conflicts import ConflictMonitor
+from .congestion import CongestionMap
+from .dispatcher import Dispatcher
+from .engine import Environment
+from .workers import process_pool
+from .constants import *
+
+# Default simulated seconds after which an episode is cut off
+MAX_TIME = 3600
+
+# Columns of the metrics table, in output order
+METRICS = ("seed", "makespan", "deliveries", "throughput", "collisions", "path_length",
+           "planning_failures", "wall_time")
+
+
+def random_free_cells(rng, width, height, count, taken):
+    """
+    Picks count distinct cells not in taken (which is updated).
+    """
+    free = [(x, y) for y in range(height) for x in range(width) if (x, y) not in taken]
+    cells = rng.sample(free, min(count, len(free)))
+    taken.update(cells)
+    return cells
+
+
+def build_environment(spec, rng):
+    """
+    Builds a headless Environment and its task list from a scenario spec.
+    robots, shelves and obstacles are lists of [x, y] cells or counts of
+    cells to place at random; tasks is a list of [shelf_id, [x, y]] drop-offs
+    or a count of random ones. A map file holding the whole layout can be
+    named instead (see build_map_environment). dispatch (read by
+    run_episode) picks the Dispatcher mode, greedy by default, and
+    congestion, if true or a dict of CongestionMap options, steers plans
+    around busy cells; conflicts, if true, attaches a ConflictMonitor.
+    Returns (environment, tasks).
+    """
+    if "map" in spec:
+        return build_map_environment(spec, rng)
+    width = spec.get("width", GRID_WIDTH)
+    height = spec.get("height", GRID_HEIGHT)
+    environment = Environment(width, height)
+    environment.animate = False
+    taken = set()
+
+    def cells(key):
+        value = spec.get(key, [])
+        if isinstance(value, int):
+            return random_free_cells(rng, width, height, value, taken)
+        cells = [tuple(cell) for cell in value]
+        taken.update(cells)
+        return cells
+
+    for cell in cells("obstacles"):
+        environment.add_obstacle(*cell)
+    for cell in cells("shelves"):
+        environment.add_shelf(*cell)
+    for cell in cells("robots"):
+        environment.add_robot(*cell)
+
+    tasks = spec.get("tasks", [])
+    if isinstance(tasks, int):
+        drop_offs = random_free_cells(rng, width, height, tasks, taken)
+        tasks = [(rng.randrange(len(environment.shelves)) + 1, cell) for cell in drop_offs]
+    tasks = [(shelf_id, tuple(cell)) for shelf_id, cell in tasks]
+    return environment, tasks
+
+
+def build_map_environment(spec, rng):
+    """
+    build_environment for a spec whose layout comes from a map file (see
+    maps.read_map). tasks may then also name a task list file, or be a count
+    of random drop-offs on free cells.
+    """
+    layout = maps.read_map(spec["map"])
+    environment = maps.build_environment(layout)
+    environment.animate = False
+    tasks = spec.get("tasks", [])
+    if isinstance(tasks, str):
+        tasks = maps.read_tasks(tasks)
+    elif isinstance(tasks, int):
+        free = np.flatnonzero(np.asarray(layout).ravel() == 0)
+        picks = rng.sample(range(free.size), min(tasks, free.size))
+        tasks = [(rng.randrange(len(environment.shelves)) + 1, environment.grid.position(int(free[i])))
+                 for i in picks]
+    tasks = [(shelf_id, tuple(cell)) for shelf_id, cell in tasks]
+    return environment, tasks
+
+
+def run_episode(spec, seed):
+    """
+    Runs one seeded episode of spec on a headless engine, stepping straight
+    from event to event, and returns its metrics as a dict.
+    """
+    started = time.perf_counter()
+    random.seed(seed)
+    rng = random.Random(seed)
+    environment, tasks = build_environment(spec, rng)
+    max_time = spec.get("max_time", MAX_TIME)
+    congestion = spec.get("congestion")
+    if congestion:
+        CongestionMap(environment.grid, **(congestion if isinstance(congestion, dict) else {})).attach(environment)
+    if spec.get("conflicts"):
+        ConflictMonitor().attach(environment)
+
+    dispatcher = Dispatcher(environment, spec.get("dispatch", "greedy"))
+    for shelf_id, drop_off in tasks:
+        dispatcher.submit(environment.shelves[shelf_id - 1], drop_off)
+    while environment.time < max_time:
+        dispatcher.update()
+        next_time = environment.next_event_time()
+        if next_time is None:
+            break
+        environment.step(max(next_time - environment.time, 0.0))
+
+    deliveries = len(dispatcher.completed)
+    makespan = max((order.completed for order in dispatcher.completed), default=0.0)
+    return {
+        "seed": seed,
+        "makespan": makespan,
+        "deliveries": deliveries,
+        "throughput": deliveries / makespan if makespan else 0.0,
+        "collisions": environment.collisions,
+        "path_length": dispatcher.planned_moves,
+        "planning_failures": dispatcher.failures,
+        "wall_time": time.perf_counter() - started,
+    }
+
+
+def run_batch(spec, seeds, workers=None):
+    """
+    Runs one episode of spec per seed across a process pool and returns the
+    metrics rows in seed order. Episodes share nothing, so results do not
+    depend on the number of workers.
+    """
+    seeds = list(seeds)
+    if workers == 1:
+        return [run_episode(spec, seed) for seed in seeds]
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker keeps every core busy without per-episode IPC
+    chunksize = max(1, len(seeds) // (4 * workers))
+    with process_pool(workers, ["warehouse_sim.batch"]) as pool:
+        return list(pool.map(run_episode, [spec] * len(seeds), seeds, chunksize=chunksize))
+
+
+def write_table(rows, file):
+    writer = csv.DictWriter(file, fieldnames=METRICS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run seeded warehouse episodes in parallel")
+    parser.add_argument("scenario", help="scenario spec as a JSON file")
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", help="CSV file for the metrics table (default: stdout)")
+    args = parser.parse_args(argv)
+
+    with open(args.scenario) as f:
+        spec = json.load(f)
+    rows = run_batch(spec, range(args.first_seed, args.first_seed + args.episodes), args.workers)
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            write_table(rows, f)
+    else:
+        write_table(rows, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from .a_star.a_star import GridPlanner
+from .a_star.grid import OccupancyGrid, OBSTACLE, SHELF
+from .engine import Environment
+from .workers import process_pool
+
+# Map layouts and their default size in cells
+MAPS = ("empty", "racks", "aisles")
+MAP_SIZE = 200
+
+# Fleet sizes for the tick benchmark
+FLEET_SIZES = (10, 100, 1000, 5000)
+
+# Module every batch worker imports, for the startup benchmark
+WORKER_MODULE = "warehouse_sim.batch"
+
+
+def build_grid(layout, width, height):
+    """
+    Builds one of the benchmark layouts:
+    - empty: open floor
+    - racks: 2-cell shelf racks with 1-cell aisles, cross aisle every 10 cells
+    - aisles: walls with single-cell gaps, forcing long detours
+    """
+    grid = OccupancyGrid(width, height)
+    if layout == "racks":
+        for y in range(2, height - 2):
+            if y % 3 == 0:
+                continue
+            for x in range(2, width - 2):
+                if x % 10:
+                    grid.array[y, x] = SHELF
+    elif layout == "aisles":
+        for x in range(3, width - 1, 4):
+            grid.array[:, x] = OBSTACLE
+            gap = 1 if (x // 4) % 2 else height - 2
+            grid.array[gap, x] = 0
+    elif layout != "empty":
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {MAPS}")
+    return grid
+
+
+def free_cells(grid):
+    return [grid.position(index) for index in range(grid.size) if not grid.cells[index]]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_planner(layout, size=MAP_SIZE, queries=200, seed=0):
+    """
+    Plans queries random start/goal pairs with one reused GridPlanner.
+    """
+    rng = random.Random(seed)
+    grid = build_grid(layout, size, size)
+    planner = GridPlanner(grid)
+    cells = free_cells(grid)
+    pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(queries)]
+
+    latencies = []
+    expansions = 0
+    found = 0
+    for start, goal in pairs:
+        started = time.perf_counter()
+        path = planner.search(start, goal)
+        latencies.append(time.perf_counter() - started)
+        expansions += planner.expansions
+        found += bool(path)
+    total = sum(latencies)
+    return {
+        "benchmark": "planner",
+        "layout": layout,
+        "size": size,
+        "queries": queries,
+        "found": found,
+        "expansions_per_sec": expansions / total,
+        "paths_per_sec": queries / total,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_ticks(robots, fleet_store=False, ticks=200, seed=0):
+    """
+    Steps a headless environment in which every robot shuttles between its
+    cell and a neighbouring one, and reports ticks per second.
+    """
+    rng = random.Random(seed)
+    size = max(20, int((robots * 4) ** 0.5))
+    environment = Environment(size, size, fleet_store=fleet_store)
+    cells = rng.sample([(x, y) for y in range(size) for x in range(size - 1)], robots)
+    for x, y in cells:
+        robot = environment.add_robot(x, y)
+        start = rng.random()
+        for i in range(ticks // 10 + 1):
+            target = (x + 1, y) if i % 2 == 0 else (x, y)
+            environment.instruct_robot(robot.id, target, start + i, "move")
+
+    dt = 0.05
+    started = time.perf_counter()
+    for _ in range(ticks):
+        environment.step(dt)
+    elapsed = time.perf_counter() - started
+    return {
+        "benchmark": "ticks",
+        "robots": robots,
+        "fleet_store": fleet_store,
+        "ticks": ticks,
+        "ticks_per_sec": ticks / elapsed,
+        "ms_per_tick": elapsed / ticks * 1000,
+    }
+
+
+def worker_ready(module):
+    __import__(module)
+    return os.getpid()
+
+
+def bench_startup(module=WORKER_MODULE, workers=4, samples=5):
+    """
+    Startup cost of a worker process: a fresh interpreter importing module,
+    less the bare interpreter start, whether that loaded pygame, and the
+    time until a process_pool has run a first task importing it on every
+    worker.
+    """
+    # The directory holding the package, so a source checkout works uninstalled
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run(code):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True,
+                                check=True).stdout
+        return time.perf_counter() - started, output.strip()
+
+    bare = statistics.median(run("pass")[0] for _ in range(samples))
+    imports = [run(f"import sys, {module}; print('pygame' in sys.modules)") for _ in range(samples)]
+    started = time.perf_counter()
+    with process_pool(workers, [module]) as pool:
+        pids = set(pool.map(worker_ready, [module] * workers))
+    pool_seconds = time.perf_counter() - started
+    return {
+        "benchmark": "startup",
+        "module": module,
+        "workers": len(pids),
+        "import_ms": (statistics.median(seconds for seconds, _ in imports) - bare) * 1000,
+        "pygame_loaded": imports[0][1] == "True",
+        "pool_ms": pool_seconds * 1000,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(maps=MAPS, fleet_sizes=FLEET_SIZES, size=MAP_SIZE, queries=200, seed=0):
+    results = []
+    for layout in maps:
+        results.append(bench_planner(layout, size, queries, seed))
+    for robots in fleet_sizes:
+        for fleet_store in (False, True):
+            results.append(bench_ticks(robots, fleet_store, seed=seed))
+    results.append(bench_startup())
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def result_key(result):
+    return tuple((name, value) for name, value in sorted(result.items())
+                 if name in ("benchmark", "layout", "size", "robots", "fleet_store", "module"))
+
+
+def compare(baseline, current):
+    """
+    Prints the change of every throughput figure against a baseline run.
+    """
+    previous = {result_key(result): result for result in baseline["results"]}
+    for result in current["results"]:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        for metric in ("expansions_per_sec", "paths_per_sec", "ticks_per_sec", "import_ms", "pool_ms"):
+            if metric in result and old.get(metric):
+                change = result[metric] / old[metric] - 1
+                label = ", ".join(f"{name}={value}" for name, value in result_key(result))
+                print(f"{label}: {metric} {change:+.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the planner, the headless engine and worker startup")
+    parser.add_argument("--maps", nargs="*", default=MAPS, choices=MAPS)
+    parser.add_argument("--robots", nargs="*", type=int, default=FLEET_SIZES)
+    parser.add_argument("--size", type=int, default=MAP_SIZE, help="planner map width and height in cells")
+    parser.add_argument("--queries", type=int, default=200, help="planner queries per map")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_all(args.maps, args.robots, args.size, args.queries, args.seed)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
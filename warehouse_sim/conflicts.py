@@ -0,0 +1,420 @@
+import math
+
+# Steps between sweeps that drop index entries lying in the past
+PRUNE_INTERVAL = 64
+
+
+class ConflictMonitor:
+    """
+    Conflict checks for the time-stamped instructions of an Environment,
+    attached like a Recorder. It keeps two things.
+
+    A schedule index: every robot's queued moves are laid out over (cell,
+    step) slots and (cell, cell, step) edges, together with the cell it
+    parks on at the end. Only robots whose queue changed are laid out
+    again, and a slot or edge is rechecked only when an entry of it is
+    added or removed, so conflicts() is O(conflicts) and keeping it current
+    costs O(changed instructions). Conflicts are vertex conflicts (two
+    robots in one cell in the same step, including a robot passing a cell
+    another one is parked on) and swap conflicts (two robots trading cells
+    in the same step).
+
+    A live occupancy: a robot holds its cell and, while moving, its target.
+    A due move into a cell held by another robot is not started; the robot
+    waits, and once the move does start, all its queued instructions are
+    shifted by the wait. Waiting robots form a wait-for graph, which tick()
+    (called after every step) searches for cycles. A deadlock is broken by
+    moving one robot of the cycle onto a free neighbouring cell, off the
+    others' routes where possible, and rerouting its remaining moves from
+    there. A robot that waits for an idle robot gets the idle robot moved
+    aside the same way.
+    """
+    def __init__(self):
+        self.environment = None
+        self.vertices = {}  # (cell, step) -> robots laid out on cell at step
+        self.edges = {}  # (cell, cell, step) -> robots moving between them from step
+        self.holds = {}  # cell -> {robot: step from which it is parked there}
+        self.slots = {}  # cell -> steps with vertex entries, for rechecks when a robot parks
+        self.owned = {}  # robot id -> (vertex keys, edge keys, held cell)
+        self.vertex_conflicts = set()
+        self.swap_conflicts = set()  # the smaller of both edge keys
+        self.dirty = set()  # robot ids whose queue changed since they were laid out
+        self.pruned_at = 0
+        self.occupants = {}  # cell -> robot id holding it now
+        self.claims = {}  # robot id -> cells it holds now
+        self.waits = {}  # robot id -> (id of the robot holding the cell it waits for, that cell)
+        self.kept = {}  # cell -> id of the waiting robot a deadlock was broken for
+        self.waits_inserted = 0  # moves that had to wait for a cell
+        self.deadlocks = 0  # wait-for cycles broken
+        self.nudges = 0  # idle robots moved out of the way
+
+    def attach(self, environment):
+        self.environment = environment
+        environment.conflicts = self
+        self.rebuild()
+        return self
+
+    def detach(self):
+        if self.environment is not None:
+            self.environment.conflicts = None
+            self.environment = None
+
+    def rebuild(self):
+        """
+        Forgets everything and indexes the environment again, e.g. after a
+        reset.
+        """
+        self.vertices, self.edges, self.holds, self.slots, self.owned = {}, {}, {}, {}, {}
+        self.vertex_conflicts, self.swap_conflicts = set(), set()
+        self.occupants, self.claims, self.waits, self.kept = {}, {}, {}, {}
+        self.pruned_at = 0
+        for robot in self.environment.robots:
+            self.added(robot)
+
+    # Schedule index
+
+    def step_of(self, t):
+        return math.floor(t / self.environment.step_duration + 1e-9)
+
+    def end_step_of(self, t):
+        return math.ceil(t / self.environment.step_duration - 1e-9)
+
+    def added(self, robot):
+        self.claim(robot, (robot.x, robot.y))
+        self.dirty.add(robot.id)
+
+    def rescheduled(self, robot):
+        """
+        Called by the environment whenever robot's queue changed.
+        """
+        self.dirty.add(robot.id)
+
+    def conflicts(self):
+        """
+        Conflicts from the current step on as ("vertex", cell, step, robot
+        ids) and ("swap", (cell, cell), step, robot ids), ordered by step.
+        """
+        self.update()
+        now = self.step_of(self.environment.time)
+        found = []
+        for key in self.vertex_conflicts:
+            cell, step = key
+            if step >= now:
+                found.append(("vertex", cell, step, sorted(self.occupying(cell, step))))
+        for key in self.swap_conflicts:
+            a, b, step = key
+            if step >= now:
+                found.append(("swap", (a, b), step, sorted(set(self.edges[key]) | set(self.edges[(b, a, step)]))))
+        found.sort(key=lambda conflict: (conflict[2], conflict[0], conflict[1]))
+        return found
+
+    def update(self):
+        environment = self.environment
+        now = self.step_of(environment.time)
+        if now - self.pruned_at >= PRUNE_INTERVAL:
+            self.prune(now)
+        for robot_id in self.dirty:
+            robot = environment.get_robot(robot_id)
+            if robot is not None:
+                self.lay_out(robot, now)
+        self.dirty.clear()
+
+    def lay_out(self, robot, now):
+        self.remove(robot.id)
+        vertex_keys, edge_keys = [], []
+        cell = (robot.x, robot.y)
+        step = now
+        for instruction in robot.instructions:
+            if instruction.instruction != "move":
+                continue
+            start = max(self.step_of(instruction.start_time), step)
+            end = max(self.end_step_of(instruction.start_time + instruction.duration), start + 1)
+            for t in range(step, start + 1):
+                vertex_keys.append((cell, t))
+            if instruction.target != cell:
+                edge_keys.append((cell, instruction.target, start))
+            for t in range(start + 1, end):
+                vertex_keys.append((instruction.target, t))
+            cell, step = instruction.target, end
+        vertex_keys.append((cell, step))
+        self.owned[robot.id] = (vertex_keys, edge_keys, cell)
+        for key in vertex_keys:
+            self.vertices.setdefault(key, []).append(robot.id)
+            self.slots.setdefault(key[0], set()).add(key[1])
+            self.check_vertex(key)
+        for key in edge_keys:
+            self.edges.setdefault(key, []).append(robot.id)
+            self.check_swap(key)
+        self.holds.setdefault(cell, {})[robot.id] = step
+        self.check_held(cell)
+
+    def remove(self, robot_id):
+        owned = self.owned.pop(robot_id, None)
+        if owned is None:
+            return
+        vertex_keys, edge_keys, held = owned
+        for key in vertex_keys:
+            robots = self.vertices.get(key)
+            if robots is not None and robot_id in robots:
+                robots.remove(robot_id)
+                if not robots:
+                    del self.vertices[key]
+                    self.slots[key[0]].discard(key[1])
+                self.check_vertex(key)
+        for key in edge_keys:
+            robots = self.edges.get(key)
+            if robots is not None and robot_id in robots:
+                robots.remove(robot_id)
+                if not robots:
+                    del self.edges[key]
+                self.check_swap(key)
+        holds = self.holds.get(held)
+        if holds is not None:
+            holds.pop(robot_id, None)
+            if not holds:
+                del self.holds[held]
+            self.check_held(held)
+
+    def occupying(self, cell, step):
+        robots = set(self.vertices.get((cell, step), ()))
+        for robot_id, parked in self.holds.get(cell, {}).items():
+            if parked <= step:
+                robots.add(robot_id)
+        return robots
+
+    def check_vertex(self, key):
+        # Only slots somebody is laid out on count, so parked robots are not reported again for every step
+        if key in self.vertices and len(self.occupying(*key)) > 1:
+            self.vertex_conflicts.add(key)
+        else:
+            self.vertex_conflicts.discard(key)
+
+    def check_held(self, cell):
+        # A robot parking on cell can conflict with everyone passing it later on
+        for step in self.slots.get(cell, ()):
+            self.check_vertex((cell, step))
+
+    def check_swap(self, key):
+        a, b, step = key
+        canonical = min(key, (b, a, step))
+        forward = self.edges.get(key, ())
+        backward = self.edges.get((b, a, step), ())
+        if any(robot_id != other for robot_id in forward for other in backward):
+            self.swap_conflicts.add(canonical)
+        else:
+            self.swap_conflicts.discard(canonical)
+
+    def prune(self, before):
+        self.pruned_at = before
+        for robot_id, (vertex_keys, edge_keys, held) in list(self.owned.items()):
+            kept_vertices = []
+            for key in vertex_keys:
+                if key[1] >= before:
+                    kept_vertices.append(key)
+                    continue
+                robots = self.vertices.get(key)
+                if robots is not None and robot_id in robots:
+                    robots.remove(robot_id)
+                    if not robots:
+                        del self.vertices[key]
+                        self.slots[key[0]].discard(key[1])
+                        self.vertex_conflicts.discard(key)
+            kept_edges = []
+            for key in edge_keys:
+                if key[2] >= before:
+                    kept_edges.append(key)
+                    continue
+                robots = self.edges.get(key)
+                if robots is not None and robot_id in robots:
+                    robots.remove(robot_id)
+                    if not robots:
+                        del self.edges[key]
+                        self.swap_conflicts.discard(min(key, (key[1], key[0], key[2])))
+            self.owned[robot_id] = (kept_vertices, kept_edges, held)
+
+    # Live occupancy and deadlocks
+
+    def claim(self, robot, cell):
+        self.occupants[cell] = robot.id
+        self.claims.setdefault(robot.id, set()).add(cell)
+
+    def may_enter(self, robot, instruction, current_time):
+        """
+        Called by the environment before it starts a due move. Returns False
+        while the target is held by another robot that is not already moving
+        off it (following one cell behind is fine); otherwise claims it and,
+        if the move had to wait, shifts robot's queued instructions by the
+        wait.
+        """
+        occupant = self.occupants.get(instruction.target)
+        if occupant is not None and occupant != robot.id and self.leaving(occupant, instruction.target, robot):
+            occupant = None
+        if occupant is None or occupant == robot.id:
+            # A cell vacated to break a deadlock goes to the robot it was vacated for first
+            occupant = self.kept.get(instruction.target)
+            if occupant is not None and (occupant == robot.id or occupant not in self.waits):
+                del self.kept[instruction.target]
+                occupant = None
+        if occupant is not None and occupant != robot.id:
+            if robot.id not in self.waits:
+                self.waits_inserted += 1
+            self.waits[robot.id] = (occupant, instruction.target)
+            # Its moves now start later than laid out
+            self.dirty.add(robot.id)
+            if self.environment.recorder is not None:
+                self.environment.recorder.waited(robot)
+            return False
+        self.claim(robot, instruction.target)
+        if self.waits.pop(robot.id, None) is not None:
+            delay = current_time - instruction.start_time
+            if delay > 0:
+                for queued in robot.instructions:
+                    queued.start_time += delay
+                self.dirty.add(robot.id)
+                if self.environment.recorder is not None:
+                    self.environment.recorder.shifted(robot, delay)
+        return True
+
+    def leaving(self, robot_id, cell, entering):
+        # True if the robot holding cell is already moving off it, but not into entering's cell
+        robot = self.environment.get_robot(robot_id)
+        if robot is None or not robot.instructions:
+            return False
+        head = robot.instructions[0]
+        return (head.instruction == "move" and head.target != cell
+                and head.target != (entering.x, entering.y)
+                and self.occupants.get(head.target) == robot_id)
+
+    def arrived(self, robot):
+        """
+        Called by the environment when robot finished a move; frees the cell
+        it came from.
+        """
+        cell = (robot.x, robot.y)
+        for claimed in self.claims.get(robot.id, ()):
+            if claimed != cell and self.occupants.get(claimed) == robot.id:
+                del self.occupants[claimed]
+        self.claims[robot.id] = {cell}
+        self.occupants[cell] = robot.id
+        # Moves are laid out to end on a whole step, so arriving mid-step lets what follows start a step sooner
+        now = self.environment.time
+        if self.end_step_of(now) != self.step_of(now):
+            self.dirty.add(robot.id)
+
+    def tick(self):
+        """
+        Called by the environment after every step: follows the wait-for
+        graph from every waiting robot and resolves the cycles and idle
+        blockers found.
+        """
+        if not self.waits:
+            return
+        # Only follow waits whose blocker still holds the cell; others are retried next step
+        waits = {robot_id: blocker for robot_id, (blocker, cell) in self.waits.items()
+                 if blocker in (self.occupants.get(cell), self.kept.get(cell))}
+        seen = {}
+        for first in list(waits):
+            robot_id = first
+            chain = []
+            while robot_id in waits and robot_id not in seen:
+                seen[robot_id] = first
+                chain.append(robot_id)
+                robot_id = waits[robot_id]
+            if robot_id in waits:
+                if seen[robot_id] == first:
+                    self.break_cycle(chain[chain.index(robot_id):])
+            elif chain:
+                blocker = self.environment.get_robot(robot_id)
+                if blocker is not None and not blocker.instructions:
+                    self.nudge(blocker, chain[-1])
+
+    def upcoming(self, robot_ids):
+        # Cells the given robots are still going to drive through
+        cells = set()
+        for robot_id in robot_ids:
+            robot = self.environment.get_robot(robot_id)
+            cells.update(instruction.target for instruction in robot.instructions
+                         if instruction.instruction == "move")
+        return cells
+
+    def side_cell(self, robot, avoid):
+        """
+        Free neighbouring cell robot could move to, preferring cells not in
+        avoid, or None.
+        """
+        environment = self.environment
+        x, y = robot.x, robot.y
+        mask = environment.planning_mask(robot)
+        free = [cell for cell in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                if environment.grid.is_free(cell, mask) and cell not in self.occupants]
+        preferred = [cell for cell in free if cell not in avoid]
+        return (preferred or free or [None])[0]
+
+    def break_cycle(self, cycle):
+        # The robot that can leave the others' routes moves; among equals the highest id
+        best = None
+        for robot_id in sorted(cycle, reverse=True):
+            robot = self.environment.get_robot(robot_id)
+            avoid = self.upcoming(other for other in cycle if other != robot_id)
+            side = self.side_cell(robot, avoid)
+            if side is None:
+                continue
+            if side not in avoid:
+                best = (robot, side)
+                break
+            if best is None:
+                best = (robot, side)
+        if best is None:
+            return  # nobody can move; the cycle stays until the map changes
+        self.deadlocks += 1
+        robot, side = best
+        for robot_id in cycle:
+            if self.waits[robot_id][0] == robot.id:
+                self.kept[(robot.x, robot.y)] = robot_id
+        self.reroute(robot, side)
+
+    def nudge(self, blocker, waiting_id):
+        side = self.side_cell(blocker, self.upcoming([waiting_id]))
+        if side is None:
+            return
+        self.nudges += 1
+        self.environment.instruct_robot(blocker.id, side, self.environment.time, "move",
+                                        self.environment.step_duration)
+
+    def reroute(self, robot, side):
+        """
+        Replaces the moves at the head of robot's queue by a move to side and
+        a path from there to where those moves ended. Later instructions are
+        kept and delayed if the detour takes longer.
+        """
+        environment = self.environment
+        instructions = list(robot.instructions)
+        run = 0
+        while run < len(instructions) and instructions[run].instruction == "move":
+            run += 1
+        end = instructions[run - 1].target if run else (robot.x, robot.y)
+        path = environment.plan_path(side, end, environment.planning_mask(robot))
+        if path:
+            cells = [side] + path[1:]
+        else:
+            # No way around; step back in and take the old route once it is clear
+            cells = [side, (robot.x, robot.y)] + [instruction.target for instruction in instructions[:run]]
+        step_duration = environment.step_duration
+        now = environment.time
+        finished = now + len(cells) * step_duration
+        if run:
+            last = instructions[run - 1]
+            delay = max(0.0, finished - (last.start_time + last.duration))
+        else:
+            delay = max(0.0, finished - now)
+
+        robot.instructions.clear()
+        environment.replanners.pop(robot.id, None)
+        if environment.recorder is not None:
+            environment.recorder.cancelled(robot, len(instructions))
+        self.waits.pop(robot.id, None)
+        for i, cell in enumerate(cells):
+            environment.instruct_robot(robot.id, cell, now + i * step_duration, "move", step_duration)
+        for instruction in instructions[run:]:
+            environment.instruct_robot(robot.id, instruction.target, instruction.start_time + delay,
+                                       instruction.instruction, instruction.duration)
@@ -0,0 +1,84 @@
+import math
+import numpy as np
+
+# Simulated seconds after which a robot's pass through a cell counts half
+HALF_LIFE = 60.0
+
+# Extra cost, in steps, of entering a cell per recent pass through it, and at most
+WEIGHT = 0.25
+MAX_COST = 1.0
+
+# Simulated seconds for which costs() keeps handing out the same snapshot
+REFRESH = 1.0
+
+# Scale of the stored passes at which they are rebased to the current time
+RESCALE = 1e100
+
+
+class CongestionMap:
+    """
+    Per-cell heatmap of robot traffic for an Environment. While attached,
+    every finished move adds a pass to the cell it ended on. Passes fade
+    with half_life, applied lazily: each one is stored scaled up by how late
+    it happened, so recording is a single addition and the whole map is
+    only scaled back when it is read. costs() turns the heat into extra
+    costs of entering each cell, weight per recent pass up to max_cost (so
+    a busy cell costs at most a detour of that many steps), which plan_path
+    and the fleet planner add to every move so that routes spread away from
+    busy aisles instead of all taking the shortest one.
+    """
+    def __init__(self, grid, half_life=HALF_LIFE, weight=WEIGHT, max_cost=MAX_COST, refresh=REFRESH):
+        self.grid = grid
+        self.rate = math.log(2) / half_life
+        self.weight = weight
+        self.max_cost = max_cost
+        self.refresh = refresh
+        self.heat = np.zeros(grid.size)  # passes, each scaled by exp(rate * (time - origin))
+        self.origin = 0.0
+        self.passes = 0  # passes recorded so far
+        self.environment = None
+        self.snapshot = None
+        self.snapshot_time = None
+
+    def attach(self, environment):
+        self.environment = environment
+        environment.congestion = self
+
+    def detach(self):
+        if self.environment is not None:
+            self.environment.congestion = None
+            self.environment = None
+
+    def record(self, position, t):
+        growth = math.exp(self.rate * (t - self.origin))
+        if growth > RESCALE:
+            self.heat /= growth
+            self.origin = t
+            growth = 1.0
+        self.heat[self.grid.index(position)] += growth
+        self.passes += 1
+
+    def heatmap(self, t):
+        """
+        (height, width) array of the faded number of passes through every
+        cell at time t.
+        """
+        scale = math.exp(-self.rate * (t - self.origin))
+        return (self.heat * scale).reshape(self.grid.height, self.grid.width)
+
+    def costs(self, t):
+        """
+        Extra cost of entering every cell at time t, indexed by flat cell
+        index, for the costs argument of GridPlanner.search and
+        space_time_search. A snapshot is reused for refresh seconds.
+        """
+        if self.snapshot is None or abs(t - self.snapshot_time) >= self.refresh:
+            self.snapshot = memoryview(np.minimum(self.heatmap(t).ravel() * self.weight, self.max_cost))
+            self.snapshot_time = t
+        return self.snapshot
+
+    def clear(self):
+        self.heat[:] = 0.0
+        self.origin = 0.0
+        self.passes = 0
+        self.snapshot = None
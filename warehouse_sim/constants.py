@@ -16,3 +16,7 @@ BLUE = (0, 0, 255)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 TRANSPARENT_BLACK = (0, 0, 0, 50)  # For shelf transparency
+
+# Contact radii in grid cells (15 px robots and half-cell shelves on 50 px cells)
+ROBOT_RADIUS = 0.3
+SHELF_RADIUS = 0.5
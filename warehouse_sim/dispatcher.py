@@ -0,0 +1,395 @@
+import numpy as np
+from .engine import EMPTY_MASK, LOADED_MASK
+
+# Assignment strategies accepted by Dispatcher
+MODES = ("greedy", "hungarian", "auction", "rolling")
+
+# Seconds ahead in which a busy robot counts as available in rolling mode
+DEFAULT_HORIZON = 10.0
+
+
+def greedy_assignment(cost):
+    """
+    Gives each row in turn the cheapest column no earlier row took. Returns
+    (rows, columns) arrays of the pairs with a finite cost.
+    """
+    cost = np.asarray(cost, dtype=float)
+    rows, columns = [], []
+    taken = np.zeros(cost.shape[1], dtype=bool)
+    for row in range(cost.shape[0]):
+        if len(columns) == cost.shape[1]:
+            break
+        values = np.where(taken, np.inf, cost[row])
+        column = int(values.argmin())
+        if values[column] == np.inf:
+            continue
+        taken[column] = True
+        rows.append(row)
+        columns.append(column)
+    return np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)
+
+
+def finite_part(cost):
+    """
+    Rows and columns of cost that have at least one finite entry, and the
+    submatrix over them with the infinite entries replaced by a cost higher
+    than any complete assignment of finite ones.
+    """
+    finite = np.isfinite(cost)
+    if finite.all():
+        return np.arange(cost.shape[0]), np.arange(cost.shape[1]), cost, finite
+    rows = np.flatnonzero(finite.any(axis=1))
+    columns = np.flatnonzero(finite.any(axis=0))
+    cost = cost[np.ix_(rows, columns)]
+    finite = finite[np.ix_(rows, columns)]
+    if cost.size:
+        values = cost[finite]
+        penalty = (np.abs(values).max() + 1) * (min(cost.shape) + 1)
+        cost = np.where(finite, cost, penalty)
+    return rows, columns, cost, finite
+
+
+def hungarian_assignment(cost):
+    """
+    Minimum total cost assignment (Jonker-Volgenant shortest augmenting
+    paths), matching min(rows, columns) pairs. Each augmentation scans
+    columns as whole NumPy vectors; with more columns than rows most
+    augmentations end after a single scan. Returns (rows, columns) arrays of
+    the pairs with a finite cost.
+    """
+    cost = np.asarray(cost, dtype=float)
+    row_ids, column_ids, cost, finite = finite_part(cost)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    u = np.zeros(n)
+    v = np.zeros(m)
+    row_of = np.full(m, -1, dtype=np.intp)
+    column_of = np.full(n, -1, dtype=np.intp)
+    for start in range(n):
+        # u[start] is still 0: rows only get a dual once they have been started
+        shortest = cost[start] - v
+        candidates = shortest.copy()  # shortest with visited columns set to inf
+        path = np.full(m, start, dtype=np.intp)
+        visited = []
+        open_columns = np.ones(m, dtype=bool)
+        min_value = 0.0
+        while True:
+            column = int(candidates.argmin())
+            min_value = candidates[column]
+            if row_of[column] != -1:
+                # Among equally short columns prefer a free one, which ends the search
+                free = np.flatnonzero((candidates == min_value) & (row_of == -1))
+                if free.size:
+                    column = int(free[0])
+            visited.append(column)
+            candidates[column] = np.inf
+            open_columns[column] = False
+            if row_of[column] == -1:
+                sink = column
+                break
+            row = row_of[column]
+            reduced = min_value + cost[row] - u[row] - v
+            better = open_columns & (reduced < candidates)
+            shortest[better] = reduced[better]
+            candidates[better] = reduced[better]
+            path[better] = row
+
+        u[start] += min_value
+        if len(visited) > 1:
+            columns = np.array(visited[:-1])
+            u[row_of[columns]] += min_value - shortest[columns]
+            columns = np.array(visited)
+            v[columns] -= min_value - shortest[columns]
+
+        column = sink
+        while True:
+            row = path[column]
+            row_of[column] = row
+            column_of[row], column = column, column_of[row]
+            if row == start:
+                break
+
+    rows, columns = np.arange(n), column_of
+    if transposed:
+        rows, columns = columns, rows
+    return select(row_ids, column_ids, rows, columns, finite)
+
+
+def auction_assignment(cost, epsilon=1.0):
+    """
+    Forward auction (Bertsekas) in which every unassigned row bids at once:
+    each bids for its best column, raising the price by how much better it
+    is than the second best plus epsilon, and the highest bid wins. The total
+    cost is within epsilon per pair of the optimum, so with integer costs and
+    epsilon < 1 / rows it is optimal. Returns (rows, columns) arrays of the
+    pairs with a finite cost.
+    """
+    cost = np.asarray(cost, dtype=float)
+    row_ids, column_ids, cost, finite = finite_part(cost)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    benefit = -cost
+    prices = np.zeros(m)
+    owner = np.full(m, -1, dtype=np.intp)
+    column_of = np.full(n, -1, dtype=np.intp)
+    while n and m:
+        bidders = np.flatnonzero(column_of == -1)
+        if not bidders.size:
+            break
+        values = benefit[bidders] - prices
+        best = values.argmax(axis=1)
+        index = np.arange(bidders.size)
+        best_value = values[index, best]
+        if m > 1:
+            values[index, best] = -np.inf
+            second_value = values.max(axis=1)
+        else:
+            second_value = best_value
+        bids = prices[best] + best_value - second_value + epsilon
+
+        # Highest bid per column wins it; the previous owner bids again next round
+        order = np.lexsort((-bids, best))
+        won = np.r_[True, best[order][1:] != best[order][:-1]]
+        winners = bidders[order][won]
+        columns = best[order][won]
+        outbid = owner[columns]
+        column_of[outbid[outbid >= 0]] = -1
+        owner[columns] = winners
+        column_of[winners] = columns
+        prices[columns] = bids[order][won]
+
+    rows, columns = np.arange(n), column_of
+    if transposed:
+        rows, columns = columns, rows
+    return select(row_ids, column_ids, rows, columns, finite)
+
+
+def select(row_ids, column_ids, rows, columns, finite):
+    """
+    Maps solved pairs back to the original matrix, dropping infinite ones.
+    """
+    keep = finite[rows, columns]
+    rows, columns = rows[keep], columns[keep]
+    order = np.argsort(rows, kind="stable")
+    return row_ids[rows[order]], column_ids[columns[order]]
+
+
+class Order:
+    """
+    A pick/deliver order: bring shelf to drop_off.
+    """
+    def __init__(self, order_id, shelf, drop_off, created=0.0):
+        self.id = order_id
+        self.shelf = shelf
+        self.drop_off = drop_off
+        self.created = created
+        self.robot = None  # robot carrying out the order
+        self.completed = None  # simulated time the shelf was delivered
+        self.stuck = False  # a leg could not be planned and is being retried; counted as one failure
+
+
+class Dispatcher:
+    """
+    Assigns a stream of orders to the idle robots of an engine.Environment
+    and follows each delivery until the shelf is dropped off. Costs are the
+    robots' travel distances to the shelves, taken for a whole batch at once
+    from cached distance fields (metric="grid") or as Manhattan distances
+    (metric="manhattan"); robots drive to a shelf empty, so by default
+    under other shelves. Modes:
+    - greedy: each idle robot in turn takes the nearest open order
+    - hungarian: minimum total travel over all idle robots and open orders
+    - auction: near-minimum total travel from a parallel-bid auction
+    - rolling: like hungarian, but robots finishing within horizon seconds
+      are matched too (at the cost of their remaining time) and only the
+      orders won by idle robots are handed out, so an idle robot does not
+      take an order a robot about to become free is much closer to
+    """
+    def __init__(self, environment, mode="hungarian", metric="grid", horizon=DEFAULT_HORIZON, mask=EMPTY_MASK):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        if metric not in ("grid", "manhattan"):
+            raise ValueError(f"Unknown metric {metric!r}, expected 'grid' or 'manhattan'")
+        self.environment = environment
+        self.mode = mode
+        self.metric = metric
+        self.horizon = horizon
+        self.mask = mask
+        self.open = []  # orders waiting for a robot, oldest first
+        self.active = {}  # robot id -> order it is carrying out
+        self.completed = []
+        self.planned_moves = 0  # moves queued for deliveries and return trips
+        self.failures = 0  # deliveries and carry legs that could not be planned, each counted once
+        self.next_id = 1
+
+    def submit(self, shelf, drop_off):
+        order = Order(self.next_id, shelf, tuple(drop_off), self.environment.time)
+        self.next_id += 1
+        self.open.append(order)
+        return order
+
+    def available_orders(self):
+        """
+        Open orders whose shelf is not in use and whose drop-off is clear.
+        Of several orders for the same shelf only the oldest is offered, and
+        none for a shelf walled in by other shelves, which could be reached
+        but not carried out.
+        """
+        busy = {order.shelf.id for order in self.active.values()}
+        occupied = {(shelf.x, shelf.y) for shelf in self.environment.shelves}
+        grid = self.environment.grid
+        orders = []
+        for order in self.open:
+            x, y = order.shelf.x, order.shelf.y
+            if not any(grid.is_free(cell, LOADED_MASK) for cell in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))):
+                continue
+            if order.shelf.id not in busy and order.drop_off not in occupied:
+                busy.add(order.shelf.id)
+                orders.append(order)
+        return orders
+
+    def idle_robots(self):
+        return [robot for robot in self.environment.robots
+                if not robot.instructions and robot.id not in self.active]
+
+    def cost_matrix(self, starts, orders):
+        """
+        Travel distances from every start cell to every order's shelf, as a
+        float matrix with np.inf where a shelf cannot be reached.
+        """
+        environment = self.environment
+        targets = [(order.shelf.x, order.shelf.y) for order in orders]
+        if self.metric == "manhattan":
+            starts = np.array(starts, dtype=float).reshape(-1, 2)
+            targets = np.array(targets, dtype=float).reshape(-1, 2)
+            return (np.abs(starts[:, 0, None] - targets[:, 0]) + np.abs(starts[:, 1, None] - targets[:, 1]))
+
+        grid = environment.grid
+        fields = environment.distance_fields
+        start_index = np.array([grid.index(start) for start in starts], dtype=np.intp)
+        # Starts under a shelf leave through their neighbours
+        blocked = np.flatnonzero(np.frombuffer(grid.cells, dtype=np.uint8)[start_index] & self.mask)
+        x, y = start_index[blocked] % grid.width, start_index[blocked] // grid.width
+        around = np.stack((
+            np.where(x + 1 < grid.width, start_index[blocked] + 1, start_index[blocked]),
+            np.where(x > 0, start_index[blocked] - 1, start_index[blocked]),
+            np.where(y + 1 < grid.height, start_index[blocked] + grid.width, start_index[blocked]),
+            np.where(y > 0, start_index[blocked] - grid.width, start_index[blocked]),
+        ), axis=1)
+
+        columns = {}  # shelf cell -> distances from the starts
+        cost = []
+        for target in targets:
+            column = columns.get(target)
+            if column is None:
+                field = fields.get(target, self.mask)
+                column = columns[target] = field[start_index]
+                if blocked.size:
+                    nearest = field[around].min(axis=1)
+                    reachable = nearest < fields.unreachable
+                    column[blocked[reachable]] = np.minimum(column[blocked[reachable]], nearest[reachable] + 1)
+            cost.append(column)
+        cost = np.stack(cost, axis=1).astype(float)
+        cost[cost >= fields.unreachable] = np.inf
+        return cost
+
+    def assign(self):
+        """
+        Chooses which idle robot takes which available order. Returns a list
+        of (robot, order) pairs without scheduling anything.
+        """
+        environment = self.environment
+        robots = self.idle_robots()
+        orders = self.available_orders()
+        if not robots or not orders:
+            return []
+        starts = [(robot.x, robot.y) for robot in robots]
+
+        if self.mode == "rolling":
+            delays = [0.0] * len(robots)
+            for robot in environment.robots:
+                if not robot.instructions:
+                    continue
+                position, step = environment.queued_state(robot)
+                remaining = step * environment.step_duration - environment.time
+                if remaining <= self.horizon:
+                    starts.append(position)
+                    delays.append(remaining / environment.step_duration)
+            cost = self.cost_matrix(starts, orders) + np.array(delays)[:, None]
+            rows, columns = hungarian_assignment(cost)
+            now = rows < len(robots)
+            rows, columns = rows[now], columns[now]
+        else:
+            solve = {"greedy": greedy_assignment, "hungarian": hungarian_assignment,
+                     "auction": auction_assignment}[self.mode]
+            rows, columns = solve(self.cost_matrix(starts, orders))
+        return [(robots[row], orders[column]) for row, column in zip(rows.tolist(), columns.tolist())]
+
+    def dispatch(self):
+        """
+        Assigns available orders to idle robots and schedules the deliveries.
+        Returns the (robot, order) pairs handed out.
+        """
+        pairs = self.assign()
+        if not pairs:
+            return pairs
+        taken = {order.id for _, order in pairs}
+        self.open = [order for order in self.open if order.id not in taken]
+        planned = self.environment.schedule_deliveries(
+            [(robot, order.shelf, order.drop_off) for robot, order in pairs])
+        for robot, order in pairs:
+            order.robot = robot
+            self.active[robot.id] = order
+            self.planned_moves += sum(1 for instruction in robot.instructions if instruction.instruction == "move")
+            order.stuck = robot.id not in planned
+            if order.stuck:
+                self.failures += 1
+        return pairs
+
+    def update(self):
+        """
+        Call once per tick. Finishes deliveries whose robot is done, retries
+        carry legs that could not be planned, puts failed orders back at the
+        end of the queue, hands out new orders and sends robots that
+        delivered without a new order back to their start position, off the
+        drop-off cell. Returns the (robot, order) pairs handed out.
+        """
+        environment = self.environment
+        returning = {}
+        for robot_id, order in list(self.active.items()):
+            robot = environment.get_robot(robot_id)
+            if robot.instructions:
+                continue
+            if robot.shelf_custody:
+                # Carrying but the drop-off could not be planned yet: retry
+                if environment.plan_robots({robot_id: order.drop_off}):
+                    self.planned_moves += len(robot.instructions)
+                    _, step = environment.queued_state(robot)
+                    environment.instruct_robot(robot_id, order.drop_off, step * environment.step_duration,
+                                               "drop_shelf")
+                    order.stuck = False
+                elif not order.stuck:
+                    order.stuck = True
+                    self.failures += 1
+                continue
+            del self.active[robot_id]
+            if robot.shelf_delivered:
+                robot.shelf_delivered = False
+                order.completed = environment.time
+                self.completed.append(order)
+                returning[robot_id] = robot.start_position
+            else:
+                order.robot = None
+                self.open.append(order)
+
+        pairs = self.dispatch()
+        for robot, _ in pairs:
+            returning.pop(robot.id, None)
+        if returning:
+            environment.plan_robots(returning)
+            for robot_id in returning:
+                self.planned_moves += len(environment.get_robot(robot_id).instructions)
+        return pairs
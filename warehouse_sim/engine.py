@@ -0,0 +1,896 @@
+import math
+import time
+from collections import deque
+import numpy as np
+from .a_star.a_star import a_star_search, get_planner
+from .a_star.jps import get_jump_planner
+from .a_star.distance_fields import DistanceFieldCache
+from .a_star.dstar_lite import DStarLite
+from .a_star.hpa import HierarchicalPlanner
+from .a_star.mapf import PrioritizedPlanner
+from .a_star.path_cache import PathCache
+from .a_star.grid import OccupancyGrid, OBSTACLE, SHELF, BLOCKING
+from .constants import *
+from .scheduler import EventScheduler
+from .spatial import SpatialHash
+
+# Default simulated time step in seconds used by step() and run_until()
+DEFAULT_DT = 0.02
+
+# Seconds a robot takes to cross one grid cell in planned paths
+STEP_DURATION = 1.0
+
+# Space-time states a fleet plan may expand per map cell before it is given up
+# as blocked (e.g. by robots parked around its goal) and retried later
+EXPANSIONS_PER_CELL = 8
+
+# Cells a robot cannot drive through: carrying a shelf it is blocked by the
+# other shelves, empty it drives under them
+LOADED_MASK = BLOCKING
+EMPTY_MASK = OBSTACLE
+
+
+class Robot:
+    def __init__(self, robot_id, x, y):
+        self.id = robot_id
+        self.x = x  # grid position
+        self.y = y
+        self.display_x, self.display_y = float(x), float(y)  # interpolated position in cell units
+        self.state = "idle"
+        self.start_position = (x, y)
+        self.end_position = None
+        self.shelf_assigned = None
+        self.shelf_custody = False
+        self.shelf_delivered = False
+        self.instructions = deque()
+
+    def has_reached_target(self, robot_pos, target_pos, epsilon=0.001):
+        return abs(robot_pos[0] - target_pos[0]) < epsilon and abs(robot_pos[1] - target_pos[1]) < epsilon
+
+    def move_robot(self, robot_pos, target_pos, current_time, start_time, duration=1.0):
+        proportion = min((current_time - start_time) / duration, 1.0)
+        interpolated_x = robot_pos[0] + (target_pos[0] - robot_pos[0]) * proportion
+        interpolated_y = robot_pos[1] + (target_pos[1] - robot_pos[1]) * proportion
+        return interpolated_x, interpolated_y
+
+    def move(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        self.display_x, self.display_y = float(self.x), float(self.y)
+
+    def reset(self):
+        self.x, self.y = self.start_position
+        self.display_x, self.display_y = float(self.x), float(self.y)
+        self.state = "idle"
+        self.end_position = None
+        self.shelf_assigned = None
+        self.shelf_custody = False
+        self.shelf_delivered = False
+        self.instructions = deque()
+
+
+class Shelf:
+    """
+    A shelf rests where it was last put down; while a robot carries it, its
+    position is the carrier's, looked up when read instead of written on
+    every step.
+    """
+    def __init__(self, shelf_id, x, y):
+        self.id = shelf_id
+        self.carrier = None  # robot carrying the shelf
+        self.rest_x = x
+        self.rest_y = y
+        self.start_position = (x, y)
+
+    @property
+    def x(self):
+        return self.rest_x if self.carrier is None else self.carrier.x
+
+    @x.setter
+    def x(self, value):
+        self.rest_x = value
+
+    @property
+    def y(self):
+        return self.rest_y if self.carrier is None else self.carrier.y
+
+    @y.setter
+    def y(self, value):
+        self.rest_y = value
+
+
+class Instruction:
+    def __init__(self, robot, target, start_time, instruction, duration=1.0):
+        self.robot = robot
+        self.target = target
+        self.start_time = start_time
+        self.instruction = instruction
+        self.duration = duration
+        self.trajectory = None  # motion.Trajectory the move follows, None for a straight-line move
+
+
+class Environment:
+    """
+    Headless warehouse simulation core. Time only advances through step() and
+    run_until(), so episodes run as fast as the CPU allows. Rendering lives in
+    viewer.Viewer, which can be attached to any Environment.
+
+    With a motion.MotionModel, planned paths are driven as trajectories with
+    acceleration limits and turning costs instead of one cell per step at
+    constant speed; the step duration is raised so plans stay on schedule.
+    """
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, dt=DEFAULT_DT, step_duration=STEP_DURATION,
+                 fleet_store=False, cluster_size=None, motion=None):
+        self.width = width
+        self.height = height
+        self.dt = dt
+        self.motion = motion
+        if motion is not None:
+            step_duration = max(step_duration, motion.cell_time())
+        self.step_duration = step_duration
+        self.headings = {}  # robot id -> heading at the end of its queued trajectories
+        self.time = 0.0
+        self.robots = []
+        self.shelves = []
+        self.shelf_cells = {}  # cell -> shelf resting on it, for shelf_at
+        self.grid = OccupancyGrid(width, height)
+        self.distance_fields = DistanceFieldCache(self.grid)
+        self.path_cache = PathCache(self.grid)  # shortest paths of repeated trips
+        self.search_mode = "astar"  # a_star_search mode of plan_path, "jps" on large open floors
+        self.fleet_planner = PrioritizedPlanner(self.grid, self.distance_fields, path_cache=self.path_cache,
+                                                max_expansions=EXPANSIONS_PER_CELL * self.grid.size)
+        # Trajectories drift from the step schedule within a run, so robots keep a cell apart
+        self.fleet_planner.table.following = motion is None
+        # Hierarchical planner for long-haul plan_path queries on large maps
+        self.hierarchy = HierarchicalPlanner(self.grid, cluster_size) if cluster_size else None
+        self.planning_budget = None  # seconds of fleet planning per tick, None for unlimited
+        self.selected_robot = None
+        self.running = True
+        self.scheduler = EventScheduler()  # wakes robots when an instruction starts or finishes
+        self.moving = {}  # robot -> move instruction in progress
+        self.animate = True  # interpolate display positions of moving robots every tick
+        self.spatial = SpatialHash()  # robot ids by position, for contact checks
+        self.contacts = {}  # robot id -> ids of robots currently in contact with it
+        self.collisions = 0  # contacts started so far
+        self.contact_codes = np.zeros(0, dtype=np.int64)  # fleet store contacts as a << 32 | b
+        self.planner_pool = None  # optional snapshot.PlannerPool planning in worker processes
+        self.parallel_requests = {}  # robot id -> (start, goal, start step, mask) handed to the pool
+        self.recorder = None  # optional recorder.Recorder logging every event
+        self.metrics = None  # optional metrics.Metrics timing every tick
+        self.congestion = None  # optional congestion.CongestionMap steering plans around busy cells
+        self.server = None  # optional server.CommandServer feeding in commands from external controllers
+        self.conflicts = None  # optional conflicts.ConflictMonitor holding moves into taken cells
+        self.replanners = {}  # robot id -> DStarLite keeping the robot's drive_to path repaired
+        self.changed_cells = []  # grid cells changed since the replanners were last repaired
+        self.grid.listeners.append(self.on_grid_changed)
+        # Optional struct-of-arrays storage; robots and shelves become views into it
+        self.fleet = None
+        if fleet_store:
+            from .fleet import FleetStore
+            self.fleet = FleetStore()
+
+    def reset(self):
+        """
+        Starts the episode over: robots and shelves go back to where they
+        were added, and the clock, queued instructions, reservations, drive_to
+        repairs and contact counters are cleared. Obstacles stay. Resets are
+        not recorded.
+        """
+        grid = self.grid
+        grid.clear_flags(grid.indices([(shelf.x, shelf.y) for shelf in self.shelves]), SHELF)
+        for shelf in self.shelves:
+            shelf.carrier = None
+            shelf.x, shelf.y = shelf.start_position
+        grid.set_flags(grid.indices([shelf.start_position for shelf in self.shelves]), SHELF)
+        self.shelf_cells = {shelf.start_position: shelf for shelf in self.shelves}
+
+        self.time = 0.0
+        self.scheduler = EventScheduler()
+        self.moving = {}
+        self.spatial = SpatialHash()
+        self.contacts = {}
+        self.collisions = 0
+        self.contact_codes = np.zeros(0, dtype=np.int64)
+        self.replanners = {}
+        self.changed_cells = []
+        self.parallel_requests = {}
+        self.headings = {}
+        if self.congestion is not None:
+            self.congestion.clear()
+        following = self.fleet_planner.table.following
+        self.fleet_planner = PrioritizedPlanner(self.grid, self.distance_fields, path_cache=self.path_cache,
+                                                max_expansions=EXPANSIONS_PER_CELL * self.grid.size)
+        self.fleet_planner.table.following = following
+        for robot in self.robots:
+            robot.reset()
+            self.spatial.insert(robot.id, robot.x, robot.y)
+            self.fleet_planner.hold(robot.id, (robot.x, robot.y), 0)
+        if self.conflicts is not None:
+            self.conflicts.rebuild()
+
+    def add_robot(self, x, y):
+        robot_id = len(self.robots) + 1
+        if self.fleet is not None:
+            from .fleet import RobotView
+            self.robots.append(RobotView(self.fleet, self.shelves, robot_id, x, y))
+        else:
+            self.robots.append(Robot(robot_id, x, y))
+        self.spatial.insert(robot_id, x, y)
+        # Unplanned robots keep their cell reserved so planned robots avoid them
+        self.fleet_planner.hold(robot_id, (x, y), self.current_step())
+        if self.recorder is not None:
+            self.recorder.robot_added(self.robots[-1])
+        if self.conflicts is not None:
+            self.conflicts.added(self.robots[-1])
+        return self.robots[-1]
+
+    def add_shelf(self, x, y):
+        shelf_id = len(self.shelves) + 1
+        if self.fleet is not None:
+            from .fleet import ShelfView
+            self.shelves.append(ShelfView(self.fleet, shelf_id, x, y))
+        else:
+            self.shelves.append(Shelf(shelf_id, x, y))
+        self.shelf_cells[(x, y)] = self.shelves[-1]
+        self.grid.set_flag((x, y), SHELF)
+        if self.recorder is not None:
+            self.recorder.shelf_added(self.shelves[-1])
+        return self.shelves[-1]
+
+    def add_obstacle(self, x, y):
+        self.grid.set_flag((x, y), OBSTACLE)
+        if self.recorder is not None:
+            self.recorder.obstacle_added(x, y)
+
+    @property
+    def obstacles(self):
+        """
+        (x, y) of every obstacle cell, read from the grid.
+        """
+        ys, xs = np.nonzero(self.grid.array & OBSTACLE)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def add_robots(self, cells):
+        """
+        add_robot for every x, y cell of an (n, 2) array. Returns the robots.
+        """
+        return [self.add_robot(x, y) for x, y in np.asarray(cells, dtype=np.intp).reshape(-1, 2).tolist()]
+
+    def add_shelves(self, cells):
+        """
+        add_shelf for every x, y cell of an (n, 2) array, with the grid
+        updated in one bulk pass. Returns the shelves.
+        """
+        cells = np.asarray(cells, dtype=np.intp).reshape(-1, 2)
+        indices = self.grid.indices(cells)
+        first = len(self.shelves) + 1
+        if self.fleet is not None:
+            from .fleet import ShelfView
+            shelves = [ShelfView(self.fleet, first + i, x, y) for i, (x, y) in enumerate(cells.tolist())]
+        else:
+            shelves = [Shelf(first + i, x, y) for i, (x, y) in enumerate(cells.tolist())]
+        self.shelves.extend(shelves)
+        self.shelf_cells.update((shelf.start_position, shelf) for shelf in shelves)
+        self.grid.set_flags(indices, SHELF)
+        if self.recorder is not None:
+            for shelf in shelves:
+                self.recorder.shelf_added(shelf)
+        return shelves
+
+    def add_obstacles(self, cells):
+        """
+        add_obstacle for every x, y cell of an (n, 2) array in one bulk pass.
+        """
+        cells = np.asarray(cells, dtype=np.intp).reshape(-1, 2)
+        self.grid.set_flags(self.grid.indices(cells), OBSTACLE)
+        if self.recorder is not None:
+            for x, y in cells.tolist():
+                self.recorder.obstacle_added(x, y)
+
+    def plan_path(self, start, goal, mask=BLOCKING):
+        # A cached distance field towards goal makes the heuristic exact
+        field = self.distance_fields.get(goal, mask, compute=False)
+        if self.congestion is not None:
+            # Cheapest path around busy cells; not cached, as the costs keep changing
+            path = a_star_search(start, goal, self.grid, mask, field, costs=self.congestion.costs(self.time))
+            if self.metrics is not None:
+                self.metrics.add("expansions", get_planner(self.grid).expansions)
+            return path
+        # The cache holds 4-connected paths only; it is shared with the fleet planner
+        cached = self.search_mode != "jps8"
+        path = self.path_cache.get(start, goal, mask) if cached else None
+        if path is not None:
+            return path
+        if field is None and self.hierarchy is not None and mask == self.hierarchy.mask:
+            # Not cached: hierarchical paths are not always shortest
+            path = self.hierarchy.search(start, goal)
+            if self.metrics is not None:
+                self.metrics.add("expansions", self.hierarchy.expansions)
+            return path
+        if field is None and self.search_mode != "astar":
+            path = a_star_search(start, goal, self.grid, mask, mode=self.search_mode)
+            planner = get_jump_planner(self.grid)
+        else:
+            path = a_star_search(start, goal, self.grid, mask, field)
+            planner = get_planner(self.grid)
+        if self.metrics is not None:
+            self.metrics.add("expansions", planner.expansions)
+        if cached:
+            self.path_cache.put(start, goal, mask, path)
+        return path
+
+    def drive_to(self, robot_id, goal, mask=None):
+        """
+        Queues moves along a path to goal that is repaired incrementally
+        whenever shelves or obstacles change the map on the way, instead of
+        being replanned from scratch. The robot starts from the end of its
+        queued instructions. Unlike plan_robots, the path is not reserved
+        against other robots. Until the robot arrives its queued instructions
+        belong to the repair, so queue follow-up work once it is idle. mask
+        defaults to the robot's planning_mask. Returns the planned path
+        (empty if goal is unreachable).
+        """
+        robot = self.get_robot(robot_id)
+        if robot is None:
+            return []
+        start, start_step = self.queued_state(robot)
+        if mask is None:
+            mask = self.planning_mask(robot)
+        planner = DStarLite(self.grid, start, goal, mask)
+        path = planner.compute_path()
+        if self.metrics is not None:
+            self.metrics.add("expansions", planner.expansions)
+        if path:
+            robot.end_position = goal
+            self.replanners[robot_id] = planner
+            self.instruct_path(robot_id, path, start_step * self.step_duration, self.step_duration)
+        return path
+
+    def on_grid_changed(self, index, old_flags, new_flags):
+        # index is None after a bulk update; the replanners then start over
+        if self.replanners:
+            self.changed_cells.append(index)
+
+    def repair_paths(self):
+        """
+        Hands the cells changed since the last call to every robot still
+        driving under drive_to and requeues the robots whose path changed. A
+        move already under way is finished first.
+        """
+        cells = self.changed_cells
+        self.changed_cells = []
+        for robot_id, planner in list(self.replanners.items()):
+            robot = self.get_robot(robot_id)
+            instructions = robot.instructions
+            if not instructions:
+                del self.replanners[robot_id]
+                continue
+            kept = 1 if instructions[0].start_time <= self.time else 0
+            position = instructions[0].target if kept else (robot.x, robot.y)
+            planned = [position] + [instruction.target for instruction in list(instructions)[kept:]]
+            if None in cells:
+                planner = DStarLite(self.grid, position, self.grid.position(planner.goal), planner.mask)
+                self.replanners[robot_id] = planner
+            else:
+                planner.update_cells(cells)
+                planner.move_to(position)
+            expansions = planner.expansions
+            path = planner.compute_path()
+            if self.metrics is not None:
+                self.metrics.add("expansions", planner.expansions - expansions)
+            if path == planned:
+                continue
+            if self.recorder is not None and len(instructions) > kept:
+                self.recorder.cancelled(robot, len(instructions) - kept)
+            while len(instructions) > kept:
+                instructions.pop()
+            if self.conflicts is not None:
+                self.conflicts.rescheduled(robot)
+            if not path:
+                del self.replanners[robot_id]
+                continue
+            _, start_step = self.queued_state(robot)
+            self.instruct_path(robot_id, path, start_step * self.step_duration, self.step_duration)
+
+    def travel_cost(self, start, goal, mask=BLOCKING):
+        return self.distance_fields.distance(start, goal, mask)
+
+    def current_step(self):
+        return math.ceil(self.time / self.step_duration - 1e-9)
+
+    def queued_state(self, robot):
+        """
+        Position and planning step at which robot will be once its queued
+        instructions are done.
+        """
+        position = (robot.x, robot.y)
+        busy_until = self.time
+        for instruction in robot.instructions:
+            if instruction.instruction == "move":
+                position = instruction.target
+            busy_until = max(busy_until, instruction.start_time + instruction.duration)
+        return position, math.ceil(busy_until / self.step_duration - 1e-9)
+
+    def planning_mask(self, robot):
+        """
+        Mask robot plans with from the end of its queued instructions:
+        LOADED_MASK if it will be carrying a shelf by then, else EMPTY_MASK.
+        """
+        loaded = robot.shelf_custody
+        for instruction in robot.instructions:
+            if instruction.instruction == "pick_up_shelf":
+                loaded = True
+            elif instruction.instruction == "drop_shelf":
+                loaded = False
+        return LOADED_MASK if loaded else EMPTY_MASK
+
+    def plan_robots(self, goals, budget=None):
+        """
+        Plans conflict-free paths for robots (goals maps robot id to goal
+        cell) on top of the fleet's existing reservations and queues them as
+        instructions. Robots start from the end of their queued instructions.
+        With a budget (seconds), planning that does not fit continues in later
+        ticks. Returns the ids of the robots that were planned in this call.
+        """
+        for robot_id, goal in goals.items():
+            robot = self.get_robot(robot_id)
+            if robot is None:
+                continue
+            robot.end_position = goal
+            start, start_step = self.queued_state(robot)
+            self.fleet_planner.request(robot_id, start, goal, start_step, self.planning_mask(robot))
+        return self.plan_pending(budget)
+
+    def plan_pending(self, budget=None):
+        if self.congestion is not None:
+            self.fleet_planner.costs = self.congestion.costs(self.time)
+        expansions = self.fleet_planner.expansions
+        plans = self.fleet_planner.plan_pending(self.current_step(), budget)
+        if self.metrics is not None:
+            self.metrics.add("expansions", self.fleet_planner.expansions - expansions)
+        for robot_id, (start_step, path) in plans.items():
+            self.instruct_path(robot_id, path, start_step * self.step_duration, self.step_duration)
+        return list(plans)
+
+    def use_planner_pool(self, workers=None):
+        """
+        Starts worker processes for plan_robots_parallel().
+        """
+        from .snapshot import PlannerPool
+        self.planner_pool = PlannerPool(self, workers)
+        return self.planner_pool
+
+    def plan_robots_parallel(self, goals, space_time=True):
+        """
+        plan_robots() spread over the planner pool: requests go out with the
+        next snapshot and the paths are merged in a later tick by step().
+        With space_time the paths are planned against the published
+        reservations and re-checked against the live ones when merged; a
+        path that conflicts with one merged before it is planned again in
+        process. Without it robots get plain A* paths that ignore each other.
+        """
+        pool = self.planner_pool or self.use_planner_pool()
+        for robot_id, goal in goals.items():
+            robot = self.get_robot(robot_id)
+            if robot is None:
+                continue
+            robot.end_position = goal
+            start, start_step = self.queued_state(robot)
+            mask = self.planning_mask(robot)
+            self.parallel_requests[robot_id] = (start, goal, start_step, mask)
+            if space_time:
+                pool.submit((robot_id, start, goal, start_step, mask), space_time=True)
+            else:
+                pool.submit((robot_id, start, goal, mask))
+
+    def merge_parallel_plans(self, wait=False):
+        """
+        Queues the paths the planner pool has finished. Returns the ids of
+        the robots whose path was merged.
+        """
+        paths, space_time_paths = self.planner_pool.collect(wait)
+        merged = []
+        for robot_id, path in paths:
+            del self.parallel_requests[robot_id]
+            if path:
+                _, start_step = self.queued_state(self.get_robot(robot_id))
+                self.instruct_path(robot_id, path, start_step * self.step_duration, self.step_duration)
+                merged.append(robot_id)
+
+        grid = self.grid
+        table = self.fleet_planner.table
+        now = self.current_step()
+        # Longest paths first, matching the in-process planner's priority
+        for robot_id, start_step, path in sorted(space_time_paths, key=lambda plan: -len(plan[2])):
+            start, goal, _, mask = self.parallel_requests.pop(robot_id)
+            # A path that came back late starts now instead; the robot waited on its first cell meanwhile
+            start_step = max(start_step, now)
+            cells = [grid.index(cell) for cell in path]
+            if (path and table.path_is_free(robot_id, cells, start_step)
+                    and not any(grid.cells[cell] & mask for cell in cells[1:-1])):
+                table.release(robot_id, start_step)
+                table.reserve_path(robot_id, cells, start_step)
+                self.instruct_path(robot_id, path, start_step * self.step_duration, self.step_duration)
+                merged.append(robot_id)
+            else:
+                self.fleet_planner.request(robot_id, start, goal, start_step, mask)
+        return merged
+
+    def schedule_deliveries(self, deliveries):
+        """
+        Plans every (robot, shelf, end_position) delivery together so the robots
+        drive to their shelves, pick them up and carry them to end_position
+        without running into each other. Returns the ids of the robots whose
+        delivery was fully scheduled.
+        """
+        for robot, shelf, end_position in deliveries:
+            robot.shelf_assigned = shelf
+
+        planned = self.plan_robots({robot.id: (shelf.x, shelf.y) for robot, shelf, _ in deliveries})
+        deliveries = [delivery for delivery in deliveries if delivery[0].id in planned]
+        for robot, shelf, _ in deliveries:
+            _, step = self.queued_state(robot)
+            self.instruct_robot(robot.id, (shelf.x, shelf.y), step * self.step_duration, "pick_up_shelf")
+
+        planned = self.plan_robots({robot.id: end_position for robot, _, end_position in deliveries})
+        for robot, _, end_position in deliveries:
+            if robot.id in planned:
+                _, step = self.queued_state(robot)
+                self.instruct_robot(robot.id, end_position, step * self.step_duration, "drop_shelf")
+        return planned
+
+    def get_robot(self, robot_id):
+        if 1 <= robot_id <= len(self.robots):
+            return self.robots[robot_id - 1]
+        return None
+
+    def shelf_at(self, position):
+        # Carried shelves are not looked up by cell; they are at their carrier's
+        return self.shelf_cells.get(position)
+
+    def instruct_robot(self, robot_id, target, start_time, instruction, duration=1.0):
+        robot = self.get_robot(robot_id)
+        if robot is None:
+            return None
+        robot.instructions.append(Instruction(robot, target, start_time, instruction, duration))
+        if self.recorder is not None:
+            self.recorder.instructed(robot.instructions[-1])
+        if self.conflicts is not None:
+            self.conflicts.rescheduled(robot)
+        if len(robot.instructions) == 1:
+            if self.fleet is not None:
+                self.fleet.next_start[robot.index] = start_time
+            else:
+                self.scheduler.schedule(robot, start_time)
+        return robot.instructions[-1]
+
+    def instruct_path(self, robot_id, path, start_time, step_duration=1.0):
+        """
+        Queues one "move" instruction per cell of path, spaced step_duration
+        apart. A leading cell equal to the robot's queued position is skipped,
+        so paths straight from a_star_search can be passed in; any later
+        repeated cell is a wait of one step. With a motion model the moves are
+        timed along a trajectory fitted to that schedule. Returns the time at
+        which the last move is finished.
+        """
+        robot = self.get_robot(robot_id)
+        if robot is None:
+            return start_time
+        start, _ = self.queued_state(robot)
+        position = start
+        time = start_time
+        moves = []
+        for i, cell in enumerate(path):
+            if cell == position:
+                if i > 0:
+                    time += step_duration
+                continue
+            moves.append((cell, time, step_duration))
+            position = cell
+            time += step_duration
+        if self.motion is None:
+            for cell, move_start, duration in moves:
+                self.instruct_robot(robot_id, cell, move_start, "move", duration)
+            return time
+
+        trajectory = self.motion.trajectory(start, moves, self.headings.get(robot_id))
+        self.headings[robot_id] = trajectory.heading
+        for cell, move_start, duration in trajectory.moves:
+            instruction = self.instruct_robot(robot_id, cell, move_start, "move", duration)
+            instruction.trajectory = trajectory
+        return time + trajectory.delay
+
+    def execute_instruction(self, robot, instruction, current_time):
+        """
+        Advances a single instruction to current_time. Returns True once the
+        instruction is complete and can be removed from the robot's queue.
+        """
+        if instruction.instruction == "move":
+            if current_time >= instruction.start_time + instruction.duration:
+                robot.move(instruction.target[0] - robot.x, instruction.target[1] - robot.y)
+                if self.congestion is not None:
+                    self.congestion.record(instruction.target, current_time)
+                if self.conflicts is not None:
+                    self.conflicts.arrived(robot)
+                return True
+            if self.animate:
+                robot.display_x, robot.display_y = self.sample(robot, instruction, current_time)
+            return False
+
+        if instruction.instruction == "pick_up_shelf":
+            shelf = self.shelf_at(instruction.target)
+            if shelf is not None and (robot.x, robot.y) == instruction.target:
+                robot.shelf_assigned = shelf
+                robot.shelf_custody = True
+                shelf.carrier = robot
+                del self.shelf_cells[instruction.target]
+                self.grid.clear_flag(instruction.target, SHELF)
+            return True
+
+        if instruction.instruction == "drop_shelf":
+            if robot.shelf_custody:
+                shelf = robot.shelf_assigned
+                shelf.carrier = None
+                shelf.x, shelf.y = robot.x, robot.y
+                self.shelf_cells[(robot.x, robot.y)] = shelf
+                self.grid.set_flag((robot.x, robot.y), SHELF)
+                robot.shelf_custody = False
+                robot.shelf_delivered = True
+            return True
+
+        # Unknown instructions are dropped so they cannot block the queue
+        return True
+
+    def sample(self, robot, instruction, current_time):
+        """
+        Position of robot at current_time during its move instruction.
+        """
+        if instruction.trajectory is not None:
+            return instruction.trajectory.position(current_time)
+        return robot.move_robot((robot.x, robot.y), instruction.target, current_time,
+                                instruction.start_time, instruction.duration)
+
+    def display_position(self, robot, t=None):
+        """
+        Position of robot in cell units at time t (now by default), computed
+        from its current move rather than from the last tick, so a viewer can
+        draw smooth motion without the environment animating every tick.
+        """
+        if t is None:
+            t = self.time
+        instructions = robot.instructions
+        if instructions and instructions[0].instruction == "move" and instructions[0].start_time <= t:
+            return self.sample(robot, instructions[0], min(t, instructions[0].start_time + instructions[0].duration))
+        return float(robot.x), float(robot.y)
+
+    def process_robot_instructions(self, current_time):
+        if self.fleet is not None:
+            self.process_fleet_instructions(current_time)
+            return
+        scheduler = self.scheduler
+        touched = set()
+        while True:
+            robot = scheduler.pop(current_time)
+            if robot is None:
+                break
+            self.advance_robot(robot, current_time)
+            touched.add(robot)
+        if self.animate:
+            for robot, instruction in self.moving.items():
+                robot.display_x, robot.display_y = self.sample(robot, instruction, current_time)
+            touched.update(self.moving)
+        self.update_contacts(touched)
+
+    def contact_radius(self, robot):
+        # A carried shelf widens the robot's footprint to the shelf's
+        return SHELF_RADIUS if robot.shelf_custody else ROBOT_RADIUS
+
+    def update_contacts(self, robots):
+        """
+        Moves robots in the spatial hash and refreshes their contacts with
+        nearby robots. Every contact that was not there before counts as a
+        collision. Only the given robots are checked, so the cost follows the
+        number of robots that moved.
+        """
+        spatial = self.spatial
+        for robot in robots:
+            spatial.move(robot.id, robot.display_x, robot.display_y)
+        for robot in robots:
+            x, y = robot.display_x, robot.display_y
+            radius = self.contact_radius(robot)
+            current = set()
+            for other_id in spatial.near(x, y, radius + SHELF_RADIUS):
+                if other_id == robot.id:
+                    continue
+                other = self.robots[other_id - 1]
+                reach = radius + self.contact_radius(other)
+                dx = other.display_x - x
+                dy = other.display_y - y
+                if dx * dx + dy * dy < reach * reach:
+                    current.add(other_id)
+            previous = self.contacts.get(robot.id, set())
+            for other_id in current - previous:
+                self.collisions += 1
+                self.contacts.setdefault(other_id, set()).add(robot.id)
+            for other_id in previous - current:
+                self.contacts.get(other_id, set()).discard(robot.id)
+            self.contacts[robot.id] = current
+
+    def advance_robot(self, robot, current_time):
+        """
+        Works through robot's due instructions after the scheduler woke it,
+        then schedules its next wake-up: the end of a move in progress or the
+        start of the next queued instruction.
+        """
+        instructions = robot.instructions
+        while instructions:
+            current_instruction = instructions[0]
+            if current_time < current_instruction.start_time:
+                self.moving.pop(robot, None)
+                self.scheduler.schedule(robot, current_instruction.start_time)
+                return
+            if (self.conflicts is not None and current_instruction.instruction == "move"
+                    and self.moving.get(robot) is not current_instruction
+                    and not self.conflicts.may_enter(robot, current_instruction, current_time)):
+                # The target is taken; try again next tick
+                self.moving.pop(robot, None)
+                self.scheduler.schedule(robot, current_time + self.dt)
+                return
+            self.set_state(robot, "active")
+            if not self.execute_instruction(robot, current_instruction, current_time):
+                self.moving[robot] = current_instruction
+                self.scheduler.schedule(robot, current_instruction.start_time + current_instruction.duration)
+                return
+            self.finish_instruction(robot)
+        self.moving.pop(robot, None)
+        self.set_state(robot, "idle")
+
+    def set_state(self, robot, state):
+        if robot.state != state:
+            robot.state = state
+            if self.recorder is not None:
+                self.recorder.state_changed(robot)
+
+    def finish_instruction(self, robot):
+        robot.instructions.popleft()
+        if self.recorder is not None:
+            self.recorder.finished(robot)
+
+    def process_fleet_instructions(self, current_time):
+        """
+        process_robot_instructions for a fleet store: moves are interpolated
+        and tested for arrival in one batch, and Python code only runs for the
+        robots whose instruction starts or finishes.
+        """
+        fleet = self.fleet
+        while True:
+            for index in fleet.due(current_time):
+                self.start_fleet_instructions(self.robots[index], current_time)
+            arrived = fleet.advance(current_time)
+            if not arrived.size:
+                break
+            for index in arrived:
+                robot = self.robots[index]
+                self.finish_instruction(robot)
+                self.spatial.move(robot.id, robot.x, robot.y)
+                if self.congestion is not None:
+                    self.congestion.record((robot.x, robot.y), current_time)
+                if self.conflicts is not None:
+                    self.conflicts.arrived(robot)
+                self.start_fleet_instructions(robot, current_time)
+        self.update_fleet_contacts()
+
+    def update_fleet_contacts(self):
+        """
+        update_contacts for a fleet store: all contacts are found in one
+        vectorized pass and only the pairs that started or ended are applied.
+        The spatial hash of a fleet store is kept per cell: robots are moved
+        in it when they arrive.
+        """
+        a, b = self.fleet.contact_pairs(ROBOT_RADIUS, SHELF_RADIUS)
+        codes = np.unique((a << 32) | b)
+        previous = self.contact_codes
+        self.contact_codes = codes
+        started = np.setdiff1d(codes, previous, assume_unique=True)
+        ended = np.setdiff1d(previous, codes, assume_unique=True)
+        self.collisions += started.size
+        for code in started.tolist():
+            first, second = self.robots[code >> 32].id, self.robots[code & 0xFFFFFFFF].id
+            self.contacts.setdefault(first, set()).add(second)
+            self.contacts.setdefault(second, set()).add(first)
+        for code in ended.tolist():
+            first, second = self.robots[code >> 32].id, self.robots[code & 0xFFFFFFFF].id
+            self.contacts.get(first, set()).discard(second)
+            self.contacts.get(second, set()).discard(first)
+
+    def start_fleet_instructions(self, robot, current_time):
+        """
+        Executes the due instructions at the head of robot's queue until a
+        move begins (which the fleet store then animates) or the next
+        instruction is not due yet.
+        """
+        fleet = self.fleet
+        instructions = robot.instructions
+        while instructions and instructions[0].start_time <= current_time:
+            instruction = instructions[0]
+            if (self.conflicts is not None and instruction.instruction == "move"
+                    and not self.conflicts.may_enter(robot, instruction, current_time)):
+                # The target is taken; try again next tick
+                fleet.next_start[robot.index] = current_time + self.dt
+                return
+            self.set_state(robot, "active")
+            if instruction.instruction == "move":
+                fleet.begin_move(robot.index, instruction.target, instruction.start_time, instruction.duration)
+                fleet.next_start[robot.index] = np.inf
+                return
+            self.execute_instruction(robot, instruction, current_time)
+            self.finish_instruction(robot)
+        if instructions:
+            fleet.next_start[robot.index] = instructions[0].start_time
+        else:
+            fleet.next_start[robot.index] = np.inf
+            self.set_state(robot, "idle")
+
+    def step(self, dt=None):
+        """
+        Advances the simulated clock by dt seconds (the environment's default
+        time step if omitted) and processes every instruction that is due.
+        """
+        if dt is None:
+            dt = self.dt
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.start_tick()
+            started = time.perf_counter()
+        if self.server is not None:
+            self.server.apply()
+            if metrics is not None:
+                applied = time.perf_counter()
+                metrics.add("events", applied - started)
+                started = applied
+        self.time += dt
+        if self.planner_pool is not None and self.planner_pool.busy():
+            self.merge_parallel_plans()
+        if self.fleet_planner.pending:
+            self.plan_pending(self.planning_budget)
+        if self.changed_cells:
+            self.repair_paths()
+        if metrics is not None:
+            planned = time.perf_counter()
+            metrics.add("planning", planned - started)
+        self.process_robot_instructions(self.time)
+        if self.conflicts is not None:
+            self.conflicts.tick()
+        if metrics is not None:
+            metrics.add("instructions", time.perf_counter() - planned)
+        if self.recorder is not None:
+            self.recorder.tick()
+        if self.server is not None:
+            self.server.publish()
+        return self.time
+
+    def run_until(self, t):
+        """
+        Steps the simulation with the default time step until the simulated
+        clock reaches t. The last step is shortened so the clock lands on t.
+        """
+        while self.running and self.time < t - 1e-9:
+            self.step(min(self.dt, t - self.time))
+        return self.time
+
+    def next_event_time(self):
+        """
+        Simulated time of the next instruction start or move end, or None if
+        nothing is queued. Headless runs can step straight to it.
+        """
+        if self.fleet is not None:
+            fleet = self.fleet
+            n = fleet.robot_count
+            times = np.concatenate((fleet.next_start[:n],
+                                    np.where(fleet.moving[:n], fleet.move_start[:n] + fleet.move_duration[:n], np.inf)))
+            earliest = times.min() if times.size else np.inf
+            return None if earliest == np.inf else float(earliest)
+        return self.scheduler.next_time()
+
+    def is_idle(self):
+        return all(not robot.instructions for robot in self.robots)
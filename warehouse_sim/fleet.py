@@ -0,0 +1,241 @@
+import numpy as np
+from .engine import Robot, Shelf
+
+# Robot states as stored in FleetStore.state
+STATES = ("idle", "active")
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+
+# Initial number of robot/shelf slots; arrays double when full
+INITIAL_CAPACITY = 64
+
+
+class FleetStore:
+    """
+    Struct-of-arrays storage for the whole fleet. Every robot and shelf
+    attribute lives in one NumPy array indexed by slot, so per-tick work
+    (interpolating moves, arrival tests) runs as a handful of array
+    operations instead of a Python loop. Shelves store where they rest; a
+    carried shelf is wherever its robot is.
+    RobotView and ShelfView give the familiar per-object interface on top.
+    """
+    ROBOT_FIELDS = {
+        "x": np.int32, "y": np.int32,
+        "display_x": np.float64, "display_y": np.float64,
+        "state": np.uint8,
+        "shelf_custody": np.bool_, "shelf_delivered": np.bool_,
+        "shelf_assigned": np.int32,  # shelf slot, -1 for none
+        # Current move: target cell, start time and duration
+        "moving": np.bool_,
+        "target_x": np.int32, "target_y": np.int32,
+        "move_start": np.float64, "move_duration": np.float64,
+        "next_start": np.float64,  # start time of the queued instruction, inf if none
+    }
+    SHELF_FIELDS = {"shelf_x": np.int32, "shelf_y": np.int32}
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.robot_count = 0
+        self.shelf_count = 0
+        self.robot_capacity = 0
+        self.shelf_capacity = 0
+        self.grow_robots(capacity)
+        self.grow_shelves(capacity)
+
+    def grow_robots(self, capacity):
+        for name, dtype in self.ROBOT_FIELDS.items():
+            array = np.zeros(capacity, dtype=dtype)
+            if self.robot_capacity:
+                array[:self.robot_count] = getattr(self, name)[:self.robot_count]
+            setattr(self, name, array)
+        self.robot_capacity = capacity
+
+    def grow_shelves(self, capacity):
+        for name, dtype in self.SHELF_FIELDS.items():
+            array = np.zeros(capacity, dtype=dtype)
+            if self.shelf_capacity:
+                array[:self.shelf_count] = getattr(self, name)[:self.shelf_count]
+            setattr(self, name, array)
+        self.shelf_capacity = capacity
+
+    def add_robot(self, x, y):
+        if self.robot_count == self.robot_capacity:
+            self.grow_robots(2 * self.robot_capacity)
+        index = self.robot_count
+        self.robot_count += 1
+        self.x[index], self.y[index] = x, y
+        self.display_x[index], self.display_y[index] = x, y
+        self.state[index] = STATE_CODES["idle"]
+        self.shelf_custody[index] = False
+        self.shelf_delivered[index] = False
+        self.shelf_assigned[index] = -1
+        self.moving[index] = False
+        self.next_start[index] = np.inf
+        return index
+
+    def add_shelf(self, x, y):
+        if self.shelf_count == self.shelf_capacity:
+            self.grow_shelves(2 * self.shelf_capacity)
+        index = self.shelf_count
+        self.shelf_count += 1
+        self.shelf_x[index], self.shelf_y[index] = x, y
+        return index
+
+    def begin_move(self, index, target, start_time, duration):
+        self.moving[index] = True
+        self.target_x[index], self.target_y[index] = target
+        self.move_start[index] = start_time
+        self.move_duration[index] = duration
+
+    def due(self, current_time):
+        """
+        Slots of robots that are not moving and whose next instruction is due.
+        """
+        n = self.robot_count
+        return np.flatnonzero(~self.moving[:n] & (self.next_start[:n] <= current_time))
+
+    def advance(self, current_time):
+        """
+        Interpolates every moving robot's display position to current_time
+        (Robot.move_robot for the whole fleet), then moves the robots whose
+        move has finished onto their target cell. Returns the slots of the
+        robots that arrived.
+        """
+        moving = np.flatnonzero(self.moving[:self.robot_count])
+        if not moving.size:
+            return moving
+        x = self.x[moving]
+        y = self.y[moving]
+        target_x = self.target_x[moving]
+        target_y = self.target_y[moving]
+        proportion = np.minimum((current_time - self.move_start[moving]) / self.move_duration[moving], 1.0)
+        display_x = x + (target_x - x) * proportion
+        display_y = y + (target_y - y) * proportion
+        self.display_x[moving] = display_x
+        self.display_y[moving] = display_y
+
+        # Compared like Environment.execute_instruction and next_event_time do, not
+        # through proportion, which rounding can leave just short of 1
+        arrived = moving[current_time >= self.move_start[moving] + self.move_duration[moving]]
+        if arrived.size:
+            self.x[arrived] = self.target_x[arrived]
+            self.y[arrived] = self.target_y[arrived]
+            self.display_x[arrived] = self.x[arrived]
+            self.display_y[arrived] = self.y[arrived]
+            self.moving[arrived] = False
+        return arrived
+
+
+    def contact_pairs(self, robot_radius, shelf_radius):
+        """
+        Vectorized spatial hash: returns slot arrays (a, b), a < b, of every
+        pair of robots closer than the sum of their radii (shelf_radius for
+        robots carrying a shelf). Robots are bucketed on a grid as coarse as
+        the largest contact distance, sorted by bucket, and each bucket is
+        matched against itself and four neighbours with searchsorted, so the
+        cost grows with n log n rather than n squared.
+        """
+        n = self.robot_count
+        empty = np.zeros(0, dtype=np.int64)
+        if n < 2:
+            return empty, empty
+        x = self.display_x[:n]
+        y = self.display_y[:n]
+        radius = np.where(self.shelf_custody[:n], shelf_radius, robot_radius)
+        size = 2 * max(robot_radius, shelf_radius)
+        bx = np.floor(x / size).astype(np.int64)
+        by = np.floor(y / size).astype(np.int64)
+        bx -= bx.min() - 1
+        by -= by.min() - 1
+        span = int(by.max()) + 2
+        keys = bx * span + by
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        positions = np.arange(n)
+
+        first, second = [], []
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            target = sorted_keys + dx * span + dy
+            right = np.searchsorted(sorted_keys, target, "right")
+            if dx == 0 and dy == 0:
+                left = positions + 1  # later entries of the same bucket only
+            else:
+                left = np.searchsorted(sorted_keys, target, "left")
+            counts = np.maximum(right - left, 0)
+            total = int(counts.sum())
+            if not total:
+                continue
+            a = np.repeat(positions, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            b = np.repeat(left, counts) + offsets
+            first.append(order[a])
+            second.append(order[b])
+        if not first:
+            return empty, empty
+        a = np.concatenate(first)
+        b = np.concatenate(second)
+        reach = radius[a] + radius[b]
+        close = (x[a] - x[b]) ** 2 + (y[a] - y[b]) ** 2 < reach * reach
+        a, b = a[close], b[close]
+        return np.minimum(a, b), np.maximum(a, b)
+
+
+def _field(name, cast):
+    def get(self):
+        return cast(getattr(self.store, name)[self.index])
+
+    def set(self, value):
+        getattr(self.store, name)[self.index] = value
+    return property(get, set)
+
+
+class RobotView(Robot):
+    """
+    Robot whose attributes live in a FleetStore slot. Behaves like Robot so
+    existing code keeps working.
+    """
+    x = _field("x", int)
+    y = _field("y", int)
+    display_x = _field("display_x", float)
+    display_y = _field("display_y", float)
+    shelf_custody = _field("shelf_custody", bool)
+    shelf_delivered = _field("shelf_delivered", bool)
+
+    def __init__(self, store, shelves, robot_id, x, y):
+        self.store = store
+        self.shelves = shelves  # the environment's shelf list, to resolve shelf_assigned
+        self.index = store.add_robot(x, y)
+        super().__init__(robot_id, x, y)
+
+    @property
+    def state(self):
+        return STATES[self.store.state[self.index]]
+
+    @state.setter
+    def state(self, value):
+        self.store.state[self.index] = STATE_CODES[value]
+
+    @property
+    def shelf_assigned(self):
+        index = self.store.shelf_assigned[self.index]
+        return None if index < 0 else self.shelves[index]
+
+    @shelf_assigned.setter
+    def shelf_assigned(self, shelf):
+        self.store.shelf_assigned[self.index] = -1 if shelf is None else shelf.index
+
+    def reset(self):
+        super().reset()
+        self.store.moving[self.index] = False
+        self.store.next_start[self.index] = np.inf
+
+
+class ShelfView(Shelf):
+    """
+    Shelf whose resting position lives in a FleetStore slot.
+    """
+    rest_x = _field("shelf_x", int)
+    rest_y = _field("shelf_y", int)
+
+    def __init__(self, store, shelf_id, x, y):
+        self.store = store
+        self.index = store.add_shelf(x, y)
+        super().__init__(shelf_id, x, y)
@@ -0,0 +1,149 @@
+import argparse
+import io
+import time
+import numpy as np
+from .a_star.grid import FREE, OBSTACLE, SHELF
+from .engine import Environment
+
+# Layout mark for a robot's start cell; the other layout bits are grid flags
+ROBOT = 4
+
+# Characters of text maps. Obstacles and open floor follow the MovingAI
+# benchmark format (any other character is open floor); "$" is a shelf and
+# "R" a robot's start cell.
+OBSTACLE_CHARS = b"@OTW"
+SHELF_CHARS = b"$"
+ROBOT_CHARS = b"R"
+
+# Layout code of every byte value, for parsing a whole map in one lookup
+CODES = np.full(256, FREE, dtype=np.uint8)
+CODES[list(OBSTACLE_CHARS)] = OBSTACLE
+CODES[list(SHELF_CHARS)] = SHELF
+CODES[list(ROBOT_CHARS)] = ROBOT
+
+# Character written for every layout code; a robot under a shelf is written as a robot
+CHARACTERS = np.frombuffer(b".@$@R@R@", dtype=np.uint8)
+
+
+def parse_map(data):
+    """
+    Layout of a MovingAI-style text map given as bytes: header lines
+    ("type octile", "height H", "width W"), a line reading "map" and then H
+    rows of W characters.
+    """
+    header = {}
+    offset = 0
+    while True:
+        end = data.find(b"\n", offset)
+        if end < 0:
+            raise ValueError("Map has no 'map' line")
+        line = data[offset:end].strip()
+        offset = end + 1
+        if line.lower() == b"map":
+            break
+        if line:
+            key, _, value = line.partition(b" ")
+            header[key.lower()] = value.strip()
+    try:
+        width, height = int(header[b"width"]), int(header[b"height"])
+    except (KeyError, ValueError):
+        raise ValueError("Map header needs a width and a height")
+
+    body = np.frombuffer(data, dtype=np.uint8, offset=offset)
+    if b"\r" in data:
+        body = body[body != ord("\r")]
+    size = height * (width + 1)
+    if body.size == size - 1:
+        body = np.append(body, np.uint8(ord("\n")))
+    if body.size < size:
+        raise ValueError(f"Map has fewer than {height} rows of {width} cells")
+    rows = body[:size].reshape(height, width + 1)
+    if np.any(rows[:, width] != ord("\n")):
+        raise ValueError(f"Map rows are not {width} cells wide")
+    return CODES[rows[:, :width]]
+
+
+def read_map(path, mmap=True):
+    """
+    Reads a warehouse layout: a (height, width) uint8 array holding OBSTACLE
+    and SHELF flags and ROBOT marks. A .npy file holds that array and is
+    memory-mapped unless mmap is False; any other file is parsed as a text
+    map (see parse_map).
+    """
+    if str(path).endswith(".npy"):
+        return np.load(path, mmap_mode="r" if mmap else None)
+    with open(path, "rb") as f:
+        return parse_map(f.read())
+
+
+def write_map(path, layout):
+    """
+    Writes a layout as .npy or, for any other suffix, as a text map.
+    """
+    layout = np.asarray(layout, dtype=np.uint8)
+    if str(path).endswith(".npy"):
+        np.save(path, layout)
+        return
+    height, width = layout.shape
+    rows = np.empty((height, width + 1), dtype=np.uint8)
+    rows[:, :width] = CHARACTERS[layout & 7]
+    rows[:, width] = ord("\n")
+    with open(path, "wb") as f:
+        f.write(b"type octile\nheight %d\nwidth %d\nmap\n" % (height, width))
+        f.write(rows.tobytes())
+
+
+def read_tasks(path):
+    """
+    Reads a task list of (shelf id, x, y) rows, either from a .npy array or
+    from a text file with one task per line, separated by spaces or commas
+    ('#' starts a comment). Returns [(shelf_id, (x, y))].
+    """
+    if str(path).endswith(".npy"):
+        rows = np.load(path)
+    else:
+        with open(path) as f:
+            text = f.read().replace(",", " ")
+        rows = np.loadtxt(io.StringIO(text), dtype=np.int64, ndmin=2) if text.strip() else np.zeros((0, 3))
+    return [(shelf_id, (x, y)) for shelf_id, x, y in np.asarray(rows, dtype=np.int64).reshape(-1, 3).tolist()]
+
+
+def build_environment(layout, **options):
+    """
+    Environment for a layout from read_map, with one bulk update per kind of
+    cell instead of an add_* call per cell. Shelves and robots are numbered
+    row by row. options are passed on to Environment.
+    """
+    layout = np.asarray(layout)
+    height, width = layout.shape
+    environment = Environment(width, height, **options)
+    for mark, add in ((OBSTACLE, environment.add_obstacles), (SHELF, environment.add_shelves),
+                      (ROBOT, environment.add_robots)):
+        ys, xs = np.nonzero(layout & mark)
+        add(np.column_stack((xs, ys)))
+    return environment
+
+
+def load_environment(path, **options):
+    return build_environment(read_map(path), **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a warehouse map and report how long it takes")
+    parser.add_argument("map", help="text map or .npy layout")
+    parser.add_argument("--convert", help="also write the layout to this file (.npy or text map)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    layout = read_map(args.map)
+    environment = build_environment(layout)
+    elapsed = time.perf_counter() - started
+    print(f"{environment.width}x{environment.height}: {len(environment.shelves)} shelves, "
+          f"{len(environment.robots)} robots, {int(np.count_nonzero(layout & OBSTACLE))} obstacle cells "
+          f"loaded in {elapsed:.3f}s")
+    if args.convert:
+        write_map(args.convert, layout)
+
+
+if __name__ == "__main__":
+    main()
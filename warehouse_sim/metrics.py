@@ -0,0 +1,208 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Columns of a tick row. A row spans one Environment.step() plus whatever the
+# driver does until the next one (a viewer's drawing and event handling).
+FIELDS = ("time", "tick_seconds", "events", "planning", "instructions", "drawing", "expansions",
+          "queue_depth", "pending_plans", "active_robots", "idle_robots", "collisions")
+COLUMNS = {name: column for column, name in enumerate(FIELDS)}
+
+# Fields timed with add(); seconds spent in each phase of a tick
+PHASES = ("events", "planning", "instructions", "drawing")
+
+# Default number of tick rows kept in memory
+CAPACITY = 4096
+
+# Default wall-clock seconds between flushes to the output file
+FLUSH_INTERVAL = 5.0
+
+
+class Metrics:
+    """
+    Per-tick instrumentation for an Environment. While attached, step() and
+    the viewer time their phases and count A* expansions into the current
+    row; when the next tick starts the row is completed with queue depths,
+    robot counts and new collisions and stored in a ring buffer of the last
+    capacity ticks. Rows are appended to path as CSV every flush_interval
+    seconds, and serve() exposes running totals as Prometheus text. With no
+    Metrics attached the hooks cost one attribute check per phase.
+    """
+    def __init__(self, capacity=CAPACITY, path=None, flush_interval=FLUSH_INTERVAL):
+        self.capacity = capacity
+        self.rows = np.zeros((capacity, len(FIELDS)))
+        self.count = 0  # rows completed so far; the next one goes to count % capacity
+        self.current = [0.0] * len(FIELDS)
+        self.totals = dict.fromkeys(PHASES + ("tick_seconds", "expansions", "collisions"), 0.0)
+        self.environment = None
+        self.tick_started = None
+        self.last_collisions = 0
+        self.path = path
+        self.file = None
+        self.flushed = 0  # rows written to the file so far
+        self.flush_interval = flush_interval
+        self.last_flush = time.perf_counter()
+        self.server = None
+        self.lock = threading.Lock()
+
+    def attach(self, environment):
+        self.environment = environment
+        environment.metrics = self
+        self.last_collisions = environment.collisions
+        self.tick_started = None
+
+    def detach(self):
+        if self.environment is not None:
+            self.environment.metrics = None
+            self.environment = None
+
+    def add(self, field, value):
+        self.current[COLUMNS[field]] += value
+
+    def start_tick(self):
+        """
+        Called by the environment at the start of every step; completes the
+        row of the previous tick.
+        """
+        now = time.perf_counter()
+        if self.tick_started is not None:
+            self.current[COLUMNS["tick_seconds"]] = now - self.tick_started
+            self.end_tick()
+            if self.path is not None and now - self.last_flush >= self.flush_interval:
+                self.flush()
+        self.tick_started = now
+
+    def end_tick(self):
+        environment = self.environment
+        row = self.current
+        row[COLUMNS["time"]] = environment.time
+        if environment.fleet is not None:
+            fleet = environment.fleet
+            n = fleet.robot_count
+            waiting = np.count_nonzero(fleet.next_start[:n] != np.inf)
+            row[COLUMNS["queue_depth"]] = waiting + np.count_nonzero(fleet.moving[:n])
+            active = np.count_nonzero(fleet.state[:n])
+        else:
+            row[COLUMNS["queue_depth"]] = len(environment.scheduler)
+            active = sum(1 for robot in environment.robots if robot.state == "active")
+        row[COLUMNS["pending_plans"]] = len(environment.fleet_planner.pending) + len(environment.parallel_requests)
+        row[COLUMNS["active_robots"]] = active
+        row[COLUMNS["idle_robots"]] = len(environment.robots) - active
+        row[COLUMNS["collisions"]] = environment.collisions - self.last_collisions
+        self.last_collisions = environment.collisions
+
+        with self.lock:
+            self.rows[self.count % self.capacity] = row
+            self.count += 1
+            for name in self.totals:
+                self.totals[name] += row[COLUMNS[name]]
+        self.current = [0.0] * len(FIELDS)
+
+    def recent(self, n=None):
+        """
+        The last n completed rows (all that are kept by default), oldest
+        first, as a (n, len(FIELDS)) array.
+        """
+        kept = min(self.count, self.capacity)
+        n = kept if n is None else min(n, kept)
+        start = self.count - n
+        with self.lock:
+            return self.rows[np.arange(start, self.count) % self.capacity]
+
+    def column(self, field, n=None):
+        return self.recent(n)[:, COLUMNS[field]]
+
+    def flush(self):
+        """
+        Appends the rows completed since the last flush to the output file.
+        Rows that were overwritten in the ring before a flush are lost.
+        """
+        self.last_flush = time.perf_counter()
+        if self.path is None:
+            return
+        if self.file is None:
+            self.file = open(self.path, "w")
+            self.file.write(",".join(FIELDS) + "\n")
+        rows = self.recent(self.count - self.flushed)
+        self.flushed = self.count
+        self.file.writelines(",".join(format(value, "g") for value in row) + "\n" for row in rows.tolist())
+        self.file.flush()
+
+    def render(self):
+        """
+        Prometheus text exposition of the running totals and of the last
+        completed tick.
+        """
+        with self.lock:
+            totals = dict(self.totals)
+            last = self.rows[(self.count - 1) % self.capacity].tolist() if self.count else [0.0] * len(FIELDS)
+            ticks = self.count
+        lines = [
+            "# HELP warehouse_ticks_total Simulation ticks completed.",
+            "# TYPE warehouse_ticks_total counter",
+            "warehouse_ticks_total %d" % ticks,
+            "# HELP warehouse_tick_seconds_total Wall-clock seconds spent in ticks.",
+            "# TYPE warehouse_tick_seconds_total counter",
+            "warehouse_tick_seconds_total %g" % totals["tick_seconds"],
+            "# HELP warehouse_phase_seconds_total Wall-clock seconds spent in each tick phase.",
+            "# TYPE warehouse_phase_seconds_total counter",
+        ]
+        lines += ['warehouse_phase_seconds_total{phase="%s"} %g' % (phase, totals[phase]) for phase in PHASES]
+        lines += [
+            "# HELP warehouse_expansions_total Search nodes expanded by path planning.",
+            "# TYPE warehouse_expansions_total counter",
+            "warehouse_expansions_total %d" % totals["expansions"],
+            "# HELP warehouse_collisions_total Robot contacts started.",
+            "# TYPE warehouse_collisions_total counter",
+            "warehouse_collisions_total %d" % totals["collisions"],
+            "# HELP warehouse_sim_time_seconds Simulated time at the last tick.",
+            "# TYPE warehouse_sim_time_seconds gauge",
+            "warehouse_sim_time_seconds %g" % last[COLUMNS["time"]],
+            "# HELP warehouse_queue_depth Robots waiting on a scheduled instruction start or move end.",
+            "# TYPE warehouse_queue_depth gauge",
+            "warehouse_queue_depth %d" % last[COLUMNS["queue_depth"]],
+            "# HELP warehouse_pending_plans Path requests not planned yet.",
+            "# TYPE warehouse_pending_plans gauge",
+            "warehouse_pending_plans %d" % last[COLUMNS["pending_plans"]],
+            "# HELP warehouse_robots Robots by state.",
+            "# TYPE warehouse_robots gauge",
+            'warehouse_robots{state="active"} %d' % last[COLUMNS["active_robots"]],
+            'warehouse_robots{state="idle"} %d' % last[COLUMNS["idle_robots"]],
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        """
+        Serves render() over HTTP from a daemon thread. Returns the bound
+        (host, port); port 0 picks a free one.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address
+
+    def close(self):
+        if self.path is not None:
+            self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.detach()
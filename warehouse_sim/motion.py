@@ -0,0 +1,157 @@
+import bisect
+import math
+
+# Default motion limits in cells and seconds
+MAX_SPEED = 2.0  # cells per second
+ACCELERATION = 2.0  # cells per second squared
+TURN_TIME = 0.25  # seconds per quarter turn, turning in place
+
+# Headings by unit step, counted in quarter turns
+HEADINGS = {(1, 0): 0, (0, 1): 1, (-1, 0): 2, (0, -1): 3}
+
+
+class MotionModel:
+    """
+    Kinematic limits of a robot: top speed, acceleration (and deceleration)
+    and the time a quarter turn in place takes. Robots stop to turn and to
+    wait, so a path falls apart into straight runs that start and end at
+    rest.
+    """
+    def __init__(self, max_speed=MAX_SPEED, acceleration=ACCELERATION, turn_time=TURN_TIME):
+        self.max_speed = max_speed
+        self.acceleration = acceleration
+        self.turn_time = turn_time
+
+    def turn_duration(self, heading, new_heading):
+        if heading is None:
+            return 0.0
+        quarters = (new_heading - heading) % 4
+        return min(quarters, 4 - quarters) * self.turn_time
+
+    def fastest(self, distance):
+        """
+        Shortest time to cover distance cells from rest to rest.
+        """
+        v, a = self.max_speed, self.acceleration
+        if distance >= v * v / a:
+            return distance / v + v / a
+        return 2 * math.sqrt(distance / a)
+
+    def cell_time(self):
+        """
+        Step duration with which any planned step, including a half turn
+        before it, can be driven on schedule.
+        """
+        return self.fastest(1) + 2 * self.turn_time
+
+    def peak_speed(self, distance, duration):
+        """
+        Cruise speed of the gentlest rest-to-rest profile that covers
+        distance in exactly duration: accelerate, cruise, decelerate.
+        """
+        a = self.acceleration
+        discriminant = (a * duration) ** 2 - 4 * a * distance
+        if discriminant < 0:
+            return min(self.max_speed, math.sqrt(a * distance))
+        return min(self.max_speed, (a * duration - math.sqrt(discriminant)) / 2)
+
+    def trajectory(self, position, moves, heading=None):
+        """
+        Trajectory for moves, a list of (cell, start time, duration) one-cell
+        steps starting at position as a step schedule would queue them.
+        Consecutive steps in the same direction with no gap between them form
+        one run, which is driven without stopping so that it ends on
+        schedule. A run that cannot be driven in its slot within the limits
+        is driven as fast as possible and everything after it is delayed.
+        """
+        return Trajectory(self, position, moves, heading)
+
+
+class Trajectory:
+    """
+    Time-parameterized path of one robot: a sequence of segments of constant
+    acceleration along one axis (turns are segments that stand still), so
+    position(t) is closed form. moves lists (cell, start time, duration) of
+    the one-cell steps as driven, for queueing as move instructions; heading
+    is the heading at the end and delay how far the end is behind schedule.
+    """
+    def __init__(self, model, position, moves, heading=None):
+        self.starts = []  # segment start times
+        self.segments = []  # (duration, x, y, dx, dy, v0, acceleration)
+        self.moves = []
+        self.origin = position
+        delay = 0.0
+        i = 0
+        while i < len(moves):
+            cell, start, duration = moves[i]
+            direction = (cell[0] - position[0], cell[1] - position[1])
+            j = i + 1
+            end = start + duration
+            while (j < len(moves) and abs(moves[j][1] - end) < 1e-9
+                   and (moves[j][0][0] - moves[j - 1][0][0], moves[j][0][1] - moves[j - 1][0][1]) == direction):
+                end = moves[j][1] + moves[j][2]
+                j += 1
+            start += delay
+            end += delay
+            distance = j - i
+            new_heading = HEADINGS.get(direction, heading)
+            turn = model.turn_duration(heading, new_heading)
+            heading = new_heading
+            needed = turn + model.fastest(distance)
+            if needed > end - start:
+                delay += needed - (end - start)
+                end = start + needed
+
+            time = start
+            if turn:
+                self.add(time, turn, position, direction, 0.0, 0.0)
+                time += turn
+            a = model.acceleration
+            v = model.peak_speed(distance, end - time)
+            ramp = v / a
+            cruise = max(distance - v * ramp, 0.0) / v
+            x, y = position
+            self.add(time, ramp, (x, y), direction, 0.0, a)
+            covered = v * ramp / 2
+            self.add(time + ramp, cruise, (x + direction[0] * covered, y + direction[1] * covered), direction, v, 0.0)
+            covered += v * cruise
+            self.add(time + ramp + cruise, ramp, (x + direction[0] * covered, y + direction[1] * covered),
+                     direction, v, -a)
+
+            # Time each cell centre of the run is passed
+            previous = start
+            for k in range(1, distance + 1):
+                if k == distance:
+                    passed = time + 2 * ramp + cruise
+                elif k <= v * ramp / 2:
+                    passed = time + math.sqrt(2 * k / a)
+                elif k <= v * ramp / 2 + v * cruise:
+                    passed = time + ramp + (k - v * ramp / 2) / v
+                else:
+                    left = distance - k
+                    passed = time + 2 * ramp + cruise - math.sqrt(2 * left / a)
+                self.moves.append(((x + direction[0] * k, y + direction[1] * k), previous, passed - previous))
+                previous = passed
+            position = moves[j - 1][0]
+            i = j
+        self.heading = heading
+        self.delay = delay
+        self.end_time = self.moves[-1][1] + self.moves[-1][2] if self.moves else None
+
+    def add(self, start, duration, position, direction, v0, acceleration):
+        if duration > 0:
+            self.starts.append(start)
+            self.segments.append((duration, position[0], position[1], direction[0], direction[1], v0, acceleration))
+
+    def position(self, t):
+        """
+        (x, y) in cell units at time t; before the first segment the robot is
+        at its starting cell and after the last one at the end of the path.
+        """
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i < 0:
+            return float(self.origin[0]), float(self.origin[1])
+        duration, x, y, dx, dy, v0, acceleration = self.segments[i]
+        elapsed = min(t - self.starts[i], duration)
+        distance = v0 * elapsed + acceleration * elapsed * elapsed / 2
+        return x + dx * distance, y + dy * distance
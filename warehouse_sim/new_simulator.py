@@ -0,0 +1,81 @@
+from .engine import Environment
+from .viewer import Viewer
+from .constants import *
+
+
+# Constants
+SCREEN_WIDTH = 600
+SCREEN_HEIGHT = 600
+GRID_ROWS = 10
+GRID_COLS = 10
+CELL_SIZE = 50  # Size of each grid cell
+PADDING = 50  # Padding around the grid for display
+ROBOT_RADIUS = 15  # Radius of the robots (can be changed)
+
+
+def main():
+    environment = Environment(GRID_COLS, GRID_ROWS)
+    environment.add_robot(1, 1)
+    # environment.add_robot(5, 5)
+    environment.instruct_robot(1, (2,1), 0, "move")
+    environment.instruct_robot(1, (3,1), 1, "move")
+    environment.instruct_robot(1, (4,1), 2, "move")
+    environment.instruct_robot(1, (5,1), 3, "move")
+    environment.instruct_robot(1, (5,2), 4, "move")
+    environment.instruct_robot(1, (5,3), 5, "move")
+    # environment.instruct_robot(2, (5,6), 1, "move")
+    # environment.instruct_robot(2, (5,7), 2, "move")
+    # environment.instruct_robot(2, (5,8), 3, "move")
+
+    # # Adding 5 new robots to the environment at different positions
+    # environment.add_robot(2, 2)  # Robot 2 at position (2, 2)
+    # environment.add_robot(3, 3)  # Robot 3 at position (3, 3)
+    # environment.add_robot(4, 4)  # Robot 4 at position (4, 4)
+    # environment.add_robot(5, 5)  # Robot 5 at position (5, 5)
+    # environment.add_robot(6, 6)  # Robot 6 at position (6, 6)
+
+    # # Instructing robots 2 to 6 to move 1 unit at a time in different directions
+    # # Robot 2 (starting at (2, 2))
+    # environment.instruct_robot(2, (3, 2), 0, "move")  # Move right (1 unit)
+    # environment.instruct_robot(2, (3, 3), 1, "move")  # Move up (1 unit)
+    # environment.instruct_robot(2, (2, 3), 2, "move")  # Move left (1 unit)
+    # environment.instruct_robot(2, (2, 2), 3, "move")  # Move down (1 unit)
+    # environment.instruct_robot(2, (3, 2), 4, "move")  # Move right again (1 unit)
+
+    # # Robot 3 (starting at (3, 3))
+    # environment.instruct_robot(3, (3, 4), 0, "move")  # Move up (1 unit)
+    # environment.instruct_robot(3, (4, 4), 1, "move")  # Move right (1 unit)
+    # environment.instruct_robot(3, (4, 3), 2, "move")  # Move down (1 unit)
+    # environment.instruct_robot(3, (3, 3), 3, "move")  # Move left (1 unit)
+    # environment.instruct_robot(3, (3, 4), 4, "move")  # Move up again (1 unit)
+
+    # # Robot 4 (starting at (4, 4))
+    # environment.instruct_robot(4, (5, 4), 0, "move")  # Move right (1 unit)
+    # environment.instruct_robot(4, (5, 5), 1, "move")  # Move up (1 unit)
+    # environment.instruct_robot(4, (6, 5), 2, "move")  # Move right (1 unit)
+    # environment.instruct_robot(4, (6, 4), 3, "move")  # Move down (1 unit)
+    # environment.instruct_robot(4, (5, 4), 4, "move")  # Move left again (1 unit)
+
+    # # Robot 5 (starting at (5, 5))
+    # environment.instruct_robot(5, (5, 6), 0, "move")  # Move up (1 unit)
+    # environment.instruct_robot(5, (6, 6), 1, "move")  # Move right (1 unit)
+    # environment.instruct_robot(5, (6, 5), 2, "move")  # Move down (1 unit)
+    # environment.instruct_robot(5, (5, 5), 3, "move")  # Move left (1 unit)
+    # environment.instruct_robot(5, (5, 6), 4, "move")  # Move up again (1 unit)
+
+    # # Robot 6 (starting at (6, 6))
+    # environment.instruct_robot(6, (7, 6), 0, "move")  # Move right (1 unit)
+    # environment.instruct_robot(6, (7, 7), 1, "move")  # Move up (1 unit)
+    # environment.instruct_robot(6, (6, 7), 2, "move")  # Move left (1 unit)
+    # environment.instruct_robot(6, (6, 6), 3, "move")  # Move down (1 unit)
+    # environment.instruct_robot(6, (7, 6), 4, "move")  # Move right again (1 unit)
+
+    viewer = Viewer(environment, cell_size=CELL_SIZE, padding=PADDING,
+                    screen_size=(SCREEN_WIDTH, SCREEN_HEIGHT), robot_radius=ROBOT_RADIUS,
+                    on_intersections=True, fps=50)
+    viewer.run()
+    viewer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import argparse
+import numpy as np
+from .a_star.grid import SHELF
+from .engine import Environment, Instruction
+from .fleet import STATES, STATE_CODES
+
+# File signature followed by fixed-size little-endian records
+MAGIC = b"WHLOG001"
+
+# One log record; field meaning depends on event (see below)
+RECORD = np.dtype([("time", "<f8"), ("event", "u1"), ("code", "u1"), ("id", "<u4"),
+                   ("x", "<i4"), ("y", "<i4"), ("a", "<f8"), ("b", "<f8")])
+
+# Events. x, y are cells; unused fields are 0.
+START = 0  # x, y = grid size, a = dt, b = step duration
+ADD_ROBOT = 1  # id, x, y
+ADD_SHELF = 2  # id, x, y
+ADD_OBSTACLE = 3  # x, y
+INSTRUCT = 4  # id = robot, code = instruction, x, y = target, a = start time, b = duration
+DONE = 5  # id = robot; the instruction at the head of its queue completed
+STATE = 6  # id = robot, code = state
+CANCEL = 7  # id = robot, x = queued instructions dropped from the tail
+KEYFRAME = 8  # full dynamic state follows as KEY_* records with the same time
+KEY_ROBOT = 9  # id, x, y, code = state, a = carried shelf id (0 for none), b = 1 if delivered
+KEY_SHELF = 10  # id, x, y
+KEY_INSTRUCT = 11  # like INSTRUCT, for an instruction queued at the keyframe
+WAIT = 12  # id = robot; a conflicts.ConflictMonitor held its due move back
+SHIFT = 13  # id = robot, a = seconds its queued instructions were delayed by after waiting
+
+# Instruction names by code; anything else is stored as UNKNOWN
+INSTRUCTIONS = ("move", "pick_up_shelf", "drop_shelf")
+INSTRUCTION_CODES = {name: code for code, name in enumerate(INSTRUCTIONS)}
+UNKNOWN = 255
+
+# Events replayed as inputs when playing a log forward; the rest follow from them
+INPUTS = (ADD_ROBOT, ADD_SHELF, ADD_OBSTACLE, INSTRUCT, CANCEL)
+
+# Events a RecordedWaits applies while the engine steps, in place of the monitor that wrote them
+WAITS = (WAIT, SHIFT)
+
+# Seconds within which a recorded time counts as the time being replayed
+TIME_TOLERANCE = 1e-9
+
+# Default simulated seconds between keyframes
+KEYFRAME_INTERVAL = 60.0
+
+# Records buffered in memory before they are appended to the file
+FLUSH_SIZE = 4096
+
+
+class Recorder:
+    """
+    Append-only binary log of an Environment: every added robot, shelf and
+    obstacle, every instruction issued, every instruction completed (moves,
+    pickups and drops), every state change, every instruction cancelled and
+    every move a conflicts.ConflictMonitor held back.
+    Records are 38 bytes and written in batches. Every keyframe_interval
+    simulated seconds a keyframe stores the full dynamic state, so a replay
+    can seek to any time without reading the log from the start.
+    """
+    def __init__(self, path, keyframe_interval=KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.buffer = []
+        self.environment = None
+        self.last_keyframe = None
+
+    def attach(self, environment):
+        """
+        Starts recording environment, including what it already contains.
+        """
+        self.environment = environment
+        environment.recorder = self
+        self.write(START, 0, 0, environment.width, environment.height, environment.dt, environment.step_duration)
+        for x, y in environment.obstacles:
+            self.obstacle_added(x, y)
+        for shelf in environment.shelves:
+            self.shelf_added(shelf)
+        for robot in environment.robots:
+            self.robot_added(robot)
+        self.keyframe()
+        return self
+
+    def write(self, event, code=0, id=0, x=0, y=0, a=0.0, b=0.0):
+        self.buffer.append((self.environment.time, event, code, id, x, y, a, b))
+        if len(self.buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            np.array(self.buffer, dtype=RECORD).tofile(self.file)
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        if self.environment is not None and self.environment.recorder is self:
+            self.environment.recorder = None
+
+    def robot_added(self, robot):
+        self.write(ADD_ROBOT, 0, robot.id, robot.x, robot.y)
+
+    def shelf_added(self, shelf):
+        self.write(ADD_SHELF, 0, shelf.id, shelf.x, shelf.y)
+
+    def obstacle_added(self, x, y):
+        self.write(ADD_OBSTACLE, 0, 0, x, y)
+
+    def instruction(self, event, instruction):
+        code = INSTRUCTION_CODES.get(instruction.instruction, UNKNOWN)
+        x, y = instruction.target
+        self.write(event, code, instruction.robot.id, x, y, instruction.start_time, instruction.duration)
+
+    def instructed(self, instruction):
+        self.instruction(INSTRUCT, instruction)
+
+    def finished(self, robot):
+        self.write(DONE, 0, robot.id)
+
+    def state_changed(self, robot):
+        self.write(STATE, STATE_CODES[robot.state], robot.id)
+
+    def cancelled(self, robot, count):
+        self.write(CANCEL, 0, robot.id, count)
+
+    def waited(self, robot):
+        self.write(WAIT, 0, robot.id)
+
+    def shifted(self, robot, delay):
+        self.write(SHIFT, 0, robot.id, 0, 0, delay)
+
+    def tick(self):
+        """
+        Called by the environment after every step; writes a keyframe when
+        one is due.
+        """
+        if self.environment.time - self.last_keyframe >= self.keyframe_interval:
+            self.keyframe()
+
+    def keyframe(self):
+        environment = self.environment
+        self.last_keyframe = environment.time
+        self.write(KEYFRAME, 0, len(environment.robots), len(environment.shelves))
+        for robot in environment.robots:
+            shelf_id = robot.shelf_assigned.id if robot.shelf_custody else 0
+            self.write(KEY_ROBOT, STATE_CODES[robot.state], robot.id, robot.x, robot.y, shelf_id,
+                       float(robot.shelf_delivered))
+        for shelf in environment.shelves:
+            self.write(KEY_SHELF, 0, shelf.id, shelf.x, shelf.y)
+        for robot in environment.robots:
+            for instruction in robot.instructions:
+                self.instruction(KEY_INSTRUCT, instruction)
+
+
+class Replay:
+    """
+    Reads a Recorder log through a memory map. environment_at(t) rebuilds a
+    headless Environment as it was at simulated time t from the last
+    keyframe before t plus the records after it; play() then drives that
+    environment forward by feeding it the recorded inputs at their times.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a recorder log")
+        self.records = np.memmap(path, dtype=RECORD, mode="r", offset=len(MAGIC))
+        if not len(self.records) or self.records["event"][0] != START:
+            raise ValueError(f"{path} has no START record")
+        self.times = self.records["time"]
+        self.keyframes = np.flatnonzero(self.records["event"] == KEYFRAME)
+        self.cursor = 0  # next record for play()
+
+    @property
+    def duration(self):
+        return float(self.times[-1])
+
+    def instruction(self, environment, record):
+        robot = environment.get_robot(int(record["id"]))
+        code = int(record["code"])
+        name = INSTRUCTIONS[code] if code < len(INSTRUCTIONS) else "unknown"
+        return Instruction(robot, (int(record["x"]), int(record["y"])), float(record["a"]), name,
+                           float(record["b"]))
+
+    def apply(self, environment, record):
+        """
+        Applies one record to environment's state without simulating.
+        """
+        event = record["event"]
+        if event == ADD_ROBOT:
+            environment.add_robot(int(record["x"]), int(record["y"]))
+        elif event == ADD_SHELF:
+            environment.add_shelf(int(record["x"]), int(record["y"]))
+        elif event == ADD_OBSTACLE:
+            environment.add_obstacle(int(record["x"]), int(record["y"]))
+        elif event == INSTRUCT:
+            instruction = self.instruction(environment, record)
+            instruction.robot.instructions.append(instruction)
+        elif event == DONE:
+            robot = environment.get_robot(int(record["id"]))
+            instruction = robot.instructions.popleft()
+            if instruction.instruction == "move":
+                robot.move(instruction.target[0] - robot.x, instruction.target[1] - robot.y)
+            else:
+                environment.execute_instruction(robot, instruction, float(record["time"]))
+        elif event == STATE:
+            environment.get_robot(int(record["id"])).state = STATES[record["code"]]
+        elif event == CANCEL:
+            instructions = environment.get_robot(int(record["id"])).instructions
+            for _ in range(int(record["x"])):
+                instructions.pop()
+        elif event == SHIFT:
+            for instruction in environment.get_robot(int(record["id"])).instructions:
+                instruction.start_time += float(record["a"])
+
+    def recorded(self, event, robot_id, t):
+        """
+        The record of event for robot_id written at time t, or None.
+        """
+        start = int(np.searchsorted(self.times, t - TIME_TOLERANCE, side="left"))
+        end = int(np.searchsorted(self.times, t + TIME_TOLERANCE, side="right"))
+        records = self.records[start:end]
+        found = np.flatnonzero((records["event"] == event) & (records["id"] == robot_id))
+        return records[found[0]] if found.size else None
+
+    def restore(self, environment, start):
+        """
+        Loads the keyframe whose KEYFRAME record is at index start and
+        returns the index of the first record after it.
+        """
+        records = self.records
+        grid = environment.grid
+        index = start + 1
+        for robot in environment.robots:
+            robot.instructions.clear()
+        for shelf in environment.shelves:
+            grid.clear_flag((shelf.x, shelf.y), SHELF)
+        while index < len(records) and records["event"][index] in (KEY_ROBOT, KEY_SHELF, KEY_INSTRUCT):
+            record = records[index]
+            event = record["event"]
+            if event == KEY_SHELF:
+                shelf = environment.shelves[int(record["id"]) - 1]
+                shelf.x, shelf.y = int(record["x"]), int(record["y"])
+            elif event == KEY_ROBOT:
+                robot = environment.get_robot(int(record["id"]))
+                robot.x, robot.y = int(record["x"]), int(record["y"])
+                robot.display_x, robot.display_y = float(robot.x), float(robot.y)
+                robot.state = STATES[record["code"]]
+                robot.shelf_custody = bool(record["a"])
+                if robot.shelf_custody:
+                    robot.shelf_assigned = environment.shelves[int(record["a"]) - 1]
+                robot.shelf_delivered = bool(record["b"])
+            else:
+                instruction = self.instruction(environment, record)
+                instruction.robot.instructions.append(instruction)
+            index += 1
+        for shelf in environment.shelves:
+            shelf.carrier = None
+        for robot in environment.robots:
+            if robot.shelf_custody:
+                robot.shelf_assigned.carrier = robot
+        environment.shelf_cells = {}
+        for shelf in environment.shelves:
+            if shelf.carrier is None:
+                grid.set_flag((shelf.x, shelf.y), SHELF)
+                environment.shelf_cells[(shelf.x, shelf.y)] = shelf
+        return index
+
+    def environment_at(self, t):
+        """
+        Returns a headless Environment in the recorded state at time t, with
+        every instruction still queued at t, ready to be stepped or viewed.
+        """
+        records = self.records
+        start = records[0]
+        environment = Environment(int(start["x"]), int(start["y"]), float(start["a"]), float(start["b"]))
+        end = int(np.searchsorted(self.times, t, side="right"))
+
+        # Robots, shelves and obstacles are never removed, so all additions up to t are replayed first
+        events = records["event"][:end]
+        for index in np.flatnonzero((events == ADD_ROBOT) | (events == ADD_SHELF) | (events == ADD_OBSTACLE)):
+            self.apply(environment, records[index])
+        keyframe = int(np.searchsorted(self.keyframes, end, side="left")) - 1
+        index = 1
+        if keyframe >= 0:
+            index = self.restore(environment, int(self.keyframes[keyframe]))
+        for index in range(index, end):
+            if records["event"][index] not in (ADD_ROBOT, ADD_SHELF, ADD_OBSTACLE):
+                self.apply(environment, records[index])
+
+        environment.time = float(t)
+        if np.any(records["event"] == WAIT):
+            RecordedWaits(self).attach(environment)
+        for robot in environment.robots:
+            environment.spatial.move(robot.id, robot.x, robot.y)
+            environment.fleet_planner.hold(robot.id, (robot.x, robot.y), environment.current_step())
+            if robot.instructions:
+                environment.scheduler.schedule(robot, robot.instructions[0].start_time)
+        self.cursor = end
+        return environment
+
+    def play(self, environment, until):
+        """
+        Steps environment to time until, issuing the recorded inputs
+        (additions, instructions and cancellations) at the times they were
+        recorded. Steps also end where a conflict monitor held a move back,
+        so RecordedWaits sees the moves due at the same times. The engine
+        reproduces everything else.
+        """
+        records = self.records
+        while self.cursor < len(records) and self.times[self.cursor] <= until:
+            record = records[self.cursor]
+            self.cursor += 1
+            if record["event"] not in INPUTS and record["event"] not in WAITS:
+                continue
+            if record["time"] > environment.time:
+                environment.step(float(record["time"]) - environment.time)
+            if record["event"] in WAITS:
+                continue
+            if record["event"] == INSTRUCT:
+                instruction = self.instruction(environment, record)
+                environment.instruct_robot(instruction.robot.id, instruction.target, instruction.start_time,
+                                           instruction.instruction, instruction.duration)
+            else:
+                self.apply(environment, record)
+        if until > environment.time:
+            environment.step(until - environment.time)
+        return environment.time
+
+
+class RecordedWaits:
+    """
+    Stands in for the conflicts.ConflictMonitor of a recorded run while it
+    is replayed: holds back the moves the monitor held back, at the times it
+    did, and delays a robot's queue by the recorded amount when its move
+    finally starts. The deadlocks it broke are in the log as instructions.
+    """
+    def __init__(self, replay):
+        self.replay = replay
+        self.environment = None
+
+    def attach(self, environment):
+        self.environment = environment
+        environment.conflicts = self
+        return self
+
+    def may_enter(self, robot, instruction, current_time):
+        if self.replay.recorded(WAIT, robot.id, current_time) is not None:
+            return False
+        record = self.replay.recorded(SHIFT, robot.id, current_time)
+        if record is not None:
+            for queued in robot.instructions:
+                queued.start_time += float(record["a"])
+        return True
+
+    def rebuild(self):
+        pass
+
+    def added(self, robot):
+        pass
+
+    def rescheduled(self, robot):
+        pass
+
+    def arrived(self, robot):
+        pass
+
+    def tick(self):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded warehouse log")
+    parser.add_argument("log", help="log written by recorder.Recorder")
+    parser.add_argument("--at", type=float, default=0.0, help="simulated time to seek to")
+    parser.add_argument("--view", action="store_true", help="play from there in the pygame viewer")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per real second")
+    args = parser.parse_args(argv)
+
+    replay = Replay(args.log)
+    environment = replay.environment_at(args.at)
+    if not args.view:
+        print(f"t={environment.time:.2f} of {replay.duration:.2f}")
+        for robot in environment.robots:
+            carried = robot.shelf_assigned.id if robot.shelf_custody else "-"
+            print(f"robot {robot.id}: ({robot.x}, {robot.y}) {robot.state} shelf {carried} "
+                  f"queued {len(robot.instructions)}")
+        return
+
+    from .viewer import Viewer
+    viewer = Viewer(environment)
+    while viewer.running:
+        dt = viewer.clock.tick(viewer.fps) / 1000 * args.speed
+        viewer.handle_events()
+        replay.play(environment, environment.time + dt)
+        viewer.draw()
+    viewer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+import numpy as np
+from .a_star.grid import OBSTACLE, SHELF
+from . import maps
+
+# Actions: wait, or move one cell east, west, south or north
+MOVES = np.array([(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int64)
+
+# Channels of an observation patch
+CHANNELS = ("obstacles", "shelves", "robots")
+
+# Default radius of the square patch observed around each robot
+PATCH_RADIUS = 3
+
+# Default steps after which an episode is truncated
+MAX_STEPS = 500
+
+# Rewards per robot and step
+STEP_REWARD = -0.01
+PICKUP_REWARD = 0.1
+DELIVERY_REWARD = 1.0
+BLOCKED_REWARD = -0.05  # the robot asked to move but had to wait
+
+# Drop-off samples drawn per warehouse before a robot is left without a task
+MAX_SAMPLES = 100
+
+
+def action_masks(flags, positions, goals, carrying):
+    """
+    (B, N, 5) bool masks of the actions each robot may take: waiting, or a
+    move that stays on the map, avoids obstacles and only enters a shelf
+    cell to pick up the shelf it is sent for. flags is (B, H, W), positions
+    and goals are (B, N, 2) x, y cells and carrying is (B, N).
+    """
+    batch, height, width = flags.shape
+    targets = positions[:, :, None, :] + MOVES
+    x, y = targets[..., 0], targets[..., 1]
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    cells = flags[np.arange(batch)[:, None, None], np.clip(y, 0, height - 1), np.clip(x, 0, width - 1)]
+    at_goal = (targets == goals[:, :, None, :]).all(-1)
+    blocked = (cells & OBSTACLE != 0) | ((cells & SHELF != 0) & (carrying[..., None] | ~at_goal))
+    masks = inside & ~blocked
+    masks[..., 0] = True
+    return masks
+
+
+def observe(flags, positions, goals, carrying, radius=PATCH_RADIUS):
+    """
+    Observations of N robots in each of B warehouses as a dict of arrays:
+    patch (B, N, 3, P, P) uint8, the CHANNELS in the P = 2 * radius + 1
+    square around the robot (cells off the map count as obstacles); goal
+    (B, N, 2) float32, the offset to the robot's goal divided by the map
+    size; carrying (B, N, 1) int8; action_mask (B, N, 5) int8.
+    """
+    batch, height, width = flags.shape
+    robots = positions.shape[1]
+    size = 2 * radius + 1
+    padded = np.full((batch, height + 2 * radius, width + 2 * radius), OBSTACLE, dtype=np.uint8)
+    padded[:, radius:radius + height, radius:radius + width] = flags
+    occupied = np.zeros(padded.shape, dtype=np.uint8)
+    index = np.arange(batch)[:, None]
+    occupied[index, positions[..., 1] + radius, positions[..., 0] + radius] = 1
+
+    offsets = np.arange(size)
+    rows = (positions[..., 1, None] + offsets)[..., :, None]
+    columns = (positions[..., 0, None] + offsets)[..., None, :]
+    index = np.arange(batch)[:, None, None, None]
+    window = padded[index, rows, columns]
+    patch = np.empty((batch, robots, len(CHANNELS), size, size), dtype=np.uint8)
+    patch[:, :, 0] = window & OBSTACLE != 0
+    patch[:, :, 1] = window & SHELF != 0
+    patch[:, :, 2] = occupied[index, rows, columns]
+    return {
+        "patch": patch,
+        "goal": ((goals - positions) / np.array([width, height])).astype(np.float32),
+        "carrying": carrying[..., None].astype(np.int8),
+        "action_mask": action_masks(flags, positions, goals, carrying).astype(np.int8),
+    }
+
+
+def resolve_moves(positions, targets, width, height):
+    """
+    Final cells of robots that want to go from positions to targets (both
+    (B, N, 2)) in one step. Robots that would swap places both wait, and a
+    cell wanted by several robots goes to one that is already there or else
+    to the lowest robot index; the others wait, which can in turn block the
+    robots behind them. Returns (final cells, bool (B, N) of robots that
+    wanted to move but wait).
+    """
+    batch, robots = positions.shape[:2]
+    base = (np.arange(batch) * (width * height))[:, None]
+    cells = (positions[..., 1] * width + positions[..., 0] + base).ravel()
+    wanted = (targets[..., 1] * width + targets[..., 0] + base).ravel()
+    moving = wanted != cells
+    span = batch * width * height
+    swapping = moving & np.isin(cells * span + wanted, wanted[moving] * span + cells[moving])
+    stopped = swapping.copy()
+    moving &= ~swapping
+
+    order_index = np.arange(cells.size)
+    for _ in range(robots + 1):
+        final = np.where(moving, wanted, cells)
+        # Robots already on a cell sort before those moving in, then by index
+        order = np.lexsort((order_index, moving, final))
+        ordered = final[order]
+        later = np.zeros(ordered.size, dtype=bool)
+        later[1:] = ordered[1:] == ordered[:-1]
+        losers = order[later]
+        losers = losers[moving[losers]]
+        if not losers.size:
+            break
+        moving[losers] = False
+        stopped[losers] = True
+
+    final = np.where(moving, wanted, cells).reshape(batch, robots) - base
+    return np.stack((final % width, final // width), axis=-1), stopped.reshape(batch, robots)
+
+
+class Tasks:
+    """
+    Delivery tasks of N robots in each of B warehouses: a robot is sent to a
+    shelf nobody else is after, picks it up by arriving on it, carries it to
+    a free drop-off cell and drops it there by arriving, which frees the
+    shelf for new tasks. Robots left without a shelf stay where they are.
+    """
+    def __init__(self, shelf_positions, batch, robots):
+        self.shelf_positions = np.repeat(shelf_positions[None], batch, axis=0).astype(np.int64)
+        self.taken = np.zeros(self.shelf_positions.shape[:2], dtype=bool)
+        self.shelf = np.full((batch, robots), -1, dtype=np.int64)
+        self.carrying = np.zeros((batch, robots), dtype=bool)
+        self.drop_offs = np.zeros((batch, robots, 2), dtype=np.int64)
+
+    def goals(self, positions):
+        batch = np.arange(self.shelf.shape[0])[:, None]
+        goals = np.where(self.carrying[..., None], self.drop_offs,
+                         self.shelf_positions[batch, np.maximum(self.shelf, 0)])
+        return np.where((self.shelf >= 0)[..., None], goals, positions)
+
+    def assign(self, need, flags, rng):
+        """
+        New tasks for the robots in need ((B, N) bool).
+        """
+        batch, height, width = flags.shape
+        flat = flags.reshape(batch, -1)
+        rows = np.arange(batch)
+        if not self.taken.shape[1]:
+            self.shelf[need] = -1
+            return
+        for robot in np.flatnonzero(need.any(0)):
+            envs = need[:, robot].copy()
+            scores = rng.random(self.taken.shape)
+            scores[self.taken] = np.inf
+            shelf = scores.argmin(1)
+            envs &= np.isfinite(scores[rows, shelf])
+            self.shelf[:, robot] = np.where(envs, shelf, np.where(need[:, robot], -1, self.shelf[:, robot]))
+            self.taken[rows[envs], shelf[envs]] = True
+
+            pending = envs.copy()
+            others = self.drop_offs[..., 1] * width + self.drop_offs[..., 0]
+            active = (self.shelf >= 0) & (np.arange(self.shelf.shape[1]) != robot)
+            for _ in range(MAX_SAMPLES):
+                if not pending.any():
+                    break
+                cells = rng.integers(width * height, size=batch)
+                free = (flat[rows, cells] == 0) & ~((others == cells[:, None]) & active).any(1)
+                chosen = pending & free
+                self.drop_offs[chosen, robot] = np.stack((cells[chosen] % width, cells[chosen] // width), axis=-1)
+                pending &= ~free
+            if pending.any():
+                self.taken[rows[pending], self.shelf[pending, robot]] = False
+                self.shelf[pending, robot] = -1
+
+
+class VectorWarehouse:
+    """
+    B independent warehouses sharing one layout (see maps.read_map), stepped
+    together: every step is a handful of NumPy calls over (B, N) arrays no
+    matter how many warehouses there are. Robots take one of the MOVES per
+    step; conflicts are resolved by resolve_moves and tasks follow Tasks.
+    Episodes are truncated after max_steps and reset automatically, so the
+    observations returned for a truncated warehouse belong to its new
+    episode.
+    """
+    def __init__(self, layout, batch=64, radius=PATCH_RADIUS, max_steps=MAX_STEPS, seed=None):
+        layout = np.asarray(layout)
+        self.height, self.width = layout.shape
+        self.layout = (layout & (OBSTACLE | SHELF)).astype(np.uint8)
+        ys, xs = np.nonzero(layout & maps.ROBOT)
+        self.starts = np.column_stack((xs, ys)).astype(np.int64)
+        ys, xs = np.nonzero(layout & SHELF)
+        self.shelf_starts = np.column_stack((xs, ys)).astype(np.int64)
+        self.batch = batch
+        self.robots = len(self.starts)
+        self.radius = radius
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.flags = np.repeat(self.layout[None], self.batch, axis=0)
+        self.positions = np.repeat(self.starts[None], self.batch, axis=0)
+        self.tasks = Tasks(self.shelf_starts, self.batch, self.robots)
+        self.steps = np.zeros(self.batch, dtype=np.int64)
+        self.deliveries = np.zeros(self.batch, dtype=np.int64)
+        self.tasks.assign(np.ones((self.batch, self.robots), dtype=bool), self.flags, self.rng)
+        return self.observe()
+
+    def reset_envs(self, envs):
+        """
+        Starts a new episode in the warehouses selected by envs ((B,) bool).
+        """
+        tasks = self.tasks
+        self.flags[envs] = self.layout
+        self.positions[envs] = self.starts
+        tasks.shelf_positions[envs] = self.shelf_starts
+        tasks.taken[envs] = False
+        tasks.shelf[envs] = -1
+        tasks.carrying[envs] = False
+        self.steps[envs] = 0
+        self.deliveries[envs] = 0
+        need = np.zeros((self.batch, self.robots), dtype=bool)
+        need[envs] = True
+        tasks.assign(need, self.flags, self.rng)
+
+    def observe(self):
+        self.goals = self.tasks.goals(self.positions)
+        observation = observe(self.flags, self.positions, self.goals, self.tasks.carrying, self.radius)
+        self.masks = observation["action_mask"].astype(bool)
+        return observation
+
+    def step(self, actions):
+        """
+        Applies (B, N) actions; masked-out actions are waits. Returns
+        (observations, rewards (B, N), terminations (B,), truncations (B,),
+        info) with info["deliveries"] counting this step's deliveries.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        allowed = np.take_along_axis(self.masks, actions[..., None], axis=-1)[..., 0]
+        actions = np.where(allowed, actions, 0)
+        targets = self.positions + MOVES[actions]
+        self.positions, stopped = resolve_moves(self.positions, targets, self.width, self.height)
+        rewards = np.full((self.batch, self.robots), STEP_REWARD, dtype=np.float32)
+        rewards[stopped | ~allowed] += BLOCKED_REWARD
+
+        tasks = self.tasks
+        arrived = (self.positions == self.goals).all(-1) & (tasks.shelf >= 0)
+        picked = arrived & ~tasks.carrying
+        dropped = arrived & tasks.carrying
+        env, robot = np.nonzero(picked)
+        x, y = self.positions[env, robot, 0], self.positions[env, robot, 1]
+        self.flags[env, y, x] &= ~SHELF & 0xFF
+        tasks.carrying[env, robot] = True
+        rewards[picked] += PICKUP_REWARD
+
+        env, robot = np.nonzero(dropped)
+        x, y = self.positions[env, robot, 0], self.positions[env, robot, 1]
+        self.flags[env, y, x] |= SHELF
+        shelf = tasks.shelf[env, robot]
+        tasks.shelf_positions[env, shelf] = self.positions[env, robot]
+        tasks.taken[env, shelf] = False
+        tasks.carrying[env, robot] = False
+        rewards[dropped] += DELIVERY_REWARD
+        delivered = dropped.sum(1)
+        self.deliveries += delivered
+        tasks.assign(dropped, self.flags, self.rng)
+
+        self.steps += 1
+        truncations = self.steps >= self.max_steps
+        if truncations.any():
+            self.reset_envs(truncations)
+        terminations = np.zeros(self.batch, dtype=bool)
+        return self.observe(), rewards, terminations, truncations, {"deliveries": delivered}
+
+
+class WarehouseEnv:
+    """
+    PettingZoo-style parallel environment around engine.Environment: one
+    agent per robot, reset() and step() over dicts keyed by agent name.
+    Each step every robot takes one of the MOVES, which is queued as a move
+    instruction lasting one step duration, and the simulation is run until
+    the step is over. Observations, action masks, conflicts, tasks and
+    rewards are those of VectorWarehouse, for a single warehouse. Spaces
+    need gymnasium, which is only imported when they are asked for.
+    """
+    metadata = {"name": "warehouse_v0"}
+
+    def __init__(self, layout, radius=PATCH_RADIUS, max_steps=MAX_STEPS, seed=None, **options):
+        self.environment = maps.build_environment(layout, **options)
+        self.environment.animate = False
+        self.radius = radius
+        self.max_steps = max_steps
+        self.possible_agents = [f"robot_{robot.id}" for robot in self.environment.robots]
+        self.agents = []
+        self.rng = np.random.default_rng(seed)
+        self.spaces = None
+
+    def observation_space(self, agent):
+        return self.make_spaces()[0]
+
+    def action_space(self, agent):
+        return self.make_spaces()[1]
+
+    def make_spaces(self):
+        if self.spaces is None:
+            from gymnasium import spaces
+            size = 2 * self.radius + 1
+            observation = spaces.Dict({
+                "patch": spaces.Box(0, 1, (len(CHANNELS), size, size), dtype=np.uint8),
+                "goal": spaces.Box(-1.0, 1.0, (2,), dtype=np.float32),
+                "carrying": spaces.Box(0, 1, (1,), dtype=np.int8),
+                "action_mask": spaces.Box(0, 1, (len(MOVES),), dtype=np.int8),
+            })
+            self.spaces = (observation, spaces.Discrete(len(MOVES)))
+        return self.spaces
+
+    def positions(self):
+        return np.array([[(robot.x, robot.y) for robot in self.environment.robots]], dtype=np.int64).reshape(1, -1, 2)
+
+    def observe(self):
+        positions = self.positions()
+        self.goals = self.tasks.goals(positions)
+        observation = observe(self.environment.grid.array[None], positions, self.goals, self.tasks.carrying,
+                              self.radius)
+        self.masks = observation["action_mask"][0].astype(bool)
+        return {agent: {key: value[0, i] for key, value in observation.items()}
+                for i, agent in enumerate(self.agents)}
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        environment = self.environment
+        environment.reset()
+        self.agents = list(self.possible_agents)
+        self.steps = 0
+        shelves = np.array([shelf.start_position for shelf in environment.shelves], dtype=np.int64).reshape(-1, 2)
+        self.tasks = Tasks(shelves, 1, len(self.agents))
+        self.tasks.assign(np.ones((1, len(self.agents)), dtype=bool), environment.grid.array[None], self.rng)
+        return self.observe(), {agent: {} for agent in self.agents}
+
+    def step(self, actions):
+        environment = self.environment
+        robots = environment.robots
+        tasks = self.tasks
+        actions = np.array([actions.get(agent, 0) for agent in self.agents], dtype=np.int64)
+        allowed = self.masks[np.arange(len(actions)), actions]
+        actions = np.where(allowed, actions, 0)
+        positions = self.positions()
+        final, stopped = resolve_moves(positions, positions + MOVES[actions][None], environment.width,
+                                       environment.height)
+        final, stopped = final[0], stopped[0]
+        rewards = np.full(len(robots), STEP_REWARD)
+        rewards[stopped | ~allowed] += BLOCKED_REWARD
+
+        start = environment.time
+        end = start + environment.step_duration
+        arrived = (final == self.goals[0]).all(-1) & (tasks.shelf[0] >= 0)
+        for i, robot in enumerate(robots):
+            target = (int(final[i, 0]), int(final[i, 1]))
+            if target != (robot.x, robot.y):
+                environment.instruct_robot(robot.id, target, start, "move", environment.step_duration)
+            if arrived[i]:
+                instruction = "drop_shelf" if tasks.carrying[0, i] else "pick_up_shelf"
+                environment.instruct_robot(robot.id, target, end, instruction)
+        collisions = environment.collisions
+        environment.step(environment.step_duration)
+
+        picked = arrived & ~tasks.carrying[0]
+        dropped = arrived & tasks.carrying[0]
+        tasks.carrying[0, picked] = True
+        rewards[picked] += PICKUP_REWARD
+        shelves = tasks.shelf[0, dropped]
+        tasks.shelf_positions[0, shelves] = final[dropped]
+        tasks.taken[0, shelves] = False
+        tasks.carrying[0, dropped] = False
+        rewards[dropped] += DELIVERY_REWARD
+        tasks.assign(dropped[None], environment.grid.array[None], self.rng)
+
+        self.steps += 1
+        truncated = self.steps >= self.max_steps
+        observations = self.observe()
+        info = {"collisions": environment.collisions - collisions}
+        agents = self.agents
+        if truncated:
+            self.agents = []
+        return (observations,
+                {agent: float(rewards[i]) for i, agent in enumerate(agents)},
+                {agent: False for agent in agents},
+                {agent: truncated for agent in agents},
+                {agent: dict(info) for agent in agents})
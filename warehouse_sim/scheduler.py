@@ -0,0 +1,50 @@
+import heapq
+import itertools
+
+
+class EventScheduler:
+    """
+    Global time-ordered queue of wake-ups. Each key (e.g. a robot) has at
+    most one live wake-up; scheduling an earlier one supersedes the pending
+    entry, which is skipped when it surfaces. pop() only ever touches keys
+    that are due, so keys with nothing scheduled cost nothing per tick.
+    """
+    def __init__(self):
+        self.heap = []
+        self.wake = {}  # key -> time of its live entry
+        self.counter = itertools.count()  # tie-breaker so keys are never compared
+
+    def __len__(self):
+        return len(self.wake)
+
+    def schedule(self, key, time):
+        current = self.wake.get(key)
+        if current is not None and current <= time:
+            return
+        self.wake[key] = time
+        heapq.heappush(self.heap, (time, next(self.counter), key))
+
+    def cancel(self, key):
+        self.wake.pop(key, None)
+
+    def next_time(self):
+        """
+        Time of the earliest live wake-up, or None if nothing is scheduled.
+        """
+        heap = self.heap
+        while heap and self.wake.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop(self, current_time):
+        """
+        Removes and returns the next key due at or before current_time, or
+        None when no more keys are due.
+        """
+        heap = self.heap
+        while heap and heap[0][0] <= current_time:
+            time, _, key = heapq.heappop(heap)
+            if self.wake.get(key) == time:
+                del self.wake[key]
+                return key
+        return None
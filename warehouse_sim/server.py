@@ -0,0 +1,605 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import struct
+import threading
+import time
+from collections import deque
+from .a_star.grid import OBSTACLE, SHELF
+from .constants import *
+
+# Every message is a 4-byte big-endian length followed by that many bytes of UTF-8 JSON
+HEADER = struct.Struct(">I")
+
+# Largest message accepted from a client, in bytes
+MAX_MESSAGE = 16 * 1024 * 1024
+
+# Default TCP port of the command server
+PORT = 8765
+
+# Default seconds per tick spent applying queued commands; at least one message is always applied
+COMMAND_BUDGET = 0.005
+
+# Messages a client may have queued but not yet applied before the server stops reading from it
+MAX_PENDING = 64
+
+# Simulated seconds between state deltas sent to subscribers
+PUBLISH_INTERVAL = 0.1
+
+# Bytes a subscriber may leave unread before deltas to it are dropped; it is sent
+# the full state once it has caught up
+MAX_BUFFERED = 1024 * 1024
+
+# Instructions a client may queue with the instruct op
+INSTRUCTIONS = ("move", "pick_up_shelf", "drop_shelf")
+
+
+def is_integer(value):
+    # JSON integers only; bool is an int subclass in Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def encode(message):
+    data = json.dumps(message, separators=(",", ":")).encode()
+    return HEADER.pack(len(data)) + data
+
+
+async def read_message(reader):
+    """
+    Reads one length-prefixed message; returns None at end of stream.
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ValueError(f"Message of {length} bytes exceeds {MAX_MESSAGE}")
+    return json.loads(await reader.readexactly(length))
+
+
+class Connection:
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.window = asyncio.Semaphore(MAX_PENDING)  # messages this client may still queue
+        self.subscribed = False
+        self.synced = False  # has every delta since its last full state
+        self.closed = False
+
+    def send(self, data):
+        if not self.closed:
+            self.writer.write(data)
+
+    def reply(self, data):
+        self.send(data)
+        self.window.release()
+
+    def send_state(self, delta, full):
+        # Runs on the event loop; a subscriber that cannot keep up skips deltas
+        if self.closed or not self.subscribed:
+            return
+        if self.synced:
+            if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                self.synced = False
+                return
+            self.send(delta)
+        elif self.writer.transport.get_write_buffer_size() <= MAX_BUFFERED:
+            self.send(full())
+            self.synced = True
+
+
+class CommandServer:
+    """
+    Asyncio command API for an Environment, so an external controller such
+    as a warehouse management system can drive the simulation. Clients
+    connect over TCP (or a Unix socket) and exchange length-prefixed JSON
+    messages. A request {"id": ..., "commands": [...]} carries a batch of
+    commands, each a dict with an "op" (see OPS), and gets one reply
+    {"type": "reply", "id": ..., "time": ..., "results": [...]} with a
+    result or {"error": ...} per command.
+
+    Commands are only queued by the network side. While attached, the
+    environment applies them at the start of every step(), for at most
+    budget seconds per tick, so a flood of commands delays them instead of
+    stalling the simulation. A client with MAX_PENDING messages
+    outstanding is not read from until they are applied. Subscribers get
+    {"type": "state", "time": ..., "full": ..., "robots": [[id, x, y,
+    state, shelf id or 0], ...]} every publish_interval simulated seconds
+    with the robots that changed, or all of them when full.
+
+    serve() runs the server on the current event loop, e.g. next to run()
+    for a headless real-time simulation; start() runs it in a background
+    thread instead, for drivers with a loop of their own like the viewer.
+    """
+    OPS = ("instruct", "path", "plan", "drive_to", "deliver", "add_robot", "add_shelf", "add_obstacle",
+           "query", "subscribe", "unsubscribe")
+
+    def __init__(self, environment=None, budget=COMMAND_BUDGET, publish_interval=PUBLISH_INTERVAL):
+        self.budget = budget
+        self.publish_interval = publish_interval
+        self.queue = deque()  # (connection, message) in arrival order; deque operations are thread-safe
+        self.connections = set()
+        self.subscribers = []
+        self.published = {}  # robot id -> row last sent to subscribers
+        self.last_publish = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.environment = None
+        self.applied = 0  # commands applied so far
+        if environment is not None:
+            self.attach(environment)
+
+    def attach(self, environment):
+        self.environment = environment
+        environment.server = self
+
+    def detach(self):
+        if self.environment is not None:
+            self.environment.server = None
+            self.environment = None
+
+    async def serve(self, host="127.0.0.1", port=PORT, path=None):
+        """
+        Starts listening on host:port, or on the Unix socket path if given,
+        and returns the asyncio server.
+        """
+        self.loop = asyncio.get_running_loop()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def start(self, host="127.0.0.1", port=PORT, path=None):
+        """
+        Runs serve() on an event loop in a daemon thread and returns once the
+        server is listening.
+        """
+        ready = threading.Event()
+        failure = []
+
+        async def main():
+            try:
+                await self.serve(host, port, path)
+            except OSError as error:
+                failure.append(error)
+                return
+            finally:
+                ready.set()
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass  # stopped by stop()
+
+        self.thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+        self.thread.start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+        return self
+
+    def stop(self):
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def handle(self, reader, writer):
+        connection = Connection(self, writer)
+        self.connections.add(connection)
+        try:
+            while True:
+                await connection.window.acquire()
+                try:
+                    message = await read_message(reader)
+                except (ValueError, asyncio.IncompleteReadError, ConnectionError) as error:
+                    connection.send(encode({"type": "error", "error": str(error)}))
+                    break
+                if message is None:
+                    break
+                self.queue.append((connection, message))
+        finally:
+            connection.closed = True
+            self.connections.discard(connection)
+            writer.close()
+
+    def call(self, callback, *args):
+        # Hands work from the simulation over to the event loop
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def apply(self):
+        """
+        Called by the environment at the start of every step; applies queued
+        messages until the queue is empty or the budget is spent.
+        """
+        queue = self.queue
+        if not queue:
+            return
+        deadline = time.perf_counter() + self.budget
+        while queue:
+            connection, message = queue.popleft()
+            try:
+                reply = self.respond(connection, message)
+            except Exception as error:
+                # Whatever a client sends, it gets a reply, which also frees its window slot
+                reply = encode({"type": "reply", "id": None, "time": self.environment.time,
+                                "results": [{"error": f"{type(error).__name__}: {error}"}]})
+            self.call(connection.reply, reply)
+            if time.perf_counter() > deadline:
+                break
+
+    def respond(self, connection, message):
+        # Executes the commands of one message and returns its encoded reply
+        commands = message.get("commands") if isinstance(message, dict) else None
+        if isinstance(commands, list):
+            results = [self.execute(connection, command) for command in commands]
+            self.applied += len(results)
+        else:
+            results = [{"error": "Expected a message {\"id\": ..., \"commands\": [...]}"}]
+        request_id = message.get("id") if isinstance(message, dict) else None
+        return encode({"type": "reply", "id": request_id, "time": self.environment.time, "results": results})
+
+    def execute(self, connection, command):
+        """
+        Applies one command and returns its result. A malformed command is
+        answered with {"error": ...} and never reaches the simulation.
+        """
+        op = command.get("op") if isinstance(command, dict) else None
+        if op not in self.OPS:
+            return {"error": f"Unknown op {op!r}"}
+        try:
+            return getattr(self, "op_" + op)(connection, command)
+        except Exception as error:
+            return {"error": f"{type(error).__name__}: {error}"}
+
+    # Validation of command arguments; each raises ValueError for a bad value
+
+    def robot_id(self, command, key="robot"):
+        robot_id = command[key]
+        if not is_integer(robot_id) or self.environment.get_robot(robot_id) is None:
+            raise ValueError(f"Unknown robot {robot_id!r}")
+        return robot_id
+
+    def shelf_id(self, shelf_id):
+        if not is_integer(shelf_id) or not 1 <= shelf_id <= len(self.environment.shelves):
+            raise ValueError(f"Unknown shelf {shelf_id!r}")
+        return shelf_id
+
+    def cell(self, value, passable=True):
+        """
+        value as an (x, y) tuple of two ints inside the grid, which must not
+        be an obstacle if passable.
+        """
+        if not isinstance(value, (list, tuple)) or len(value) != 2 or not all(map(is_integer, value)):
+            raise ValueError(f"Expected a cell [x, y], got {value!r}")
+        cell = tuple(value)
+        grid = self.environment.grid
+        if not grid.in_bounds(cell):
+            raise ValueError(f"Cell {cell} is outside the {grid.width}x{grid.height} grid")
+        if passable and grid.flags(cell) & OBSTACLE:
+            raise ValueError(f"Cell {cell} is an obstacle")
+        return cell
+
+    def empty_cell(self, value):
+        # A passable cell without a robot or shelf, for adding something new
+        cell = self.cell(value)
+        if self.environment.grid.flags(cell) & SHELF:
+            raise ValueError(f"Cell {cell} holds a shelf")
+        if any((robot.x, robot.y) == cell for robot in self.environment.robots):
+            raise ValueError(f"Cell {cell} holds a robot")
+        return cell
+
+    def number(self, command, key, default, positive=False):
+        value = command.get(key, default)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+            raise ValueError(f"Expected a number for {key}, got {value!r}")
+        if positive and value <= 0:
+            raise ValueError(f"{key} must be positive, got {value!r}")
+        return value
+
+    def op_instruct(self, connection, command):
+        environment = self.environment
+        robot_id = self.robot_id(command)
+        instruction = command.get("instruction", "move")
+        if instruction not in INSTRUCTIONS:
+            raise ValueError(f"Unknown instruction {instruction!r}")
+        target = self.cell(command["target"])
+        start_time = self.number(command, "start_time", environment.time)
+        duration = self.number(command, "duration", 1.0, positive=True)
+        queued = environment.instruct_robot(robot_id, target, start_time, instruction, duration)
+        return {"queued": len(queued.robot.instructions)}
+
+    def op_path(self, connection, command):
+        environment = self.environment
+        robot_id = self.robot_id(command)
+        if not isinstance(command["path"], list):
+            raise ValueError("Expected a path [[x, y], ...]")
+        path = [self.cell(cell) for cell in command["path"]]
+        position, _ = environment.queued_state(environment.get_robot(robot_id))
+        for cell in path:
+            if abs(cell[0] - position[0]) + abs(cell[1] - position[1]) > 1:
+                raise ValueError(f"Path jumps from {position} to {cell}")
+            position = cell
+        start_time = self.number(command, "start_time", environment.time)
+        step_duration = self.number(command, "step_duration", environment.step_duration, positive=True)
+        return {"end_time": environment.instruct_path(robot_id, path, start_time, step_duration)}
+
+    def op_plan(self, connection, command):
+        # {"goals": {robot id: [x, y]}}; reserved against the other robots' plans
+        if not isinstance(command["goals"], dict):
+            raise ValueError("Expected goals {robot id: [x, y], ...}")
+        goals = {}
+        for robot_id, goal in command["goals"].items():
+            robot_id = int(robot_id) if isinstance(robot_id, str) and robot_id.isdigit() else robot_id
+            goals[self.robot_id({"robot": robot_id})] = self.cell(goal)
+        return {"planned": sorted(self.environment.plan_robots(goals))}
+
+    def op_drive_to(self, connection, command):
+        return {"path": self.environment.drive_to(self.robot_id(command), self.cell(command["goal"]))}
+
+    def op_deliver(self, connection, command):
+        # {"deliveries": [[robot id, shelf id, [x, y]], ...]}
+        environment = self.environment
+        deliveries = []
+        for delivery in command["deliveries"]:
+            if not isinstance(delivery, list) or len(delivery) != 3:
+                raise ValueError(f"Expected a delivery [robot id, shelf id, [x, y]], got {delivery!r}")
+            robot_id, shelf_id, end = delivery
+            deliveries.append((environment.get_robot(self.robot_id({"robot": robot_id})),
+                               environment.shelves[self.shelf_id(shelf_id) - 1], self.cell(end)))
+        return {"planned": sorted(environment.schedule_deliveries(deliveries))}
+
+    def op_add_robot(self, connection, command):
+        return {"robot": self.environment.add_robot(*self.empty_cell(command["cell"])).id}
+
+    def op_add_shelf(self, connection, command):
+        return {"shelf": self.environment.add_shelf(*self.empty_cell(command["cell"])).id}
+
+    def op_add_obstacle(self, connection, command):
+        self.environment.add_obstacle(*self.empty_cell(command["cell"]))
+        return {}
+
+    def op_query(self, connection, command):
+        # Every robot, or just those listed in "robots"
+        environment = self.environment
+        ids = command.get("robots")
+        if ids is not None and not isinstance(ids, list):
+            raise ValueError("Expected robots [id, ...]")
+        robots = environment.robots if ids is None else [environment.get_robot(self.robot_id({"robot": robot_id}))
+                                                         for robot_id in ids]
+        return {"time": environment.time, "idle": environment.is_idle(),
+                "robots": [self.robot_row(robot) + [len(robot.instructions)] for robot in robots]}
+
+    def op_subscribe(self, connection, command):
+        if not connection.subscribed:
+            connection.subscribed = True
+            connection.synced = False
+            self.subscribers.append(connection)
+        return {}
+
+    def op_unsubscribe(self, connection, command):
+        if connection.subscribed:
+            connection.subscribed = False
+            self.subscribers.remove(connection)
+        return {}
+
+    def robot_row(self, robot):
+        shelf = robot.shelf_assigned.id if robot.shelf_custody else 0
+        return [int(robot.id), int(robot.x), int(robot.y), robot.state, int(shelf)]
+
+    def publish(self):
+        """
+        Called by the environment after every step; sends the robots that
+        changed since the last delta to the subscribers when one is due.
+        """
+        subscribers = self.subscribers
+        if subscribers and any(connection.closed for connection in subscribers):
+            subscribers[:] = [connection for connection in subscribers if not connection.closed]
+        if not subscribers:
+            self.last_publish = None
+            return
+        now = self.environment.time
+        if self.last_publish is not None and now - self.last_publish < self.publish_interval:
+            return
+        self.last_publish = now
+        published = self.published
+        rows = [self.robot_row(robot) for robot in self.environment.robots]
+        changed = [row for row in rows if published.get(row[0]) != row]
+        for row in changed:
+            published[row[0]] = row
+        delta = encode({"type": "state", "time": now, "full": False, "robots": changed})
+        full = None
+
+        def full_state():
+            # Built at most once per delta, on the event loop, and only if a subscriber needs it
+            nonlocal full
+            if full is None:
+                full = encode({"type": "state", "time": now, "full": True, "robots": rows})
+            return full
+
+        for connection in subscribers:
+            self.call(connection.send_state, delta, full_state)
+
+
+async def run(environment, time_scale=1.0, fps=50):
+    """
+    Steps environment in real time (scaled by time_scale) on the running
+    event loop, yielding to it between ticks, until environment.running is
+    cleared.
+    """
+    period = 1 / fps
+    last = time.perf_counter()
+    while environment.running:
+        await asyncio.sleep(period)
+        now = time.perf_counter()
+        environment.step((now - last) * time_scale)
+        last = now
+
+
+class CommandClient:
+    """
+    Minimal asyncio client of a CommandServer, standing in for a warehouse
+    management system in tests. request() sends a batch of commands and
+    waits for its reply; state messages of a subscription are collected in
+    the states queue.
+    """
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.next_id = 0
+        self.waiting = {}  # request id -> future of its reply
+        self.states = asyncio.Queue()
+        self.listener = None
+
+    async def connect(self, host="127.0.0.1", port=PORT, path=None):
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.listener = asyncio.create_task(self.listen())
+        return self
+
+    async def listen(self):
+        while True:
+            message = await read_message(self.reader)
+            if message is None:
+                break
+            if message.get("type") == "reply":
+                future = self.waiting.pop(message["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+            elif message.get("type") == "state":
+                self.states.put_nowait(message)
+            else:
+                for future in self.waiting.values():
+                    future.set_exception(ConnectionError(message.get("error")))
+                break
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection closed"))
+        self.waiting.clear()
+
+    def send(self, commands):
+        """
+        Sends a batch of commands without waiting; returns a future of the reply.
+        """
+        self.next_id += 1
+        future = self.waiting[self.next_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(encode({"id": self.next_id, "commands": commands}))
+        return future
+
+    async def request(self, commands):
+        future = self.send(commands)
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        if self.listener is not None:
+            await self.listener
+
+
+async def load_test(host, port, path, seconds, batch, concurrency):
+    """
+    Streams random one-cell moves to every robot of the server's
+    environment for seconds of wall time, with up to concurrency batches in
+    flight, and reports the command rate and reply latency.
+    """
+    client = await CommandClient().connect(host, port, path)
+    (status,) = (await client.request([{"op": "query"}]))["results"]
+    robots = {row[0]: (row[1], row[2]) for row in status["robots"]}
+    await client.request([{"op": "subscribe"}])
+    latencies = []
+    in_flight = set()
+    ended = time.perf_counter() + seconds
+    while time.perf_counter() < ended:
+        commands = []
+        for robot_id in random.sample(sorted(robots), min(batch, len(robots))):
+            x, y = robots[robot_id]
+            dx, dy = random.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+            commands.append({"op": "instruct", "robot": robot_id, "target": [x + dx, y + dy]})
+        sent = time.perf_counter()
+        future = client.send(commands)
+        future.add_done_callback(lambda _, sent=sent: latencies.append(time.perf_counter() - sent))
+        in_flight.add(future)
+        future.add_done_callback(in_flight.discard)
+        await client.writer.drain()
+        if len(in_flight) >= concurrency:
+            await asyncio.wait(set(in_flight), return_when=asyncio.FIRST_COMPLETED)
+    if in_flight:
+        await asyncio.wait(set(in_flight))
+    states = client.states.qsize()
+    await client.close()
+    latencies.sort()
+    print(f"{len(latencies) * batch / seconds:.0f} commands/s in {len(latencies)} batches, "
+          f"latency median {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms, {states} state messages")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a warehouse simulation to external controllers")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run a headless simulation behind a command server")
+    serve.add_argument("--map", help="map file to load (see warehouse_sim.maps); an empty grid otherwise")
+    serve.add_argument("--size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="size of the empty grid")
+    serve.add_argument("--robots", type=int, default=0, help="robots to add on the first free cells")
+    serve.add_argument("--speed", type=float, default=1.0, help="simulated seconds per real second")
+    serve.add_argument("--view", action="store_true", help="show the simulation in the pygame viewer")
+    test = commands.add_parser("client", help="stream random moves to a running server")
+    test.add_argument("--seconds", type=float, default=10.0)
+    test.add_argument("--batch", type=int, default=100, help="commands per message")
+    test.add_argument("--concurrency", type=int, default=8, help="messages in flight")
+    for command in (serve, test):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=PORT)
+        command.add_argument("--unix", help="Unix socket path instead of TCP")
+    args = parser.parse_args(argv)
+
+    if args.command == "client":
+        asyncio.run(load_test(args.host, args.port, args.unix, args.seconds, args.batch, args.concurrency))
+        return
+
+    from .engine import Environment
+    if args.map:
+        from . import maps
+        environment = maps.load_environment(args.map)
+    else:
+        environment = Environment(*(args.size or (GRID_WIDTH, GRID_HEIGHT)))
+    grid = environment.grid
+    taken = {(robot.x, robot.y) for robot in environment.robots}
+    free = (cell for cell in map(grid.position, range(grid.size)) if grid.is_free(cell) and cell not in taken)
+    for cell in itertools.islice(free, args.robots):
+        environment.add_robot(*cell)
+    server = CommandServer(environment)
+    if args.view:
+        from .viewer import Viewer
+        server.start(args.host, args.port, args.unix)
+        viewer = Viewer(environment)
+        viewer.run(args.speed)
+        viewer.close()
+        server.stop()
+        return
+
+    async def main():
+        await server.serve(args.host, args.port, args.unix)
+        async with server.server:
+            await run(environment, args.speed)
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
-import pygame
-from pygame.locals import QUIT
-import math
 import time
 
+# Imported by main(), so importing this module does not load pygame
+# (which initialises SDL and prints a banner on import)
+pygame = None
+
 # Constants
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 600
@@ -21,10 +22,8 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pygame Grid with Padding and Robot Collision")
+# Window, opened by main() so that importing this module has no side effects
+screen = None
 
 # Draw the grid
 def draw_grid():
@@ -68,11 +67,12 @@ def smooth_move(robot_pos, target_pos):
 
 # Check for collision between two robots (based on radius)
 def check_collision(robot_pos1, robot_pos2, radius1, radius2):
-    # Calculate the distance between the centers of the robots
-    distance = math.sqrt((robot_pos1[0] - robot_pos2[0])**2 + (robot_pos1[1] - robot_pos2[1])**2)
-    
+    # Compare squared distances so no square root is needed
+    dx = robot_pos1[0] - robot_pos2[0]
+    dy = robot_pos1[1] - robot_pos2[1]
+
     # If the distance is less than or equal to the sum of their radii, a collision occurs
-    return distance <= (radius1 + radius2)
+    return dx * dx + dy * dy <= (radius1 + radius2) ** 2
 
 # Check if the robot has reached its target
 def has_reached_target(robot_pos, target_pos):
@@ -85,7 +85,6 @@ def move_robot(logical_robot_pos, target_pos):
 # Function to pick up a shelf
 def pick_up_shelf(robot_pos, shelf_intersection):
     # Check if the robot is within one cell distance of the shelf
-    print(robot_pos[0], shelf_intersection[0])
     return robot_pos[0] == shelf_intersection[0]
 
 # Function to drop a shelf
@@ -94,6 +93,12 @@ def drop_shelf(robot_pos, carrying_shelf, shelf_intersection):
 
 # Main loop
 def main():
+    global screen, pygame
+    if pygame is None:
+        import pygame
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Pygame Grid with Padding and Robot Collision")
     running = True
     clock = pygame.time.Clock()
 
@@ -114,6 +119,7 @@ def main():
     shelf_offset = (0, 0)  # Shelf offset relative to the robot
 
     collision_count = 0  # Initialize collision counter
+    in_contact = False  # Count each contact once, not every frame it lasts
 
     # Shelf position at a grid intersection (e.g., at (2, 3) on the grid)
     shelf_intersection = (2, 3)
@@ -136,7 +142,7 @@ def main():
     instruction_index = 0
     while running:
         for event in pygame.event.get():
-            if event.type == QUIT:
+            if event.type == pygame.QUIT:
                 running = False
 
         # Execute the next instruction
@@ -162,6 +168,12 @@ def main():
                     shelf_offset = (0, 0)
                     instruction_index += 1
 
+        # Count collisions between the robots
+        colliding = check_collision(display_robot1_pos, display_robot2_pos, ROBOT_RADIUS, ROBOT_RADIUS)
+        if colliding and not in_contact:
+            collision_count += 1
+        in_contact = colliding
+
         # Draw the grid, robots, and shelf
         draw_grid()
         pygame.draw.circle(screen, RED, display_robot1_pos, ROBOT_RADIUS)  # Robot 1
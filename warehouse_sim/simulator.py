@@ -0,0 +1,30 @@
+from .engine import Environment
+from .viewer import Viewer
+from .constants import *
+
+
+def main():
+    environment = Environment(GRID_WIDTH, GRID_HEIGHT)
+
+    # Add robots, shelves, and obstacles
+    environment.add_robot(1, 1)
+    environment.add_robot(8, 2)
+    environment.add_shelf(5, 5)
+    environment.add_shelf(2, 7)
+    environment.add_obstacle(6, 6)
+    environment.add_obstacle(4, 4)
+
+    # Assign a delivery to every robot
+    environment.schedule_deliveries([
+        (environment.robots[0], environment.shelves[0], (7, 7)),  # Arbitrary end positions
+        (environment.robots[1], environment.shelves[1], (10, 3)),
+    ])
+
+    # Run the environment simulation
+    viewer = Viewer(environment, cell_size=GRID_SIZE, fps=10)
+    viewer.run()
+    viewer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import os
+from multiprocessing import shared_memory
+import numpy as np
+from .a_star.a_star import GridPlanner
+from .a_star.grid import OccupancyGrid
+from .a_star.mapf import ReservationTable, space_time_search
+from .workers import process_pool
+
+# Slots of the int64 header at the start of every snapshot segment
+HEADER = ("version", "width", "height", "robot_capacity", "reservation_capacity",
+          "robots", "vertices", "edges", "holds", "following")
+HEADER_SIZE = 16
+
+# Rows reserved up front for robots and for each kind of reservation
+INITIAL_CAPACITY = 1024
+
+
+def layout(width, height, robot_capacity, reservation_capacity):
+    """
+    Byte offsets of the arrays in a snapshot segment and its total size:
+    header int64[16], cells uint8[height * width], robots int64[n, 3]
+    (id, x, y), vertices int64[n, 3] (cell, t, agent), edges int64[n, 4]
+    (a, b, t, agent) and holds int64[n, 3] (cell, t, agent).
+    """
+    offsets = {}
+    offset = HEADER_SIZE * 8
+    offsets["cells"] = offset
+    offset += -(-width * height // 8) * 8
+    for name, columns, rows in (("robots", 3, robot_capacity), ("vertices", 3, reservation_capacity),
+                                ("edges", 4, reservation_capacity), ("holds", 3, reservation_capacity)):
+        offsets[name] = offset
+        offset += rows * columns * 8
+    return offsets, offset
+
+
+class Snapshot:
+    """
+    Read-only, zero-copy view of a segment written by SnapshotWriter. The
+    grid is an OccupancyGrid over the shared cells and the other arrays are
+    NumPy views; nothing is copied until reservations() rebuilds a
+    ReservationTable for space-time planning.
+    """
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        buffer = self.shm.buf.toreadonly()
+        self.header = np.frombuffer(buffer, dtype=np.int64, count=HEADER_SIZE)
+        width, height = int(self.header[1]), int(self.header[2])
+        offsets, _ = layout(width, height, int(self.header[3]), int(self.header[4]))
+        self.grid = OccupancyGrid(width, height, buffer[offsets["cells"]:offsets["cells"] + width * height])
+        self.grid.array = np.frombuffer(self.grid.cells, dtype=np.uint8).reshape(height, width)
+        self.arrays = {}
+        for name, columns in (("robots", 3), ("vertices", 3), ("edges", 4), ("holds", 3)):
+            capacity = int(self.header[3] if name == "robots" else self.header[4])
+            self.arrays[name] = np.frombuffer(buffer, dtype=np.int64, count=capacity * columns,
+                                              offset=offsets[name]).reshape(capacity, columns)
+        self.planner = GridPlanner(self.grid)
+        self.table = None
+        self.table_version = None
+
+    @property
+    def version(self):
+        return int(self.header[0])
+
+    def rows(self, name):
+        return self.arrays[name][:int(self.header[HEADER.index(name)])]
+
+    def positions(self):
+        """
+        {robot id: (x, y)} of every robot in the snapshot.
+        """
+        return {int(robot_id): (int(x), int(y)) for robot_id, x, y in self.rows("robots").tolist()}
+
+    def reservations(self):
+        """
+        The published reservations as a ReservationTable, rebuilt once per
+        snapshot version.
+        """
+        if self.table_version != self.version:
+            table = ReservationTable(following=bool(self.header[HEADER.index("following")]))
+            for cell, t, agent in self.rows("vertices").tolist():
+                table.vertices.setdefault(cell, {})[t] = agent
+            for a, b, t, agent in self.rows("edges").tolist():
+                table.edges[(a, b, t)] = agent
+            for cell, t, agent in self.rows("holds").tolist():
+                table.holds[cell] = (t, agent)
+            self.table = table
+            self.table_version = self.version
+        return self.table
+
+    def close(self):
+        self.planner = self.table = None
+        self.grid = self.header = self.arrays = None
+        self.shm.close()
+
+
+class SnapshotWriter:
+    """
+    Publishes an Environment's grid, robot positions and fleet reservations
+    into a shared memory segment that worker processes attach to by name. A
+    segment that has become too small is replaced by a larger one under a
+    new name, so readers always pass the current name along with their work.
+    Publish only while no reader is using the segment.
+    """
+    def __init__(self, environment):
+        self.environment = environment
+        self.shm = None
+        self.version = 0
+        self.robot_capacity = INITIAL_CAPACITY
+        self.reservation_capacity = INITIAL_CAPACITY
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm is not None else None
+
+    def allocate(self):
+        grid = self.environment.grid
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        _, size = layout(grid.width, grid.height, self.robot_capacity, self.reservation_capacity)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+
+    def publish(self):
+        """
+        Writes the current state and returns the segment name.
+        """
+        environment = self.environment
+        grid = environment.grid
+        table = environment.fleet_planner.table
+        robots = [(robot.id, robot.x, robot.y) for robot in environment.robots]
+        vertices = [(cell, t, agent) for cell, times in table.vertices.items() for t, agent in times.items()]
+        edges = [(a, b, t, agent) for (a, b, t), agent in table.edges.items()]
+        holds = [(cell, t, agent) for cell, (t, agent) in table.holds.items()]
+
+        needed = max(len(vertices), len(edges), len(holds))
+        if self.shm is None or len(robots) > self.robot_capacity or needed > self.reservation_capacity:
+            while len(robots) > self.robot_capacity:
+                self.robot_capacity *= 2
+            while needed > self.reservation_capacity:
+                self.reservation_capacity *= 2
+            self.allocate()
+
+        buffer = self.shm.buf
+        offsets, _ = layout(grid.width, grid.height, self.robot_capacity, self.reservation_capacity)
+        buffer[offsets["cells"]:offsets["cells"] + grid.size] = grid.cells
+        for name, rows, columns in (("robots", robots, 3), ("vertices", vertices, 3),
+                                    ("edges", edges, 4), ("holds", holds, 3)):
+            if rows:
+                view = np.frombuffer(buffer, dtype=np.int64, count=len(rows) * columns, offset=offsets[name])
+                view[:] = np.array(rows, dtype=np.int64).ravel()
+        self.version += 1
+        header = np.frombuffer(buffer, dtype=np.int64, count=HEADER_SIZE)
+        header[:len(HEADER)] = (self.version, grid.width, grid.height, self.robot_capacity,
+                                self.reservation_capacity, len(robots), len(vertices), len(edges), len(holds),
+                                int(table.following))
+        return self.shm.name
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+# Snapshots attached by this worker process, by segment name
+_attached = {}
+
+
+def attach(name):
+    snapshot = _attached.get(name)
+    if snapshot is None:
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        snapshot = _attached[name] = Snapshot(name)
+    return snapshot
+
+
+def plan_paths(name, requests):
+    """
+    Worker task: single-agent A* for (agent, start, goal, mask) requests on
+    the snapshot. Returns [(agent, path)].
+    """
+    snapshot = attach(name)
+    return [(agent, snapshot.planner.search(start, goal, mask)) for agent, start, goal, mask in requests]
+
+
+def plan_space_time(name, requests):
+    """
+    Worker task: space-time A* for (agent, start, goal, start_time, mask)
+    requests against the snapshot's reservations. Paths planned in the same
+    batch do not see each other; the merge checks them. Returns
+    [(agent, start_time, path)].
+    """
+    snapshot = attach(name)
+    table = snapshot.reservations()
+    return [(agent, start_time, space_time_search(snapshot.grid, start, goal, table, agent, start_time, mask))
+            for agent, start, goal, start_time, mask in requests]
+
+
+class PlannerPool:
+    """
+    Worker processes that plan against a shared snapshot of an Environment.
+    submit() queues requests; each collect() (called once per tick) takes
+    the results of the batch in flight, if it is done, and then publishes a
+    fresh snapshot and sends the queued requests out as the next batch, split
+    into one chunk per worker. Only the segment name travels with the work,
+    never the map.
+    """
+    def __init__(self, environment, workers=None):
+        self.environment = environment
+        self.workers = workers or os.cpu_count() or 1
+        self.writer = SnapshotWriter(environment)
+        self.executor = process_pool(self.workers, ["warehouse_sim.snapshot"])
+        self.queued = []  # (space-time?, request)
+        self.in_flight = []
+
+    def submit(self, request, space_time=False):
+        self.queued.append((space_time, request))
+
+    def busy(self):
+        return bool(self.queued or self.in_flight)
+
+    def collect(self, wait=False):
+        """
+        Returns (paths, space_time_paths) finished since the last call:
+        [(agent, path)] and [(agent, start_time, path)]. With wait, blocks
+        until everything submitted so far has come back.
+        """
+        paths, space_time_paths = [], []
+        while True:
+            if self.in_flight and (wait or all(future.done() for future, _ in self.in_flight)):
+                for future, space_time in self.in_flight:
+                    (space_time_paths if space_time else paths).extend(future.result())
+                self.in_flight = []
+            if self.queued and not self.in_flight:
+                name = self.writer.publish()
+                for space_time, task in ((False, plan_paths), (True, plan_space_time)):
+                    requests = [request for kind, request in self.queued if kind == space_time]
+                    chunk = -(-len(requests) // self.workers)
+                    for i in range(0, len(requests), chunk or 1):
+                        future = self.executor.submit(task, name, requests[i:i + chunk])
+                        self.in_flight.append((future, space_time))
+                self.queued = []
+            if not wait or not self.in_flight:
+                break
+        return paths, space_time_paths
+
+    def close(self):
+        self.executor.shutdown()
+        self.writer.close()
@@ -0,0 +1,110 @@
+import math
+
+
+class SpatialHash:
+    """
+    Uniform spatial hash over positions in grid cell units. Each key (e.g. a
+    robot id) sits in the bucket of the cell nearest to it, so with the
+    default bucket size of one cell, at() answers "who is in this cell" and
+    near() only has to look at the buckets around a point. Moving a key only
+    touches the two buckets involved.
+    """
+    def __init__(self, bucket_size=1.0):
+        self.bucket_size = bucket_size
+        self.buckets = {}  # (bx, by) -> set of keys
+        self.positions = {}  # key -> (x, y)
+        self.bucket_of = {}  # key -> (bx, by)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def bucket(self, x, y):
+        size = self.bucket_size
+        return math.floor(x / size + 0.5), math.floor(y / size + 0.5)
+
+    def insert(self, key, x, y):
+        bucket = self.bucket(x, y)
+        self.buckets.setdefault(bucket, set()).add(key)
+        self.positions[key] = (x, y)
+        self.bucket_of[key] = bucket
+
+    def move(self, key, x, y):
+        old_bucket = self.bucket_of.get(key)
+        if old_bucket is None:
+            self.insert(key, x, y)
+            return
+        self.positions[key] = (x, y)
+        bucket = self.bucket(x, y)
+        if bucket != old_bucket:
+            keys = self.buckets[old_bucket]
+            keys.discard(key)
+            if not keys:
+                del self.buckets[old_bucket]
+            self.buckets.setdefault(bucket, set()).add(key)
+            self.bucket_of[key] = bucket
+
+    def remove(self, key):
+        bucket = self.bucket_of.pop(key, None)
+        if bucket is None:
+            return
+        del self.positions[key]
+        keys = self.buckets[bucket]
+        keys.discard(key)
+        if not keys:
+            del self.buckets[bucket]
+
+    def at(self, cell):
+        """
+        Keys whose position is closest to cell.
+        """
+        return self.buckets.get(self.bucket(*cell), set())
+
+    def near(self, x, y, radius):
+        """
+        Keys within radius of (x, y).
+        """
+        bx, by = self.bucket(x, y)
+        reach = math.ceil(radius / self.bucket_size)
+        radius_squared = radius * radius
+        positions = self.positions
+        found = []
+        for cx in range(bx - reach, bx + reach + 1):
+            for cy in range(by - reach, by + reach + 1):
+                for key in self.buckets.get((cx, cy), ()):
+                    px, py = positions[key]
+                    if (px - x) * (px - x) + (py - y) * (py - y) <= radius_squared:
+                        found.append(key)
+        return found
+
+    def contacts(self, radius):
+        """
+        All pairs of keys closer than 2 * radius, each reported once.
+        Checks each bucket against itself and half of its neighbours, so the
+        cost grows with the number of keys, not its square.
+        """
+        reach = math.ceil(2 * radius / self.bucket_size)
+        limit = 4 * radius * radius
+        positions = self.positions
+        pairs = []
+        for (bx, by), keys in self.buckets.items():
+            keys = list(keys)
+            for i, a in enumerate(keys):
+                ax, ay = positions[a]
+                for b in keys[i + 1:]:
+                    px, py = positions[b]
+                    if (px - ax) * (px - ax) + (py - ay) * (py - ay) < limit:
+                        pairs.append((a, b))
+            for dx in range(0, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    if dx == 0 and dy <= 0:
+                        continue
+                    others = self.buckets.get((bx + dx, by + dy))
+                    if not others:
+                        continue
+                    for a in keys:
+                        ax, ay = positions[a]
+                        for b in others:
+                            px, py = positions[b]
+                            if (px - ax) * (px - ax) + (py - ay) * (py - ay) < limit:
+                                pairs.append((a, b))
+        return pairs
@@ -0,0 +1,203 @@
+import time
+from .constants import *
+
+# Imported by the first Viewer, so headless users of this module never load
+# pygame (which initialises SDL and prints a banner on import)
+pygame = None
+
+
+class Viewer:
+    """
+    Optional pygame window attached to a headless engine.Environment. The
+    viewer only reads simulation state; time is advanced by calling
+    environment.step() with the real frame time. Robot positions are sampled
+    from their current moves when a frame is drawn, so the environment does
+    not need to animate them every tick.
+
+    The grid, obstacles and shelves standing on the floor are pre-rendered
+    into a background surface that is only rebuilt when the map changes.
+    Each frame erases and redraws just the robots that changed and pushes
+    those rectangles with pygame.display.update(), so idle robots cost
+    nothing to draw.
+    """
+    def __init__(self, environment, cell_size=GRID_SIZE, padding=0, screen_size=None,
+                 robot_radius=None, on_intersections=False, fps=50, caption="Inventory Management Environment"):
+        self.environment = environment
+        self.cell_size = cell_size
+        self.padding = padding
+        self.on_intersections = on_intersections  # draw robots on grid intersections instead of cell centres
+        self.robot_radius = robot_radius if robot_radius is not None else cell_size // 3 - 5
+        self.fps = fps
+        if screen_size is None:
+            screen_size = (environment.width * cell_size + 2 * padding,
+                           environment.height * cell_size + 2 * padding)
+        self.screen_width, self.screen_height = screen_size
+
+        global pygame
+        if pygame is None:
+            import pygame
+        pygame.init()
+        self.screen = pygame.display.set_mode(screen_size)
+        pygame.display.set_caption(caption)
+        self.clock = pygame.time.Clock()
+        self.robot_font = pygame.font.SysFont(None, 24)
+        self.shelf_font = pygame.font.SysFont(None, 16)
+        self.labels = {}  # (text, color, font) -> rendered surface
+        self.background = None
+        self.background_version = None  # grid version the background was drawn for
+        self.drawn = {}  # robot -> (draw key, rect) as last drawn on screen
+        self.running = True
+
+    def logical_to_display(self, logical_pos):
+        x, y = logical_pos
+        offset = 0 if self.on_intersections else self.cell_size // 2
+        return round(x * self.cell_size) + self.padding + offset, round(y * self.cell_size) + self.padding + offset
+
+    def cell_rect(self, x, y):
+        return pygame.Rect(x * self.cell_size + self.padding, y * self.cell_size + self.padding,
+                           self.cell_size, self.cell_size)
+
+    def label(self, text, color, font):
+        key = (text, color, font)
+        surface = self.labels.get(key)
+        if surface is None:
+            surface = self.labels[key] = font.render(text, True, color)
+        return surface
+
+    def carried_shelves(self):
+        return {robot.shelf_assigned for robot in self.environment.robots if robot.shelf_custody}
+
+    def draw_grid(self, surface):
+        surface.fill(WHITE)
+        right = self.padding + self.environment.width * self.cell_size
+        bottom = self.padding + self.environment.height * self.cell_size
+        for r in range(self.environment.height + 1):
+            y = self.padding + r * self.cell_size
+            pygame.draw.line(surface, GRAY, (self.padding, y), (right, y), 1)
+        for c in range(self.environment.width + 1):
+            x = self.padding + c * self.cell_size
+            pygame.draw.line(surface, GRAY, (x, self.padding), (x, bottom), 1)
+
+    def draw_obstacles(self, surface):
+        for (x, y) in self.environment.obstacles:
+            pygame.draw.rect(surface, RED, self.cell_rect(x, y))
+
+    def draw_shelf(self, surface, shelf, rect):
+        pygame.draw.rect(surface, BLACK, rect, width=2)
+        surface.blit(self.label(str(shelf.id), BLACK, self.shelf_font), (rect.right - 12, rect.top + 2))
+
+    def draw_shelves(self, surface):
+        carried = self.carried_shelves()
+        for shelf in self.environment.shelves:
+            if shelf not in carried:
+                self.draw_shelf(surface, shelf, self.cell_rect(shelf.x, shelf.y))
+
+    def build_background(self):
+        self.background = pygame.Surface((self.screen_width, self.screen_height))
+        self.draw_grid(self.background)
+        self.draw_obstacles(self.background)
+        self.draw_shelves(self.background)
+        self.background_version = self.environment.grid.version
+
+    def robot_key(self, robot):
+        """
+        Everything that decides what a robot looks like on screen.
+        """
+        return self.logical_to_display(self.environment.display_position(robot)), robot.state, robot.shelf_custody
+
+    def robot_rect(self, center, custody):
+        if custody:
+            rect = pygame.Rect(0, 0, self.cell_size, self.cell_size)
+        else:
+            rect = pygame.Rect(0, 0, 2 * self.robot_radius + 2, 2 * self.robot_radius + 2)
+        rect.center = center
+        return rect
+
+    def draw_robot(self, robot, key):
+        center, state, custody = key
+        color = GREEN if state == "active" else BLUE
+        font_color = BLACK if color == GREEN else WHITE
+        if custody:
+            self.draw_shelf(self.screen, robot.shelf_assigned, self.robot_rect(center, True))
+        pygame.draw.circle(self.screen, color, center, self.robot_radius)
+        text = self.label(str(robot.id), font_color, self.robot_font)
+        text_rect = text.get_rect(center=center)
+        self.screen.blit(text, text_rect)
+        return self.robot_rect(center, custody).union(text_rect)
+
+    def draw_robots(self):
+        self.drawn = {}
+        for robot in self.environment.robots:
+            key = self.robot_key(robot)
+            self.drawn[robot] = (key, self.draw_robot(robot, key))
+
+    def draw(self):
+        """
+        Draws a frame. The whole screen is only redrawn when the map changed;
+        otherwise only the rectangles of robots that moved or changed state
+        are restored from the background, redrawn and updated.
+        """
+        environment = self.environment
+        if self.background is None or environment.grid.version != self.background_version:
+            self.build_background()
+            self.screen.blit(self.background, (0, 0))
+            self.draw_robots()
+            pygame.display.flip()
+            return
+
+        dirty = []
+        changed = []
+        for robot in environment.robots:
+            key = self.robot_key(robot)
+            drawn = self.drawn.get(robot)
+            if drawn is None:
+                changed.append(robot)
+            elif key != drawn[0]:
+                rect = drawn[1]
+                self.screen.blit(self.background, rect, rect)
+                dirty.append(rect)
+                changed.append(robot)
+        if not changed:
+            return
+
+        # Robots overlapping an erased rectangle have to be drawn again as well
+        redraw = set(changed)
+        spatial = environment.spatial
+        for robot in changed:
+            x, y = environment.display_position(robot)
+            redraw.update(environment.get_robot(robot_id) for robot_id in spatial.near(x, y, 2))
+        for robot in sorted(redraw, key=lambda robot: robot.id):
+            key = self.robot_key(robot)
+            rect = self.draw_robot(robot, key)
+            self.drawn[robot] = (key, rect)
+            dirty.append(rect)
+        pygame.display.update(dirty)
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+
+    def run(self, time_scale=1.0):
+        """
+        Runs the environment in real time (scaled by time_scale) until the
+        window is closed.
+        """
+        while self.running and self.environment.running:
+            dt = self.clock.tick(self.fps) / 1000 * time_scale
+            metrics = self.environment.metrics
+            if metrics is None:
+                self.handle_events()
+                self.environment.step(dt)
+                self.draw()
+                continue
+            started = time.perf_counter()
+            self.handle_events()
+            metrics.add("events", time.perf_counter() - started)
+            self.environment.step(dt)
+            started = time.perf_counter()
+            self.draw()
+            metrics.add("drawing", time.perf_counter() - started)
+
+    def close(self):
+        pygame.quit()
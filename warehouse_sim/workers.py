@@ -0,0 +1,23 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(max_workers, preload=()):
+    """
+    ProcessPoolExecutor whose workers start cheaply. Where processes are
+    forked by default (Linux before Python 3.14) nothing changes. Elsewhere,
+    unless a start method was chosen explicitly, workers are forked from a
+    fork server that has imported the script and the preload modules once,
+    instead of each one starting a fresh interpreter and importing NumPy and
+    the planner itself. Windows has no fork server and keeps spawning.
+    """
+    method = multiprocessing.get_start_method(allow_none=True)
+    methods = multiprocessing.get_all_start_methods()
+    if method is None and methods[0] != "fork" and "forkserver" in methods:
+        method = "forkserver"
+    if method != "forkserver":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    context = multiprocessing.get_context("forkserver")
+    # Only takes effect if the fork server is not running yet
+    context.set_forkserver_preload(["__main__", *preload])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)